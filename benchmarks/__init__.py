@@ -0,0 +1,5 @@
+"""
+Micro-benchmarks of djangoevents hot paths. Not part of the test suite, run
+them from repository's root directory, e.g.: `python -m benchmarks` for the
+whole suite (see `benchmarks.suite`) or `python -m benchmarks.validation`.
+"""
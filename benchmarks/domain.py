@@ -0,0 +1,23 @@
+"""
+Sample aggregate the benchmarks store and replay. Its event schemas live in
+`benchmarks/avro`, see `benchmarks.settings`.
+"""
+from djangoevents.domain import BaseAggregate
+from djangoevents.domain import DomainEvent
+
+
+class Counter(BaseAggregate):
+    class Created(BaseAggregate.Created):
+        def mutate_event(self, event, klass):
+            return klass(entity_id=event.entity_id, entity_version=event.entity_version,
+                         domain_event_id=event.domain_event_id, name=event.name)
+
+    class Incremented(DomainEvent):
+        def mutate_event(self, event, counter):
+            counter.value += event.by
+            return counter
+
+    def __init__(self, name, **kwargs):
+        super().__init__(**kwargs)
+        self.name = name
+        self.value = 0
@@ -0,0 +1,115 @@
+"""
+Measures per-event cost of reading an aggregate's history from the journal:
+instantiating `Event` models and copying them with `from_model_instance()`
+(replay before lean row fetching was introduced) against reading
+`values_list()` rows turned into `UnifiedStoredEvent`s with `from_row()`.
+
+    $ python -m benchmarks.replay [--events N] [--chunk-size N]
+
+Uses `DJANGO_SETTINGS_MODULE` (`benchmarks.settings` by default).
+"""
+import argparse
+import os
+import time
+
+
+def setup_django():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'benchmarks.settings')
+    import django
+    from django.core.management import call_command
+    django.setup()
+    call_command('migrate', 'djangoevents', verbosity=0)
+
+
+def store_history(events, aggregate_id='benchmark', batch_size=5000):
+    """
+    Stores `events` events of a single `benchmarks.domain.Counter` aggregate:
+    its `Created` event followed by `Incremented` ones. Returns its stored entity ID.
+    """
+    from datetime import datetime
+    from djangoevents.models import Event
+    from djangoevents.repository import make_aware_if_needed
+
+    stored_entity_id = 'Counter::' + aggregate_id
+    Event.objects.filter(stored_entity_id=stored_entity_id).delete()
+    now = make_aware_if_needed(datetime.now())
+    for offset in range(0, events, batch_size):
+        Event.objects.bulk_create([
+            Event(
+                event_id='{:032x}'.format(version),
+                event_type='counter_created' if version == 0 else 'counter_incremented',
+                event_version=1,
+                event_data='{"name": "benchmark"}' if version == 0 else '{"by": 1, "note": "benchmark"}',
+                aggregate_id=aggregate_id,
+                aggregate_type='Counter',
+                aggregate_version=version,
+                create_date=now,
+                metadata='{}',
+                module_name='benchmarks.domain',
+                class_name='Counter.Created' if version == 0 else 'Counter.Incremented',
+                stored_entity_id=stored_entity_id,
+            )
+            for version in range(offset, min(offset + batch_size, events))
+        ])
+    return stored_entity_id
+
+
+def _read_model_instances(stored_entity_id, chunk_size):
+    from djangoevents.models import Event
+    from djangoevents.repository import from_model_instance
+
+    after_version = -1
+    while True:
+        events = Event.objects.filter(stored_entity_id=stored_entity_id, aggregate_version__gt=after_version)\
+            .order_by('aggregate_version')[:chunk_size]
+        fetched = 0
+        for event in events.iterator():
+            fetched += 1
+            after_version = event.aggregate_version
+            yield from_model_instance(event)
+        if fetched < chunk_size:
+            return
+
+
+def _measure(read, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        count = sum(1 for _ in read())
+        timings.append(time.perf_counter() - started)
+    return min(timings), count
+
+
+def run(events=100000, chunk_size=1000, repeat=3):
+    from djangoevents.repository import DjangoStoredEventRepository
+
+    stored_entity_id = store_history(events)
+    repo = DjangoStoredEventRepository()
+
+    model_time, model_count = _measure(lambda: _read_model_instances(stored_entity_id, chunk_size), repeat)
+    row_time, row_count = _measure(lambda: repo.stream_entity_events(stored_entity_id, chunk_size=chunk_size), repeat)
+    assert model_count == row_count == events
+
+    return {
+        'events': events,
+        'model_instances_us': model_time / events * 1e6,
+        'values_list_us': row_time / events * 1e6,
+        'speedup': model_time / row_time,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--events', type=int, default=100000, help="length of the aggregate's history")
+    parser.add_argument('--chunk-size', type=int, default=1000, help="journal rows fetched per query")
+    args = parser.parse_args()
+
+    setup_django()
+    result = run(events=args.events, chunk_size=args.chunk_size)
+    print("{:<8} {:>16} {:>14} {:>9}".format('events', 'model instances', 'values_list', 'speedup'))
+    row = "{events:<8} {model_instances_us:>10.2f} us/ev {values_list_us:>8.2f} us/ev {speedup:>8.2f}x"
+    print(row.format(**result))
+
+
+if __name__ == '__main__':
+    main()
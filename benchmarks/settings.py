@@ -0,0 +1,52 @@
+"""
+Django settings of the benchmark suite. `BENCHMARK_DATABASE` selects the database:
+
+- `sqlite` (default) - SQLite file, `BENCHMARK_SQLITE_PATH` (defaults to a file in the temporary directory),
+- `postgresql` - local PostgreSQL server configured with `PGHOST`, `PGPORT`, `PGUSER`, `PGPASSWORD`
+  and `PGDATABASE` (requires `psycopg2`).
+
+The benchmarks delete the journal before they run, never point them at a database holding real data.
+"""
+import os
+import tempfile
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+SECRET_KEY = 'benchmarks'
+
+INSTALLED_APPS = (
+    'django.contrib.contenttypes',
+    'djangoevents',
+)
+
+_DATABASE = os.environ.get('BENCHMARK_DATABASE', 'sqlite')
+
+if _DATABASE == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('BENCHMARK_SQLITE_PATH',
+                                   os.path.join(tempfile.gettempdir(), 'djangoevents-benchmarks.sqlite3')),
+        }
+    }
+elif _DATABASE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'HOST': os.environ.get('PGHOST', 'localhost'),
+            'PORT': os.environ.get('PGPORT', '5432'),
+            'USER': os.environ.get('PGUSER', 'postgres'),
+            'PASSWORD': os.environ.get('PGPASSWORD', ''),
+            'NAME': os.environ.get('PGDATABASE', 'djangoevents_benchmarks'),
+        }
+    }
+else:
+    raise ValueError("Unsupported BENCHMARK_DATABASE: {}".format(_DATABASE))
+
+# Schemas are resolved against `BASE_DIR/..`, i.e. the repository's root directory.
+DJANGOEVENTS_CONFIG = {
+    'EVENT_SCHEMA_VALIDATION': {
+        'ENABLED': False,
+        'SCHEMA_DIR': 'benchmarks/avro',
+    },
+}
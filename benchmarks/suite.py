@@ -0,0 +1,231 @@
+"""
+Benchmark suite of djangoevents hot paths producing machine-readable results:
+
+- `store_event()` with schema validation disabled and enabled,
+- `UnifiedTranscoder.serialize()` & `deserialize()`,
+- `get_entity_events()` replay of aggregates with 10, 1k and 100k events,
+- loading these aggregates with a repository returned by `get_repo_for_aggregate()`,
+  with and without lightweight replay events.
+
+    $ python -m benchmarks [--sizes N ...] [--output results.json] [--compare baseline.json]
+
+Runs against SQLite by default, see `benchmarks.settings` to run against PostgreSQL.
+Results of two runs (e.g. of two releases) are compared with `--compare`.
+"""
+from .replay import setup_django
+from .replay import store_history
+
+import argparse
+import datetime
+import json
+import platform
+import subprocess
+import sys
+import time
+import timeit
+import uuid
+
+
+def _best_of(func, number, repeat):
+    """
+    Returns the shortest time of `repeat` runs of `number` calls to `func`, per call.
+    """
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number
+
+
+def _result(name, per_op, number, **params):
+    return {
+        'name': name,
+        'params': params,
+        'number': number,
+        'per_op_us': per_op * 1e6,
+        'ops_per_sec': 1 / per_op,
+    }
+
+
+def bench_store_event(number, repeat, validate):
+    from django.test import override_settings
+    from djangoevents import schema
+    from djangoevents import store_event
+    from djangoevents.settings import get_config
+    from .domain import Counter
+
+    config = dict(get_config())
+    config['EVENT_SCHEMA_VALIDATION'] = dict(config['EVENT_SCHEMA_VALIDATION'], ENABLED=validate)
+
+    timings = []
+    with override_settings(DJANGOEVENTS_CONFIG=config):
+        if validate:
+            schema.load_all_event_schemas()
+
+        for _ in range(repeat):
+            entity_id = uuid.uuid4().hex
+            events = [Counter.Created(entity_id=entity_id, name='benchmark')] + [
+                Counter.Incremented(entity_id=entity_id, entity_version=version, by=1, note='benchmark')
+                for version in range(1, number)
+            ]
+            started = time.perf_counter()
+            for event in events:
+                store_event(event)
+            timings.append(time.perf_counter() - started)
+
+    return _result('store_event', min(timings) / number, number, validation=validate)
+
+
+def bench_transcoder(transcoder, number, repeat):
+    from .domain import Counter
+
+    event = Counter.Incremented(entity_id=uuid.uuid4().hex, entity_version=1, by=1, note='benchmark')
+    stored_event = transcoder.serialize(event)
+    assert transcoder.deserialize(stored_event) == event
+
+    def serialize():
+        transcoder.serialize(event)
+
+    def deserialize():
+        transcoder.deserialize(stored_event)
+
+    return [
+        _result('transcoder.serialize', _best_of(serialize, number, repeat), number),
+        _result('transcoder.deserialize', _best_of(deserialize, number, repeat), number),
+    ]
+
+
+def bench_replay(app, events, repeat):
+    from .domain import Counter
+
+    aggregate_id = 'replay-{}'.format(events)
+    stored_entity_id = store_history(events, aggregate_id=aggregate_id)
+    # Keep short replays measurable.
+    number = max(1, 10000 // events)
+
+    stored_event_repo = app.stored_event_repo
+
+    def read():
+        return sum(1 for _ in stored_event_repo.get_entity_events(stored_entity_id))
+
+    assert read() == events
+
+    results = [_result('get_entity_events', _best_of(read, number, repeat), number, events=events)]
+    for lightweight_replay in (False, True):
+        repo = app.get_repo_for_aggregate(Counter, use_snapshots=False, use_aggregate_cache=False,
+                                          use_shared_aggregate_cache=False, lightweight_replay=lightweight_replay)
+
+        def load(repo=repo):
+            return repo[aggregate_id]
+
+        assert load().value == events - 1
+        results.append(_result('get_repo_for_aggregate.load', _best_of(load, number, repeat), number,
+                               events=events, lightweight_replay=lightweight_replay))
+
+    for result in results:
+        result['per_event_us'] = result['per_op_us'] / events
+    return results
+
+
+def _git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _meta():
+    import django
+    from django.db import connection
+
+    try:
+        import pkg_resources
+        version = pkg_resources.get_distribution('djangoevents').version
+    except Exception:
+        version = None
+
+    return {
+        'djangoevents': version,
+        'revision': _git_revision(),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database': connection.vendor,
+        'platform': platform.platform(),
+        'date': datetime.datetime.utcnow().replace(microsecond=0).isoformat() + 'Z',
+    }
+
+
+def run(sizes=(10, 1000, 100000), number=1000, transcoder_number=10000, repeat=3):
+    """
+    Runs the suite against a configured database. Returns JSON-serializable results.
+    """
+    from djangoevents.app import EventSourcingWithDjango
+    from djangoevents.models import Event
+
+    Event.objects.all().delete()
+    app = EventSourcingWithDjango()
+    try:
+        results = [
+            bench_store_event(number, repeat, validate=False),
+            bench_store_event(number, repeat, validate=True),
+        ]
+        results.extend(bench_transcoder(app.event_store.transcoder, transcoder_number, repeat))
+        for events in sizes:
+            results.extend(bench_replay(app, events, repeat))
+    finally:
+        app.close()
+
+    return {'meta': _meta(), 'results': results}
+
+
+def _key(result):
+    return result['name'], tuple(sorted(result['params'].items()))
+
+
+def _label(result):
+    params = ' '.join('{}={}'.format(name, value) for name, value in sorted(result['params'].items()))
+    return '{} {}'.format(result['name'], params).strip()
+
+
+def format_results(results, baseline=None):
+    """
+    Formats results as a table. Given `baseline` results, adds per call time
+    of each benchmark in the baseline and the change relative to it.
+    """
+    baseline = {_key(result): result for result in (baseline or {}).get('results', [])}
+    lines = ["{:<48} {:>14} {:>14} {:>9}".format('benchmark', 'per call', 'baseline', 'change')]
+    for result in results['results']:
+        line = "{:<48} {:>11.2f} us".format(_label(result), result['per_op_us'])
+        previous = baseline.get(_key(result))
+        if previous is not None:
+            change = (result['per_op_us'] / previous['per_op_us'] - 1) * 100
+            line += " {:>11.2f} us {:>+8.1f}%".format(previous['per_op_us'], change)
+        lines.append(line)
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 1000, 100000],
+                        help="lengths of replayed aggregate histories")
+    parser.add_argument('--number', type=int, default=1000, help="events stored per measurement")
+    parser.add_argument('--transcoder-number', type=int, default=10000, help="events transcoded per measurement")
+    parser.add_argument('--repeat', type=int, default=3, help="measurements per benchmark, the best one is reported")
+    parser.add_argument('--output', help="write JSON results to a file, `-` for standard output")
+    parser.add_argument('--compare', metavar='BASELINE', help="JSON results of an earlier run to compare with")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    setup_django()
+    results = run(sizes=args.sizes, number=args.number, transcoder_number=args.transcoder_number,
+                  repeat=args.repeat)
+
+    if args.output == '-':
+        json.dump(results, sys.stdout, indent=2, sort_keys=True)
+        sys.stdout.write('\n')
+        return
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    print(format_results(results, baseline))
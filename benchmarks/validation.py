@@ -0,0 +1,146 @@
+"""
+Compares event schema validation with `avro.io.Validate` (validation before
+compiled validators were introduced) to validators compiled with
+`djangoevents.validators.compile_validator()`.
+
+    $ python -m benchmarks.validation [--number N]
+"""
+from avro.io import Validate as avro_validate
+from djangoevents.validators import compile_validator
+
+import argparse
+import avro.schema
+import json
+import timeit
+import uuid
+
+
+def _envelope_fields():
+    return [
+        {"name": "entity_id", "type": "string"},
+        {"name": "entity_version", "type": "long"},
+        {"name": "domain_event_id", "type": "string"},
+    ]
+
+
+def _envelope():
+    return {'entity_id': str(uuid.uuid4()), 'entity_version': 12, 'domain_event_id': uuid.uuid1().hex}
+
+
+SMALL_SCHEMA = {
+    "name": "task_renamed",
+    "type": "record",
+    "fields": _envelope_fields() + [
+        {"name": "title", "type": "string"},
+        {"name": "renamed_by", "type": ["null", "string"]},
+    ],
+}
+
+SMALL_EVENT = dict(_envelope(), title='Buy milk', renamed_by='ann')
+
+MEDIUM_SCHEMA = {
+    "name": "task_created",
+    "type": "record",
+    "fields": _envelope_fields() + [
+        {"name": "title", "type": "string"},
+        {"name": "description", "type": ["null", "string"]},
+        {"name": "status", "type": {"type": "enum", "name": "status", "symbols": ["OPEN", "DONE", "CANCELLED"]}},
+        {"name": "priority", "type": "int"},
+        {"name": "estimate", "type": ["null", "double"]},
+        {"name": "tags", "type": {"type": "array", "items": "string"}},
+        {"name": "labels", "type": {"type": "map", "values": "string"}},
+        {"name": "assignee", "type": ["null", {
+            "type": "record",
+            "name": "user",
+            "fields": [
+                {"name": "user_id", "type": "string"},
+                {"name": "name", "type": "string"},
+                {"name": "email", "type": ["null", "string"]},
+            ],
+        }]},
+    ],
+}
+
+MEDIUM_EVENT = dict(
+    _envelope(),
+    title='Prepare release notes',
+    description='Collect changes merged since the last release.',
+    status='OPEN',
+    priority=2,
+    estimate=1.5,
+    tags=['release', 'docs', 'q4'],
+    labels={'team': 'platform', 'component': 'events'},
+    assignee={'user_id': str(uuid.uuid4()), 'name': 'Ann', 'email': 'ann@example.com'},
+)
+
+LARGE_SCHEMA = {
+    "name": "order_placed",
+    "type": "record",
+    "fields": _envelope_fields() + [
+        {"name": "customer_id", "type": "string"},
+        {"name": "currency", "type": "string"},
+        {"name": "lines", "type": {"type": "array", "items": {
+            "type": "record",
+            "name": "order_line",
+            "fields": [
+                {"name": "sku", "type": "string"},
+                {"name": "quantity", "type": "int"},
+                {"name": "unit_price", "type": "long"},
+                {"name": "discount", "type": ["null", "long"]},
+                {"name": "attributes", "type": {"type": "map", "values": "string"}},
+            ],
+        }}},
+    ],
+}
+
+LARGE_EVENT = dict(
+    _envelope(),
+    customer_id=str(uuid.uuid4()),
+    currency='USD',
+    lines=[
+        {'sku': 'SKU-{}'.format(i), 'quantity': i % 5 + 1, 'unit_price': 1999, 'discount': None if i % 2 else 100,
+         'attributes': {'color': 'red', 'size': 'M'}}
+        for i in range(100)
+    ],
+)
+
+SHAPES = [
+    ('small', SMALL_SCHEMA, SMALL_EVENT),
+    ('medium', MEDIUM_SCHEMA, MEDIUM_EVENT),
+    ('large', LARGE_SCHEMA, LARGE_EVENT),
+]
+
+
+def run(number):
+    results = []
+    for name, schema_json, event in SHAPES:
+        schema = avro.schema.Parse(json.dumps(schema_json))
+        validate = compile_validator(schema)
+        assert avro_validate(schema, event) and validate(event)
+
+        avro_time = min(timeit.repeat(lambda: avro_validate(schema, event), number=number, repeat=3))
+        compiled_time = min(timeit.repeat(lambda: validate(event), number=number, repeat=3))
+        compile_time = min(timeit.repeat(lambda: compile_validator(schema), number=100, repeat=3)) / 100
+        results.append({
+            'shape': name,
+            'avro_validate_us': avro_time / number * 1e6,
+            'compiled_us': compiled_time / number * 1e6,
+            'speedup': avro_time / compiled_time,
+            'compile_us': compile_time * 1e6,
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--number', type=int, default=2000, help="validations per measurement")
+    args = parser.parse_args()
+
+    print("{:<8} {:>18} {:>14} {:>9} {:>12}".format('shape', 'avro.io.Validate', 'compiled', 'speedup', 'compile'))
+    for result in run(args.number):
+        print("{shape:<8} {avro_validate_us:>15.1f} us {compiled_us:>11.1f} us {speedup:>8.1f}x "
+              "{compile_us:>9.1f} us".format(**result))
+
+
+if __name__ == '__main__':
+    main()
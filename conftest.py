@@ -1,3 +1,4 @@
+from djangoevents.app import EventSourcingWithDjango
 from rest_framework.test import APIRequestFactory
 import pytest
 
@@ -5,3 +6,10 @@ import pytest
 @pytest.fixture
 def arf():
     return APIRequestFactory()
+
+
+@pytest.fixture
+def app():
+    app = EventSourcingWithDjango()
+    yield app
+    app.close()
@@ -3,7 +3,6 @@ import warnings
 from eventsourcing.domain.model.entity import EventSourcedEntity
 from eventsourcing.domain.model.entity import entity_mutator
 from eventsourcing.domain.model.entity import singledispatch
-from eventsourcing.domain.model.decorators import subscribe_to
 from eventsourcing.domain.model.events import publish as es_publish
 from eventsourcing.domain.model.events import subscribe
 from eventsourcing.domain.model.events import unsubscribe
@@ -11,9 +10,16 @@ from eventsourcing.infrastructure.event_sourced_repo import EventSourcedReposito
 from .domain import BaseEntity
 from .domain import BaseAggregate
 from .domain import DomainEvent
+from .aio import run_sync
 from .app import EventSourcingWithDjango
+from .codecs import AvroCodec
+from .codecs import avro_encoded
+from .dispatch import subscribe_to
 from .exceptions import EventSchemaError
+from .instrumentation import get_instrumentation
+from .persistence import batched_persistence
 from .schema import validate_event
+from .settings import get_event_data_format
 from .settings import is_validation_enabled
 
 default_app_config = 'djangoevents.apps.AppConfig'
@@ -25,7 +31,10 @@ __all__ = [
     'entity_mutator',
     'singledispatch',
     'publish',
-    'store_event'
+    'store_event',
+    'store_events',
+    'store_event_async',
+    'store_events_async',
     'subscribe',
     'unsubscribe',
     'subscribe_to',
@@ -48,9 +57,62 @@ def store_event(event, force_validate=False):
     `force_validate` - enforces event schema validation even if configuration disables it globally.
     """
     if is_validation_enabled() or force_validate:
-        is_valid = validate_event(event)
-        if not is_valid:
-            msg = "Event: {} does not match its schema.".format(event)
-            raise EventSchemaError(msg)
+        if _encodes_events_with_avro():
+            # Encoding validates the event, encoded data is reused by the persistence flow.
+            with avro_encoded([event]):
+                return es_publish(event)
+
+        _validate_event(event)
 
     return es_publish(event)
+
+
+def store_events(events, force_validate=False):
+    """
+    Store multiple events to the service's event journal in a single batch.
+    All events are validated before any of them is published.
+
+    `force_validate` - enforces event schema validation even if configuration disables it globally.
+    """
+    events = list(events)
+    if is_validation_enabled() or force_validate:
+        if _encodes_events_with_avro():
+            with avro_encoded(events), batched_persistence():
+                for event in events:
+                    es_publish(event)
+            return
+
+        for event in events:
+            _validate_event(event)
+
+    with batched_persistence():
+        for event in events:
+            es_publish(event)
+
+
+async def store_event_async(event, force_validate=False):
+    """
+    Same as `store_event()` but does not block the event loop - the event
+    is stored in a thread of the `djangoevents.aio` executor.
+    """
+    return await run_sync(store_event, event, force_validate=force_validate)
+
+
+async def store_events_async(events, force_validate=False):
+    """
+    Same as `store_events()` but does not block the event loop.
+    """
+    return await run_sync(store_events, list(events), force_validate=force_validate)
+
+
+def _encodes_events_with_avro():
+    return get_event_data_format() == AvroCodec.name
+
+
+def _validate_event(event):
+    with get_instrumentation().timer('validation_duration') as timer:
+        timer.tag_event(event)
+        is_valid = validate_event(event)
+    if not is_valid:
+        msg = "Event: {} does not match its schema.".format(event)
+        raise EventSchemaError(msg)
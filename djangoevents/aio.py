@@ -0,0 +1,104 @@
+"""
+asyncio counterparts of the blocking djangoevents API.
+
+Django ORM is synchronous, so database work is run in a pool of
+`ASYNC_API.MAX_WORKERS` threads with `loop.run_in_executor()` and never
+blocks the event loop. Transcoding & schema validation are done by the same
+code as in the synchronous API.
+
+Every executor thread holds a database connection of its own. Set
+`CONN_MAX_AGE` of the database to keep connections open between calls,
+with the default of 0 each call opens a new one.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from django.db import close_old_connections
+from djangoevents.settings import get_async_api_max_workers
+from eventsourcing.exceptions import RepositoryKeyError
+
+import asyncio
+import functools
+import threading
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """
+    Returns the thread pool blocking calls are run in.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=get_async_api_max_workers())
+        return _executor
+
+
+def shutdown_executor(wait=True):
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=wait)
+
+
+def run_sync(func, *args, **kwargs):
+    """
+    Runs blocking `func` in the executor. Returns an awaitable of its result.
+    """
+    loop = asyncio.get_event_loop()
+    return loop.run_in_executor(get_executor(), functools.partial(_call, func, args, kwargs))
+
+
+def _call(func, args, kwargs):
+    # Executor threads keep their database connections between calls. Like
+    # Django does between requests, connections older than `CONN_MAX_AGE` or
+    # broken ones are closed - before the call, so idle ones are reused.
+    close_old_connections()
+    return func(*args, **kwargs)
+
+
+class AsyncRepository(object):
+    """
+    Awaitable interface of an event sourced repository (e.g. one returned by
+    `get_repo_for_aggregate()`).
+
+    `max_concurrency` - number of aggregates `gather()` loads at once,
+    defaults to `ASYNC_API.MAX_WORKERS`.
+    """
+
+    def __init__(self, repo, max_concurrency=None):
+        self.repo = repo
+        self.max_concurrency = max_concurrency or get_async_api_max_workers()
+
+    async def get(self, aggregate_id, default=None):
+        """
+        Returns aggregate with given ID or `default` if it does not exist.
+        """
+        try:
+            return await run_sync(self.repo.__getitem__, aggregate_id)
+        except RepositoryKeyError:
+            return default
+
+    async def contains(self, aggregate_id):
+        return await run_sync(self.repo.__contains__, aggregate_id)
+
+    async def gather(self, aggregate_ids):
+        """
+        Loads aggregates concurrently. Returns a dict of found aggregates keyed by ID.
+        """
+        aggregate_ids = list(aggregate_ids)
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        missing = object()
+
+        async def get(aggregate_id):
+            async with semaphore:
+                return await self.get(aggregate_id, default=missing)
+
+        aggregates = await asyncio.gather(*(get(aggregate_id) for aggregate_id in aggregate_ids))
+        return {
+            aggregate_id: aggregate
+            for aggregate_id, aggregate in zip(aggregate_ids, aggregates)
+            if aggregate is not missing
+        }
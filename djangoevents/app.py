@@ -1,16 +1,22 @@
 import warnings
 
+from .aio import AsyncRepository
+from .event_sourced_repo import DjangoEventSourcedRepository
+from .eventstore import DjangoEventStore
+from .persistence import DjangoPersistenceSubscriber
+from .projections import ProjectionRunner
+from .reader import JournalReader
 from .repository import DjangoStoredEventRepository
 from .unifiedtranscoder import UnifiedTranscoder
 from django.core.serializers.json import DjangoJSONEncoder
 from eventsourcing.application.base import EventSourcingApplication
-from eventsourcing.infrastructure.event_sourced_repo import EventSourcedRepository
 
 
 class EventSourcingWithDjango(EventSourcingApplication):
     def __init__(self, **kwargs):
         kwargs.setdefault('json_encoder_cls', DjangoJSONEncoder)
         super().__init__(**kwargs)
+        self.repos = []
         self.on_init()
 
     def on_init(self):
@@ -22,16 +28,77 @@ class EventSourcingWithDjango(EventSourcingApplication):
     def create_stored_event_repo(self, **kwargs):
         return DjangoStoredEventRepository(**kwargs)
 
+    def create_event_store(self, json_encoder_cls=None, json_decoder_cls=None, cipher=None, always_encrypt=False):
+        transcoder = self.create_transcoder(always_encrypt, cipher, json_decoder_cls, json_encoder_cls)
+        return DjangoEventStore(
+            stored_event_repo=self.stored_event_repo,
+            transcoder=transcoder,
+        )
+
+    def create_persistence_subscriber(self):
+        if self.persist_events and self.event_store:
+            return DjangoPersistenceSubscriber(event_store=self.event_store)
+
     def create_transcoder(self, always_encrypt, cipher, json_decoder_cls, json_encoder_cls):
         return UnifiedTranscoder(json_encoder_cls=json_encoder_cls)
 
-    def get_repo_for_aggregate(self, aggregate_cls):
+    def get_repo_for_aggregate(self, aggregate_cls, **kwargs):
         """
         Returns EventSourcedRepository class for a given aggregate.
+
+        Extra `kwargs` (e.g. `use_snapshots`, `snapshot_every`) are passed
+        to `DjangoEventSourcedRepository`.
+
+        Repositories with an aggregate cache stay subscribed to published
+        events until the app is closed, create them once and reuse them.
         """
         clsname = '%sRepository' % aggregate_cls.__name__
-        repo_cls = type(clsname, (EventSourcedRepository,), {'domain_class': aggregate_cls})
-        return repo_cls(event_store=self.event_store)
+        repo_cls = type(clsname, (DjangoEventSourcedRepository,), {'domain_class': aggregate_cls})
+        repo = repo_cls(event_store=self.event_store, **kwargs)
+        if repo.aggregate_cache is not None:
+            # Only these need closing.
+            self.repos.append(repo)
+        return repo
+
+    def get_async_repo_for_aggregate(self, aggregate_cls, max_concurrency=None, **kwargs):
+        """
+        Returns `AsyncRepository` wrapping repository of a given aggregate.
+
+        Extra `kwargs` are passed to `get_repo_for_aggregate()`.
+        """
+        return AsyncRepository(self.get_repo_for_aggregate(aggregate_cls, **kwargs), max_concurrency=max_concurrency)
+
+    def get_journal_reader(self, aggregate_types=None, event_types=None, **kwargs):
+        """
+        Returns `JournalReader` streaming events of all aggregates in global order.
+
+        Extra `kwargs` (e.g. `batch_size`) are passed to `JournalReader`.
+        """
+        return JournalReader(
+            stored_event_repo=self.stored_event_repo,
+            aggregate_types=aggregate_types,
+            event_types=event_types,
+            **kwargs
+        )
+
+    def get_projection_runner(self, projection, **kwargs):
+        """
+        Returns `ProjectionRunner` feeding given projection with events from the journal.
+
+        Extra `kwargs` (e.g. `batch_size`) are passed to `ProjectionRunner`.
+        """
+        return ProjectionRunner(
+            projection,
+            stored_event_repo=self.stored_event_repo,
+            transcoder=self.event_store.transcoder,
+            **kwargs
+        )
+
+    def close(self):
+        for repo in self.repos:
+            repo.close()
+        self.repos = []
+        super().close()
 
     def get_repo_for_entity(self, entity_cls):
         """
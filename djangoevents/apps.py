@@ -3,7 +3,9 @@ from django.conf import settings
 from django.utils.module_loading import autodiscover_modules
 from djangoevents import DomainEvent
 from .exceptions import EventSchemaError
+from .registry import register_aggregate_events
 from .settings import adds_schema_version_to_event_data
+from .settings import is_schema_lazy_loading_enabled
 from .schema import get_event_version
 from .schema import load_all_event_schemas
 import warnings
@@ -21,6 +23,7 @@ class AppConfig(BaseAppConfig):
         # Once all handlers & aggregates are loaded we can import aggregate schema files.
         # `load_scheas()` assumes that all aggregates are imported at this point.
         load_schemas()
+        register_aggregate_events()
 
 
 def get_app_module_names():
@@ -30,7 +33,11 @@ def get_app_module_names():
 def load_schemas():
     """
     Try loading all the event schemas and complain loud if failure occurred.
+    With lazy loading enabled schemas are loaded on first use instead.
     """
+    if is_schema_lazy_loading_enabled():
+        return
+
     try:
         load_all_event_schemas()
     except EventSchemaError as e:
@@ -0,0 +1,148 @@
+"""
+Caches of aggregates loaded by `DjangoEventSourcedRepository`:
+
+- `AggregateCache` - in-process LRU cache,
+- `SharedAggregateCache` - cache shared between processes, backed by the Django cache framework.
+"""
+from collections import OrderedDict
+from collections import namedtuple
+from django.core.cache import caches
+from eventsourcing.domain.services.transcoding import id_prefix_from_entity_class
+
+import hashlib
+import re
+import threading
+import time
+
+
+CachedAggregate = namedtuple('CachedAggregate', ['aggregate', 'last_event_id', 'expires_at'])
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'maxsize', 'currsize'])
+
+
+class AggregateCache(object):
+    """
+    Thread safe LRU cache of aggregates keyed by stored entity ID. Every entry
+    remembers the ID of the last event applied to the aggregate, so that it
+    can be checked against the event journal.
+
+    `maxsize` - number of aggregates kept, the least recently used ones are evicted first.
+    `ttl` - optional number of seconds after which entries expire.
+    """
+
+    def __init__(self, maxsize=1000, ttl=None, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+
+    def get(self, key):
+        """
+        Returns `CachedAggregate` stored under `key` or None.
+        """
+        with self._lock:
+            entry = self.peek(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry
+
+    def peek(self, key):
+        """
+        Same as `get()` but does not affect LRU order nor statistics.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at is not None and entry.expires_at <= self.clock():
+                del self._entries[key]
+                entry = None
+            return entry
+
+    def set(self, key, aggregate, last_event_id):
+        expires_at = self.clock() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._entries[key] = CachedAggregate(aggregate=aggregate, last_event_id=last_event_id,
+                                                 expires_at=expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def discard(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def info(self):
+        """
+        Returns hits, misses, maxsize and currsize of the cache.
+        """
+        with self._lock:
+            return CacheInfo(hits=self.hits, misses=self.misses, maxsize=self.maxsize, currsize=len(self._entries))
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SharedAggregateCache(object):
+    """
+    Aggregate state stored in a Django cache backend shared between processes.
+
+    Entries are keyed by `(aggregate_type, aggregate_id, aggregate_version)`
+    of the aggregate's last event, so a new event makes older entries
+    unreachable. They are left to expire after `timeout` seconds. Entries
+    also hold the ID of the last event, so state built from events which
+    were later rolled back is never served. Aggregate state is encoded
+    the same way as in snapshots.
+    """
+    key_prefix = 'djangoevents:aggregate'
+
+    # Keys not accepted by memcached are hashed.
+    _unsafe_key = re.compile(r'[\x00-\x20\x7f]')
+    max_key_length = 200
+
+    def __init__(self, transcoder, cache_alias='default', timeout=300):
+        self.transcoder = transcoder
+        self.cache = caches[cache_alias]
+        self.timeout = timeout
+
+    def get(self, aggregate_cls, aggregate_id, aggregate_version, last_event_id):
+        """
+        Returns aggregate cached for given version & last event ID or None.
+        """
+        entry = self.cache.get(self.make_key(aggregate_cls, aggregate_id, aggregate_version))
+        if entry is None:
+            return None
+
+        cached_event_id, state = entry
+        if cached_event_id != last_event_id:
+            return None
+        return self.transcoder.deserialize_aggregate(aggregate_cls, state)
+
+    def set(self, aggregate, last_event_id):
+        aggregate_cls = type(aggregate)
+        key = self.make_key(aggregate_cls, aggregate.id, aggregate.version - 1)
+        entry = (last_event_id, self.transcoder.serialize_aggregate(aggregate))
+        self.cache.set(key, entry, timeout=self.timeout)
+
+    def make_key(self, aggregate_cls, aggregate_id, aggregate_version):
+        # `snapshot_version` is part of the key, so that a new layout of aggregate state invalidates entries.
+        prefix = '{prefix}:{aggregate_type}:{snapshot_version}:{aggregate_version}:'.format(
+            prefix=self.key_prefix,
+            aggregate_type=id_prefix_from_entity_class(aggregate_cls),
+            snapshot_version=aggregate_cls.snapshot_version,
+            aggregate_version=aggregate_version,
+        )
+        key = prefix + str(aggregate_id)
+        if len(key) > self.max_key_length or self._unsafe_key.search(key):
+            key = prefix + hashlib.sha1(str(aggregate_id).encode('utf-8')).hexdigest()
+        return key
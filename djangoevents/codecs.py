@@ -0,0 +1,352 @@
+"""
+Codecs used by `UnifiedTranscoder` to encode event data & metadata.
+
+Every JSON codec produces the same canonical JSON: compact separators, sorted
+keys, ASCII only output and values not supported by JSON natively (dates, UUIDs,
+decimals, ...) converted with `default()` of the configured JSON encoder class.
+
+Binary codecs encode event data only (see `EVENT_DATA_FORMAT` setting).
+"""
+from collections import namedtuple
+from contextlib import contextmanager
+from django.core.serializers.json import DjangoJSONEncoder
+from eventsourcing.domain.services.transcoding import ObjectJSONDecoder
+from .exceptions import EventSchemaError
+from .instrumentation import get_instrumentation
+from .schema import get_event_version
+from .schema import get_schema_for_event_version
+from .settings import get_json_codec_name
+from .validators import compile_validator
+
+import avro.io
+import avro.schema
+import enum
+import io
+import json
+import math
+import re
+import threading
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+class JSONCodec(object):
+    """
+    Codec based on the standard library `json` module.
+    """
+    name = 'json'
+
+    def __init__(self, json_encoder_cls=None):
+        self.json_encoder_cls = json_encoder_cls
+
+    def encode(self, data):
+        return json.dumps(data, separators=(',', ':'), sort_keys=True, cls=self.json_encoder_cls)
+
+    def decode(self, json_str):
+        return json.loads(json_str, cls=ObjectJSONDecoder)
+
+
+class OrjsonCodec(JSONCodec):
+    """
+    Codec based on `orjson`. Falls back to `JSONCodec` whenever orjson output
+    could differ from the canonical one:
+
+    - non ASCII or DEL characters (escaped by the standard library),
+    - floats rendered with an exponent (`1e16` vs `1e+16`),
+    - anything orjson refuses to encode (e.g. non string keys, big integers),
+    - non-finite floats (`NaN`, `Infinity`), which orjson encodes as `null`,
+    - enums orjson encodes natively, which the configured encoder may reject,
+    - payloads using `ObjectJSONDecoder` markers, integers which may not fit
+      in 64 bits (orjson decodes them as floats) or values orjson can't decode.
+    """
+    name = 'orjson'
+
+    _exponent = re.compile(rb'\d[eE]')
+    _long_number = re.compile(r'\d{19}')
+    _decoder_markers = ('__class__', 'ISO8601_date', '__ndarray__')
+
+    def __init__(self, json_encoder_cls=None):
+        if orjson is None:
+            raise ImportError("`orjson` codec requires the orjson package to be installed.")
+
+        super().__init__(json_encoder_cls=json_encoder_cls)
+        self._default = (json_encoder_cls or json.JSONEncoder)().default
+        self._options = orjson.OPT_SORT_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+
+    def encode(self, data):
+        if _has_non_json_values(data):
+            return super().encode(data)
+
+        try:
+            encoded = orjson.dumps(data, default=self._default, option=self._options)
+        except TypeError:
+            return super().encode(data)
+
+        if b'\x7f' in encoded or self._exponent.search(encoded):
+            return super().encode(data)
+
+        try:
+            return encoded.decode('ascii')
+        except UnicodeDecodeError:
+            return super().encode(data)
+
+    def decode(self, json_str):
+        if any(marker in json_str for marker in self._decoder_markers) or self._long_number.search(json_str):
+            return super().decode(json_str)
+
+        try:
+            return orjson.loads(json_str)
+        except ValueError:
+            return super().decode(json_str)
+
+
+_json_scalar_types = frozenset([str, int, bool, type(None)])
+
+
+def _has_non_json_values(value):
+    """
+    Returns whether `value` holds non-finite floats or enums which are not
+    also strings or numbers. The standard library encodes them differently
+    than orjson.
+    """
+    value_type = type(value)
+    if value_type in _json_scalar_types:
+        return False
+    if value_type is float:
+        return not math.isfinite(value)
+
+    if isinstance(value, dict):
+        items = value.values()
+    elif isinstance(value, (list, tuple)):
+        items = value
+    elif isinstance(value, float):
+        return not math.isfinite(value)
+    else:
+        return isinstance(value, enum.Enum) and not isinstance(value, (str, int))
+
+    for item in items:
+        if type(item) not in _json_scalar_types and _has_non_json_values(item):
+            return True
+    return False
+
+
+def get_codec(json_encoder_cls=None, name=None):
+    """
+    Returns codec configured with the `JSON_CODEC` setting:
+
+    - `auto` - orjson if it is installed, standard library `json` otherwise,
+    - `json` - standard library `json`,
+    - `orjson` - orjson (has to be installed).
+
+    orjson is used only together with `DjangoJSONEncoder` as it reproduces
+    its output exactly. Other encoders always get the `json` codec.
+    """
+    name = name or get_json_codec_name()
+    if name not in ('auto', 'json', 'orjson'):
+        raise ValueError("Unknown JSON codec: {}".format(name))
+
+    if name == 'json' or json_encoder_cls is not DjangoJSONEncoder:
+        return JSONCodec(json_encoder_cls=json_encoder_cls)
+
+    if name == 'auto' and orjson is None:
+        return JSONCodec(json_encoder_cls=json_encoder_cls)
+
+    return OrjsonCodec(json_encoder_cls=json_encoder_cls)
+
+
+class MsgpackCodec(object):
+    """
+    Binary codec based on MessagePack. Values not supported by MessagePack
+    natively are converted the same way as in JSON codecs, map keys are
+    converted to strings as JSON object keys are.
+    """
+    name = 'msgpack'
+    schema_based = False
+
+    def __init__(self, json_encoder_cls=None):
+        if msgpack is None:
+            raise ImportError("`msgpack` event data format requires the msgpack package to be installed.")
+
+        self._default = (json_encoder_cls or json.JSONEncoder)().default
+
+    def encode(self, data):
+        return msgpack.packb(_with_json_keys(data), default=self._default, use_bin_type=True)
+
+    def decode(self, data):
+        return msgpack.unpackb(data, raw=False)
+
+
+def _with_json_keys(value):
+    """
+    Returns `value` with keys of nested dicts converted to strings like
+    `json.dumps()` does. Keys of other types raise `TypeError`.
+    """
+    if isinstance(value, dict):
+        return {_json_key(key): _with_json_keys(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_with_json_keys(item) for item in value]
+    return value
+
+
+def _json_key(key):
+    if isinstance(key, str):
+        return key
+    if key is True:
+        return 'true'
+    if key is False:
+        return 'false'
+    if key is None:
+        return 'null'
+    if isinstance(key, int):
+        return int.__repr__(key)
+    if isinstance(key, float):
+        return json.dumps(key)
+    raise TypeError("keys must be str, int, float, bool or None, not {}".format(type(key).__name__))
+
+
+# Avro encoded event data reused when events get persisted, see `avro_encoded()`.
+_avro_encoded = threading.local()
+
+
+class AvroCodec(object):
+    """
+    Binary codec encoding event data with the Avro schema of the event's
+    `event_version`. Events not matching their schema can't be encoded,
+    which makes encoding validate events as a side effect.
+
+    Envelope fields are stored in their own journal columns: if declared in
+    the schema they are validated but not encoded. Event data fields missing
+    in the schema are rejected instead of being silently dropped.
+    """
+    name = 'avro'
+    schema_based = True
+
+    envelope_fields = ('domain_event_id', 'entity_id', 'entity_version')
+
+    def __init__(self, json_encoder_cls=None):
+        self._schemas = {}
+
+    def encode_event(self, domain_event):
+        pending = getattr(_avro_encoded, 'events', {})
+        if domain_event.domain_event_id in pending:
+            return pending[domain_event.domain_event_id]
+
+        event_cls = type(domain_event)
+        event_schema = self._get_event_schema(event_cls, get_event_version(event_cls))
+
+        attrs = domain_event.__dict__
+        data = {key: value for key, value in attrs.items() if key not in self.envelope_fields and key != 'metadata'}
+        unknown_fields = set(data) - event_schema.data_fields
+        if unknown_fields:
+            msg = "Event: {} has fields missing in its schema: {}."
+            raise EventSchemaError(msg.format(domain_event, ", ".join(sorted(unknown_fields))))
+
+        envelope_valid = all(validate(attrs.get(name)) for name, validate in event_schema.envelope_validators)
+        if not envelope_valid or not event_schema.validate_data(data):
+            raise EventSchemaError("Event: {} does not match its schema.".format(domain_event))
+
+        # Data is already validated, `write_data()` skips the generic validation of `DatumWriter.write()`.
+        buffer = io.BytesIO()
+        writer = event_schema.writer
+        writer.write_data(writer.writer_schema, data, avro.io.BinaryEncoder(buffer))
+        return buffer.getvalue()
+
+    def decode_event(self, data, event_cls, event_version):
+        reader = self._get_event_schema(event_cls, event_version).reader
+        return reader.read(avro.io.BinaryDecoder(io.BytesIO(data)))
+
+    def _get_event_schema(self, event_cls, event_version):
+        key = (event_cls, event_version)
+        if key not in self._schemas:
+            self._schemas[key] = self._compile_event_schema(event_cls, event_version)
+        return self._schemas[key]
+
+    def _compile_event_schema(self, event_cls, event_version):
+        """
+        Splits the event schema into validators of envelope fields it declares
+        and writer & reader of the remaining (event data) fields.
+        """
+        schema = get_schema_for_event_version(event_cls, event_version)
+        envelope_validators = [(field.name, compile_validator(field.type))
+                               for field in schema.fields if field.name in self.envelope_fields]
+
+        data_schema_json = schema.to_json()
+        data_schema_json['fields'] = [field for field in data_schema_json['fields']
+                                      if field['name'] not in self.envelope_fields]
+        data_schema = avro.schema.Parse(json.dumps(data_schema_json))
+
+        return _AvroEventSchema(
+            envelope_validators=envelope_validators,
+            data_fields=frozenset(field.name for field in data_schema.fields),
+            validate_data=compile_validator(data_schema),
+            writer=avro.io.DatumWriter(writer_schema=data_schema),
+            reader=avro.io.DatumReader(writer_schema=data_schema, reader_schema=data_schema),
+        )
+
+
+_AvroEventSchema = namedtuple('_AvroEventSchema', [
+    'envelope_validators',
+    'data_fields',
+    'validate_data',
+    'writer',
+    'reader',
+])
+
+
+_avro_codec = None
+
+
+def _get_avro_codec():
+    # Shared, so that compiled schemas are reused across `avro_encoded()` calls.
+    global _avro_codec
+    if _avro_codec is None:
+        _avro_codec = AvroCodec()
+    return _avro_codec
+
+
+@contextmanager
+def avro_encoded(events):
+    """
+    Encodes `events` with `AvroCodec` upfront, raising `EventSchemaError` for
+    events not matching their schemas. Within the block encoded data is
+    reused by the transcoder instead of encoding the events again.
+    """
+    pending = _avro_encoded.__dict__.setdefault('events', {})
+    codec = _get_avro_codec()
+    instrumentation = get_instrumentation()
+    encoded_ids = []
+    try:
+        for event in events:
+            with instrumentation.timer('validation_duration') as timer:
+                timer.tag_event(event)
+                pending[event.domain_event_id] = codec.encode_event(event)
+            encoded_ids.append(event.domain_event_id)
+        yield
+    finally:
+        for event_id in encoded_ids:
+            pending.pop(event_id, None)
+
+
+BINARY_CODECS = {
+    MsgpackCodec.name: MsgpackCodec,
+    AvroCodec.name: AvroCodec,
+}
+
+
+def get_binary_codec(name, json_encoder_cls=None):
+    """
+    Returns codec for given binary event data format.
+    """
+    try:
+        codec_cls = BINARY_CODECS[name]
+    except KeyError:
+        raise ValueError("Unknown event data format: {}".format(name))
+    return codec_cls(json_encoder_cls=json_encoder_cls)
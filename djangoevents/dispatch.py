@@ -0,0 +1,213 @@
+"""
+Asynchronous dispatch of event handlers.
+
+Handlers subscribed with `subscribe_to(event_class, run_async=True)` are not
+called in the thread storing the event. Once the event is appended to the
+journal and the transaction storing it commits, the event is handed to a
+bounded pool of worker threads, so slow handlers (e.g. projections) do not
+hold up `store_event()` callers. Events which fail to be stored or belong
+to rolled back transactions are never dispatched.
+
+Async handlers run outside of the transaction that stored the event and
+are not retried - failures are logged & counted only. Use the outbox or
+`CatchUpSubscription` where every event has to be processed.
+"""
+from collections import deque
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from django.db import close_old_connections
+from django.db import transaction
+from djangoevents.settings import get_async_handlers_max_queue_size
+from djangoevents.settings import get_async_handlers_max_workers
+from djangoevents.settings import get_async_handlers_queue_timeout
+from eventsourcing.domain.model.decorators import subscribe_to as es_subscribe_to
+
+import logging
+import threading
+import time
+
+
+logger = logging.getLogger(__name__)
+
+HandlerStats = namedtuple('HandlerStats', ['submitted', 'succeeded', 'failed', 'rejected', 'total_time'])
+
+HandlerError = namedtuple('HandlerError', ['handler', 'event', 'exception'])
+
+
+class AsyncDispatcher(object):
+    """
+    Runs handlers in a pool of `max_workers` threads.
+
+    At most `max_queue_size` events wait for a free worker. When the queue
+    is full `submit()` blocks (backpressure) - for up to `queue_timeout`
+    seconds if given, after which the event is rejected and counted.
+
+    Handler exceptions are logged, counted and the most recent ones are
+    kept in `errors`.
+    """
+
+    def __init__(self, max_workers=4, max_queue_size=1000, queue_timeout=None, max_errors=100):
+        self.max_workers = max_workers
+        self.max_queue_size = max_queue_size
+        self.queue_timeout = queue_timeout
+        self.errors = deque(maxlen=max_errors)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue_size)
+        self._stats = {}
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+
+    def submit(self, handler, event):
+        """
+        Schedules `handler(event)`. Returns False if the event was rejected because the queue is full.
+        """
+        acquired = self._slots.acquire(timeout=self.queue_timeout)
+        if not acquired:
+            self._count(handler, rejected=1)
+            logger.error("Event queue full, %s rejected by %s", event, _handler_name(handler))
+            return False
+
+        with self._lock:
+            self._pending += 1
+        self._count(handler, submitted=1)
+        try:
+            self._executor.submit(self._run, handler, event)
+        except Exception:
+            self._done()
+            raise
+        return True
+
+    def _run(self, handler, event):
+        close_old_connections()
+        started = time.perf_counter()
+        try:
+            handler(event)
+        except Exception as e:
+            self._count(handler, failed=1, total_time=time.perf_counter() - started)
+            self.errors.append(HandlerError(handler=handler, event=event, exception=e))
+            logger.exception("Async handler %s failed on %s", _handler_name(handler), event)
+        else:
+            self._count(handler, succeeded=1, total_time=time.perf_counter() - started)
+        finally:
+            close_old_connections()
+            self._done()
+
+    def _done(self):
+        self._slots.release()
+        with self._lock:
+            self._pending -= 1
+            if not self._pending:
+                self._idle.notify_all()
+
+    def _count(self, handler, **increments):
+        name = _handler_name(handler)
+        with self._lock:
+            stats = self._stats.get(name, HandlerStats(0, 0, 0, 0, 0.0))
+            self._stats[name] = stats._replace(**{
+                field: getattr(stats, field) + value for field, value in increments.items()
+            })
+
+    @property
+    def pending(self):
+        """
+        Number of events queued or being handled.
+        """
+        return self._pending
+
+    def stats(self):
+        """
+        Returns `HandlerStats` keyed by handler name.
+        """
+        with self._lock:
+            return dict(self._stats)
+
+    def wait(self, timeout=None):
+        """
+        Blocks until all submitted events are handled. Returns False on timeout.
+        """
+        with self._idle:
+            return self._idle.wait_for(lambda: not self._pending, timeout=timeout)
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_async_dispatcher():
+    """
+    Returns the process wide `AsyncDispatcher` configured with the `ASYNC_HANDLERS` setting.
+    """
+    global _dispatcher
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            _dispatcher = AsyncDispatcher(
+                max_workers=get_async_handlers_max_workers(),
+                max_queue_size=get_async_handlers_max_queue_size(),
+                queue_timeout=get_async_handlers_queue_timeout(),
+            )
+        return _dispatcher
+
+
+def shutdown_async_dispatcher(wait=True):
+    """
+    Stops worker threads. A new dispatcher is created on the next async event.
+    """
+    global _dispatcher
+    with _dispatcher_lock:
+        dispatcher, _dispatcher = _dispatcher, None
+    if dispatcher is not None:
+        dispatcher.shutdown(wait=wait)
+
+
+_async_handlers = []
+
+
+def dispatch_after_commit(domain_events):
+    """
+    Passes stored `domain_events` to async handlers subscribed to them by
+    `AsyncDispatcher` once the current transaction commits. Called by
+    `DjangoEventStore` after appending events to the journal.
+    """
+    for event in domain_events:
+        for event_class, handler in _async_handlers:
+            if isinstance(event, event_class):
+                transaction.on_commit(_submit(handler, event))
+
+
+def _submit(handler, event):
+    return lambda: get_async_dispatcher().submit(handler, event)
+
+
+def subscribe_to(event_class, run_async=False):
+    """
+    Same as `eventsourcing`'s `subscribe_to` decorator. With `run_async`
+    the handler is called by `AsyncDispatcher` after the event is stored
+    and the transaction storing it commits.
+
+    Example usage:
+        @subscribe_to(Todo.Created, run_async=True)
+        def new_todo_projection(event):
+            ...
+    """
+    if not run_async:
+        return es_subscribe_to(event_class)
+
+    def wrap(handler_func):
+        _async_handlers.append((event_class, handler_func))
+        return handler_func
+    return wrap
+
+
+def unsubscribe_async(handler):
+    """
+    Removes `handler` subscribed with `subscribe_to(..., run_async=True)`.
+    """
+    _async_handlers[:] = [item for item in _async_handlers if item[1] is not handler]
+
+
+def _handler_name(handler):
+    return '{}.{}'.format(getattr(handler, '__module__', None), getattr(handler, '__qualname__', repr(handler)))
@@ -22,6 +22,9 @@ class BaseAggregate(EventSourcedEntity):
     >>>            return instance
     """
 
+    # Bump when the layout of aggregate state changes so that stored snapshots get ignored.
+    snapshot_version = 1
+
     @classmethod
     def is_abstract_class(cls):
         return is_abstract(cls)
@@ -48,6 +51,21 @@ class BaseAggregate(EventSourcedEntity):
         )
         return aggregate
 
+    def get_snapshot_state(self):
+        """
+        Returns aggregate state persisted in snapshots. Override together with
+        `from_snapshot_state()` if the state does not survive a JSON round trip
+        (e.g. holds dates or decimals), taking a snapshot of such state raises
+        `SnapshotStateError`.
+        """
+        return self.__dict__
+
+    @classmethod
+    def from_snapshot_state(cls, state):
+        aggregate = object.__new__(cls)
+        aggregate.__dict__.update(state)
+        return aggregate
+
 
 class BaseEntity(BaseAggregate):
     """
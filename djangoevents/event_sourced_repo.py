@@ -0,0 +1,373 @@
+from .cache import AggregateCache
+from .cache import SharedAggregateCache
+from .domain import BaseAggregate
+from .domain import DomainEvent
+from .exceptions import ConcurrencyConflict
+from .instrumentation import get_instrumentation
+from .registry import get_event_metadata
+from .settings import get_aggregate_cache_max_size
+from .settings import get_aggregate_cache_ttl
+from .settings import get_shared_aggregate_cache_alias
+from .settings import get_shared_aggregate_cache_timeout
+from .settings import get_snapshot_every_n_events
+from .settings import is_aggregate_cache_enabled
+from .settings import is_lightweight_replay_enabled
+from .settings import is_shared_aggregate_cache_enabled
+from .settings import is_snapshotting_enabled
+from .snapshots import DjangoSnapshotStore
+from collections import OrderedDict
+from collections import namedtuple
+from django.db import transaction
+from eventsourcing.domain.model.events import subscribe
+from eventsourcing.domain.model.events import unsubscribe
+from eventsourcing.exceptions import RepositoryKeyError
+from eventsourcing.infrastructure.event_sourced_repo import EventSourcedRepository
+
+import copy
+import itertools
+
+
+LoadedAggregates = namedtuple('LoadedAggregates', ['aggregates', 'missing'])
+
+
+class DjangoEventSourcedRepository(EventSourcedRepository):
+    """
+    `EventSourcedRepository` reading straight from the Django event journal.
+
+    With snapshots enabled aggregates are restored from their most recent
+    snapshot and only events stored after the snapshot's `aggregate_version`
+    are replayed.
+
+    `snapshot_every` - automatically take a snapshot on load once that many
+    events had to be replayed on top of the last snapshot.
+
+    `replay_chunk_size` - number of journal rows fetched per query while
+    replaying events (defaults to `REPLAY_CHUNK_SIZE` setting).
+
+    `lightweight_replay` - replay events as `ReplayEvent`s decoding their
+    payload on first access to a payload attribute (defaults to `LIGHTWEIGHT_REPLAY`
+    setting, which applies to `BaseAggregate` subclasses), see `djangoevents.replay`.
+
+    `use_aggregate_cache`, `aggregate_cache_size` & `aggregate_cache_ttl` -
+    keep loaded aggregates in an in-process LRU cache (defaults to
+    `AGGREGATE_CACHE` setting). Cached aggregates are updated with events
+    published by this process once they are committed. Before a cached
+    aggregate is returned its last event is compared with the most recent
+    one in the journal, events stored by other processes are applied on top
+    of it. Call `close()` to stop listening to published events.
+
+    `use_shared_aggregate_cache` - look aggregates up in a Django cache
+    shared between processes before replaying their events (defaults to
+    `SHARED_AGGREGATE_CACHE` setting). Entries are keyed by the version of
+    the most recent event in the journal, hence never stale. Consulted
+    after the in-process cache when both are enabled.
+    """
+
+    def __init__(self, event_store, use_snapshots=None, snapshot_every=None, replay_chunk_size=None,
+                 use_aggregate_cache=None, aggregate_cache_size=None, aggregate_cache_ttl=None,
+                 use_shared_aggregate_cache=None, lightweight_replay=None, **kwargs):
+        super().__init__(event_store=event_store, **kwargs)
+
+        if use_snapshots is None:
+            use_snapshots = is_snapshotting_enabled()
+        if snapshot_every is None:
+            snapshot_every = get_snapshot_every_n_events()
+
+        if use_snapshots:
+            if not issubclass(self.domain_class, BaseAggregate):
+                raise ValueError("Snapshots are supported for `BaseAggregate` subclasses only.")
+            self.snapshot_store = DjangoSnapshotStore(transcoder=event_store.transcoder)
+        else:
+            self.snapshot_store = None
+
+        self.snapshot_every = snapshot_every
+        self.replay_chunk_size = replay_chunk_size
+
+        if lightweight_replay is None:
+            lightweight_replay = is_lightweight_replay_enabled() and issubclass(self.domain_class, BaseAggregate)
+        elif lightweight_replay and not issubclass(self.domain_class, BaseAggregate):
+            raise ValueError("Lightweight replay is supported for `BaseAggregate` subclasses only.")
+        self.lightweight_replay = lightweight_replay
+
+        if use_aggregate_cache is None:
+            use_aggregate_cache = is_aggregate_cache_enabled()
+        if aggregate_cache_size is None:
+            aggregate_cache_size = get_aggregate_cache_max_size()
+        if aggregate_cache_ttl is None:
+            aggregate_cache_ttl = get_aggregate_cache_ttl()
+
+        if use_aggregate_cache:
+            self.aggregate_cache = AggregateCache(maxsize=aggregate_cache_size, ttl=aggregate_cache_ttl)
+            subscribe(self._is_aggregate_event, self._on_aggregate_event)
+        else:
+            self.aggregate_cache = None
+
+        if use_shared_aggregate_cache is None:
+            use_shared_aggregate_cache = is_shared_aggregate_cache_enabled()
+
+        if use_shared_aggregate_cache:
+            if not issubclass(self.domain_class, BaseAggregate):
+                raise ValueError("Shared aggregate cache is supported for `BaseAggregate` subclasses only.")
+            self.shared_aggregate_cache = SharedAggregateCache(
+                transcoder=event_store.transcoder,
+                cache_alias=get_shared_aggregate_cache_alias(),
+                timeout=get_shared_aggregate_cache_timeout(),
+            )
+        else:
+            self.shared_aggregate_cache = None
+
+        self.instrumentation = get_instrumentation()
+
+    @property
+    def stored_event_repo(self):
+        return self.event_store.stored_event_repo
+
+    @property
+    def transcoder(self):
+        return self.event_store.transcoder
+
+    def __contains__(self, entity_id):
+        """
+        Checks whether the aggregate exists without replaying its events.
+        """
+        if not issubclass(self.domain_class, BaseAggregate):
+            # Other entities may have been discarded, which only replaying reveals.
+            return super().__contains__(entity_id)
+
+        stored_entity_id = self.event_player.make_stored_entity_id(entity_id)
+        if self.aggregate_cache is not None and self.aggregate_cache.peek(stored_entity_id) is not None:
+            return True
+        return self.stored_event_repo.entity_exists(stored_entity_id)
+
+    def get_entity(self, entity_id, until=None):
+        if until is not None:
+            return super().get_entity(entity_id, until=until)
+
+        stored_entity_id = self.event_player.make_stored_entity_id(entity_id)
+        if self.aggregate_cache is not None or self.shared_aggregate_cache is not None:
+            return self._get_cached_entity(entity_id, stored_entity_id)
+        return self._load_entity(stored_entity_id)
+
+    def _load_entity(self, stored_entity_id):
+        after_version, aggregate = None, None
+        if self.snapshot_store is not None:
+            snapshot = self.snapshot_store.get_snapshot(self.domain_class, stored_entity_id)
+            if snapshot is not None:
+                after_version, aggregate = snapshot
+
+        with self.instrumentation.timer('replay_duration', aggregate_type=self.domain_class.__name__):
+            aggregate, replayed = self.replay_events(stored_entity_id, after_version=after_version,
+                                                     initial_state=aggregate)
+        self.instrumentation.observe('events_per_load', replayed, {'aggregate_type': self.domain_class.__name__})
+
+        if aggregate is not None and self.snapshot_every and replayed >= self.snapshot_every:
+            self.snapshot_store.take_snapshot(aggregate)
+
+        return aggregate
+
+    def fastforward(self, stale_entity, until=None):
+        """
+        Applies events stored after the version of `stale_entity` to a copy of it.
+        """
+        if until is not None:
+            return super().fastforward(stale_entity, until=until)
+
+        stored_entity_id = self.event_player.make_stored_entity_id(stale_entity.id)
+        initial_state = object.__new__(type(stale_entity))
+        initial_state.__dict__.update(stale_entity.__dict__)
+
+        # Version of the entity is the version of the last applied event + 1.
+        aggregate, _ = self.replay_events(stored_entity_id, after_version=stale_entity.version - 1,
+                                          initial_state=initial_state)
+        return aggregate
+
+    def replay_events(self, stored_entity_id, after_version=None, initial_state=None):
+        """
+        Applies events stored after `after_version` to `initial_state`.
+        Returns the resulting aggregate and the number of applied events.
+        """
+        # Events are streamed from the journal and applied one by one.
+        stored_events = self.stored_event_repo.stream_entity_events(
+            stored_entity_id,
+            after_version=after_version,
+            chunk_size=self.replay_chunk_size,
+        )
+        return self._apply_stored_events(initial_state, stored_events)
+
+    def _apply_stored_events(self, aggregate, stored_events):
+        deserialize = self.transcoder.deserialize_for_replay if self.lightweight_replay else self.transcoder.deserialize
+        replayed = 0
+        for stored_event in stored_events:
+            aggregate = self.domain_class.mutate(aggregate, deserialize(stored_event))
+            replayed += 1
+
+        return aggregate, replayed
+
+    def get_many(self, entity_ids, chunk_size=500):
+        """
+        Loads many aggregates with one journal query per `chunk_size` IDs.
+        Returns `LoadedAggregates` - a dict of found aggregates keyed by ID
+        and a list of IDs which do not exist.
+
+        Aggregates are restored from snapshots when enabled, but always
+        replayed from the journal, bypassing aggregate caches.
+        """
+        entity_ids = list(OrderedDict.fromkeys(entity_ids))
+        aggregates = {}
+        for offset in range(0, len(entity_ids), chunk_size):
+            aggregates.update(self._load_entities(entity_ids[offset:offset + chunk_size]))
+
+        missing = [entity_id for entity_id in entity_ids if entity_id not in aggregates]
+        return LoadedAggregates(aggregates=aggregates, missing=missing)
+
+    def _load_entities(self, entity_ids):
+        stored_entity_ids = {self.event_player.make_stored_entity_id(entity_id): entity_id for entity_id in entity_ids}
+
+        snapshots = {}
+        if self.snapshot_store is not None:
+            snapshots = self.snapshot_store.get_snapshots(self.domain_class, stored_entity_ids)
+
+        stored_events = self.stored_event_repo.stream_entities_events(
+            stored_entity_ids,
+            after_versions={stored_entity_id: s.aggregate_version for stored_entity_id, s in snapshots.items()},
+        )
+
+        aggregates = {}
+        for stored_entity_id, events in itertools.groupby(stored_events, key=lambda e: e.stored_entity_id):
+            snapshot = snapshots.pop(stored_entity_id, None)
+            aggregate, replayed = self._apply_stored_events(snapshot.aggregate if snapshot else None, events)
+            self.instrumentation.observe('events_per_load', replayed, {'aggregate_type': self.domain_class.__name__})
+            if aggregate is not None:
+                aggregates[stored_entity_ids[stored_entity_id]] = aggregate
+
+        # Aggregates with no events after their snapshot.
+        for stored_entity_id, snapshot in snapshots.items():
+            aggregates[stored_entity_ids[stored_entity_id]] = snapshot.aggregate
+
+        return aggregates
+
+    def execute(self, entity_id, command, max_retries=3):
+        """
+        Runs `command(aggregate)` on the current state of the aggregate and
+        returns its result. Each attempt runs in a transaction. When storing
+        events fails with `ConcurrencyConflict`, only events stored in the
+        meantime are applied to the aggregate and the command is run again,
+        up to `max_retries` times.
+        """
+        aggregate = self[entity_id]
+        for attempt in itertools.count():
+            pristine = copy.deepcopy(aggregate)
+            try:
+                with transaction.atomic():
+                    return command(aggregate)
+            except ConcurrencyConflict:
+                if attempt >= max_retries:
+                    raise
+                aggregate = self.fastforward(pristine)
+
+    def take_snapshot(self, entity_id):
+        """
+        Takes a snapshot of the current state of the aggregate on demand.
+        """
+        if self.snapshot_store is None:
+            raise ValueError("Snapshots are disabled for {}.".format(self.__class__.__name__))
+
+        aggregate = self.get_entity(entity_id)
+        if aggregate is None:
+            raise RepositoryKeyError(entity_id)
+
+        return self.snapshot_store.take_snapshot(aggregate)
+
+    def close(self):
+        """
+        Stops updating the aggregate cache with published events.
+        """
+        if self.aggregate_cache is not None:
+            unsubscribe(self._is_aggregate_event, self._on_aggregate_event)
+            self.aggregate_cache.clear()
+
+    def _get_cached_entity(self, entity_id, stored_entity_id):
+        last_event = self.stored_event_repo.get_last_entity_event(stored_entity_id)
+        if last_event is None:
+            if self.aggregate_cache is not None:
+                self.aggregate_cache.discard(stored_entity_id)
+            return None
+
+        last_version, last_event_id = last_event
+        cached = None
+        if self.aggregate_cache is not None:
+            cached = self.aggregate_cache.get(stored_entity_id)
+            if cached is not None and cached.last_event_id == last_event_id:
+                return copy.deepcopy(cached.aggregate)
+
+        aggregate = None
+        if cached is not None:
+            aggregate = self._fastforward_cached(stored_entity_id, cached)
+        if aggregate is None and self.shared_aggregate_cache is not None:
+            aggregate = self.shared_aggregate_cache.get(self.domain_class, entity_id, last_version, last_event_id)
+        if aggregate is None:
+            aggregate = self._load_entity(stored_entity_id)
+            if aggregate is not None and aggregate.version - 1 == last_version \
+                    and self.shared_aggregate_cache is not None:
+                self.shared_aggregate_cache.set(aggregate, last_event_id)
+
+        if self.aggregate_cache is None:
+            return aggregate
+
+        if aggregate is None or aggregate.version - 1 != last_version:
+            # Discarded or changed while being loaded.
+            self.aggregate_cache.discard(stored_entity_id)
+            return aggregate
+
+        self.aggregate_cache.set(stored_entity_id, aggregate, last_event_id)
+        return copy.deepcopy(aggregate)
+
+    def _fastforward_cached(self, stored_entity_id, cached):
+        """
+        Applies events stored after the cached aggregate to a copy of it,
+        provided its last event is still in the journal.
+        """
+        cached_version = cached.aggregate.version - 1
+        stored_events = self.stored_event_repo.stream_entity_events(
+            stored_entity_id,
+            after_version=cached_version - 1,
+            chunk_size=self.replay_chunk_size,
+        )
+        first_event = next(stored_events, None)
+        if first_event is None or first_event.event_id != cached.last_event_id:
+            stored_events.close()
+            return None
+
+        aggregate, _ = self._apply_stored_events(copy.deepcopy(cached.aggregate), stored_events)
+        return aggregate
+
+    def _is_aggregate_event(self, event):
+        if not isinstance(event, DomainEvent):
+            return False
+        return get_event_metadata(type(event)).id_prefix == self.event_player.id_prefix
+
+    def _on_aggregate_event(self, event):
+        # Events of rolled back transactions never reach the cache.
+        transaction.on_commit(lambda: self._apply_published_event(event))
+
+    def _apply_published_event(self, event):
+        stored_entity_id = self.event_player.make_stored_entity_id(event.entity_id)
+        cached = self.aggregate_cache.peek(stored_entity_id)
+        if cached is None:
+            return
+
+        if cached.aggregate.version != event.entity_version:
+            self.aggregate_cache.discard(stored_entity_id)
+            return
+
+        try:
+            aggregate = self.domain_class.mutate(copy.deepcopy(cached.aggregate), event)
+        except Exception:
+            # Failing to update the cache must not fail publishing, aggregate will be reloaded.
+            self.aggregate_cache.discard(stored_entity_id)
+            return
+
+        if aggregate is None:
+            self.aggregate_cache.discard(stored_entity_id)
+        else:
+            self.aggregate_cache.set(stored_entity_id, aggregate, event.domain_event_id)
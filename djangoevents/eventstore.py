@@ -0,0 +1,22 @@
+from .dispatch import dispatch_after_commit
+from eventsourcing.domain.model.events import DomainEvent
+from eventsourcing.domain.services.eventstore import EventStore
+
+
+class DjangoEventStore(EventStore):
+    """
+    `EventStore` passing appended events to async handlers, see `djangoevents.dispatch`.
+    """
+
+    def append(self, domain_event):
+        super().append(domain_event)
+        dispatch_after_commit([domain_event])
+
+    def append_many(self, domain_events):
+        """
+        Serializes given domain events and appends them to the stored event repo in one batch.
+        """
+        assert all(isinstance(e, DomainEvent) for e in domain_events)
+        stored_events = [self.transcoder.serialize(e) for e in domain_events]
+        self.stored_event_repo.append_many(stored_events)
+        dispatch_after_commit(domain_events)
@@ -1,3 +1,6 @@
+from django.db.utils import IntegrityError
+
+
 class DjangoeventsError(Exception):
     pass
 
@@ -8,3 +11,33 @@ class AlreadyExists(DjangoeventsError):
 
 class EventSchemaError(DjangoeventsError):
     pass
+
+
+class OutboxDispatchError(DjangoeventsError):
+    pass
+
+
+class SnapshotStateError(DjangoeventsError):
+    """
+    Aggregate state returned by `get_snapshot_state()` does not survive a
+    JSON round trip unchanged.
+    """
+
+
+class ConcurrencyConflict(DjangoeventsError, IntegrityError):
+    """
+    Another event with the same `aggregate_version` has been stored first.
+    `current_version` is the `aggregate_version` of the most recent event of
+    the aggregate in the journal.
+
+    Subclasses `IntegrityError` which used to be raised instead.
+    """
+
+    def __init__(self, aggregate_id, attempted_version, current_version):
+        self.aggregate_id = aggregate_id
+        self.attempted_version = attempted_version
+        self.current_version = current_version
+        msg = "Aggregate with id %r is at version %s, cannot store version %s" % (
+            aggregate_id, current_version, attempted_version,
+        )
+        super().__init__(msg)
@@ -0,0 +1,232 @@
+"""
+Timers and counters of storing, loading and validating events.
+
+Metrics are reported to the instrumentation configured with
+`INSTRUMENTATION.BACKEND`, which does nothing by default. `METRICS` lists
+the reported metrics, tagged with `aggregate_type` and (apart from metrics
+of whole aggregates) `event_type`.
+
+Adapters for StatsD and Prometheus clients are provided. Other backends
+subclass `Instrumentation` and implement `timing()`, `increment()` and
+`observe()`.
+"""
+from django.utils.module_loading import import_string
+from djangoevents.registry import get_event_metadata
+from djangoevents.registry import get_event_type
+from djangoevents.settings import get_instrumentation_backend
+
+import threading
+import time
+
+try:
+    import statsd
+except ImportError:
+    statsd = None
+
+try:
+    import prometheus_client
+except ImportError:
+    prometheus_client = None
+
+
+METRICS = {
+    'validation_duration': "Time of validating an event against its schema.",
+    'transcode_duration': "Time of serializing or deserializing an event, see `operation` tag.",
+    'write_duration': "Time of inserting an event or a batch of events into the journal.",
+    'replay_duration': "Time of loading an aggregate from the journal.",
+    'events_per_load': "Number of events replayed to load an aggregate.",
+    'concurrency_conflicts': "Number of events rejected with `ConcurrencyConflict`.",
+}
+
+
+class Instrumentation(object):
+    """
+    Base class of instrumentation backends. `tags` are dicts of tag names
+    and values, each metric is always reported with the same tag names.
+    """
+    enabled = True
+
+    def timing(self, name, seconds, tags):
+        raise NotImplementedError()
+
+    def increment(self, name, value, tags):
+        raise NotImplementedError()
+
+    def observe(self, name, value, tags):
+        """
+        Records a value of a distribution, e.g. number of events in a load.
+        """
+        raise NotImplementedError()
+
+    def timer(self, name, **tags):
+        """
+        Context manager reporting duration of its block as `name` timing.
+        More tags can be added in the block with `tag()` & `tag_event()`.
+        Blocks raising an exception are not reported.
+        """
+        return Timer(self, name, tags)
+
+
+class Timer(object):
+    __slots__ = ('instrumentation', 'name', 'tags', 'started')
+
+    def __init__(self, instrumentation, name, tags):
+        self.instrumentation = instrumentation
+        self.name = name
+        self.tags = tags
+        self.started = None
+
+    def tag(self, **tags):
+        self.tags.update(tags)
+
+    def tag_event(self, domain_event):
+        """
+        Tags the timing with `aggregate_type` and `event_type` of `domain_event`.
+        """
+        self.tags.update(aggregate_type=get_event_metadata(type(domain_event)).aggregate_type,
+                         event_type=get_event_type(domain_event))
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.instrumentation.timing(self.name, time.perf_counter() - self.started, self.tags)
+
+
+class _NullTimer(object):
+    __slots__ = ()
+
+    def tag(self, **tags):
+        pass
+
+    def tag_event(self, domain_event):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+
+_null_timer = _NullTimer()
+
+
+class NullInstrumentation(Instrumentation):
+    """
+    Default backend, discards all metrics.
+    """
+    enabled = False
+
+    def timing(self, name, seconds, tags):
+        pass
+
+    def increment(self, name, value, tags):
+        pass
+
+    def observe(self, name, value, tags):
+        pass
+
+    def timer(self, name, **tags):
+        return _null_timer
+
+
+class StatsdInstrumentation(Instrumentation):
+    """
+    Sends metrics with a StatsD `client` (`statsd.StatsClient()` by default).
+    Timings are sent in milliseconds.
+
+    Plain StatsD has no tags, tag values are appended to metric names, e.g.
+    `djangoevents.replay_duration.Order`. With `use_tags` tags are passed to
+    the client instead, as DogStatsD clients accept them (`aggregate_type:Order`).
+    """
+
+    def __init__(self, client=None, prefix='djangoevents', use_tags=False):
+        if client is None:
+            if statsd is None:
+                raise ImportError("`StatsdInstrumentation` requires the statsd package to be installed.")
+            client = statsd.StatsClient()
+
+        self.client = client
+        self.prefix = prefix
+        self.use_tags = use_tags
+        self._increment = getattr(client, 'incr', None) or client.increment
+        self._observe = getattr(client, 'histogram', None) or client.timing
+
+    def timing(self, name, seconds, tags):
+        self._send(self.client.timing, name, seconds * 1000, tags)
+
+    def increment(self, name, value, tags):
+        self._send(self._increment, name, value, tags)
+
+    def observe(self, name, value, tags):
+        self._send(self._observe, name, value, tags)
+
+    def _send(self, method, name, value, tags):
+        parts = [self.prefix, name] if self.prefix else [name]
+        if self.use_tags:
+            method('.'.join(parts), value, tags=['{}:{}'.format(key, tags[key]) for key in sorted(tags)])
+        else:
+            method('.'.join(parts + [str(tags[key]) for key in sorted(tags)]), value)
+
+
+class PrometheusInstrumentation(Instrumentation):
+    """
+    Records metrics in a `prometheus_client` registry (the default one unless
+    given). Timings are histograms in seconds (`<namespace>_<name>_seconds`),
+    counters are `<namespace>_<name>` counters and other values histograms
+    with `value_buckets`. Tags become labels.
+    """
+
+    value_buckets = (1, 10, 100, 1000, 10000, 100000, float('inf'))
+
+    def __init__(self, registry=None, namespace='djangoevents'):
+        if prometheus_client is None:
+            raise ImportError("`PrometheusInstrumentation` requires the prometheus_client package to be installed.")
+
+        self.registry = registry or prometheus_client.REGISTRY
+        self.namespace = namespace
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def timing(self, name, seconds, tags):
+        self._get_metric(prometheus_client.Histogram, name + '_seconds', name, tags).observe(seconds)
+
+    def increment(self, name, value, tags):
+        self._get_metric(prometheus_client.Counter, name, name, tags).inc(value)
+
+    def observe(self, name, value, tags):
+        metric = self._get_metric(prometheus_client.Histogram, name, name, tags, buckets=self.value_buckets)
+        metric.observe(value)
+
+    def _get_metric(self, metric_cls, metric_name, name, tags, **kwargs):
+        metric = self._metrics.get(metric_name)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.get(metric_name)
+                if metric is None:
+                    metric = metric_cls(metric_name, METRICS.get(name, name), labelnames=sorted(tags),
+                                        namespace=self.namespace, registry=self.registry, **kwargs)
+                    self._metrics[metric_name] = metric
+        return metric.labels(**tags) if tags else metric
+
+
+_instrumentations = {}
+
+
+def get_instrumentation():
+    """
+    Returns instrumentation configured with `INSTRUMENTATION.BACKEND`: dotted
+    path to either an `Instrumentation` instance or a class instantiated
+    without arguments. Classes are instantiated once.
+    """
+    backend = get_instrumentation_backend()
+    instrumentation = _instrumentations.get(backend)
+    if instrumentation is None:
+        instrumentation = import_string(backend)
+        if isinstance(instrumentation, type):
+            instrumentation = instrumentation()
+        instrumentation = _instrumentations.setdefault(backend, instrumentation)
+    return instrumentation
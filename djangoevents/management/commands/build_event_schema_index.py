@@ -0,0 +1,23 @@
+"""
+Writes the index of event schema files read at startup instead of the files.
+"""
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+from djangoevents.schema import write_schema_index
+from djangoevents.settings import get_schema_index_path
+
+
+class Command(BaseCommand):
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=None,
+                            help="Path of the index file, `SCHEMA_INDEX` setting by default.")
+
+    def handle(self, *args, **options):
+        index_path = options['output'] or get_schema_index_path()
+        if index_path is None:
+            raise CommandError("Please define `SCHEMA_INDEX` or pass --output.")
+
+        print("=> Indexing event schemas...")
+        index = write_schema_index(index_path)
+        print("=> Done. Indexed {} schema files in {}.".format(len(index['files']), index_path))
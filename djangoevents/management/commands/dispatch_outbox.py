@@ -0,0 +1,39 @@
+"""
+Sends events queued in the transactional outbox to the configured transport.
+"""
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+from djangoevents.exceptions import OutboxDispatchError
+from djangoevents.outbox import OutboxDispatcher
+
+import time
+
+
+class Command(BaseCommand):
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help="Number of events sent at once (defaults to OUTBOX.BATCH_SIZE).")
+        parser.add_argument('--loop', action='store_true', default=False,
+                            help="Keep polling the outbox instead of exiting once it is empty.")
+        parser.add_argument('--interval', type=float, default=1.0,
+                            help="Seconds to wait between polls or retries with --loop.")
+
+    def handle(self, *args, **options):
+        dispatcher = OutboxDispatcher(batch_size=options['batch_size'])
+
+        while True:
+            try:
+                dispatched = dispatcher.dispatch()
+            except OutboxDispatchError as e:
+                if not options['loop']:
+                    raise CommandError(str(e))
+                print("--> {}".format(e))
+                dispatched = 0
+            else:
+                if dispatched or not options['loop']:
+                    print("=> Dispatched {} events.".format(dispatched))
+
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,28 @@
+"""
+Resets a projection and replays the event journal into it.
+"""
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import import_string
+from djangoevents.app import EventSourcingWithDjango
+
+
+class Command(BaseCommand):
+
+    def add_arguments(self, parser):
+        parser.add_argument('projection', help="Dotted path to a `Projection` subclass.")
+        parser.add_argument('--workers', type=int, default=1,
+                            help="Number of threads events are split between by aggregate ID.")
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help="Number of journal rows read & handled at once.")
+
+    def handle(self, *args, **options):
+        projection = import_string(options['projection'])()
+
+        app = EventSourcingWithDjango()
+        try:
+            runner = app.get_projection_runner(projection, batch_size=options['batch_size'])
+            print("=> Rebuilding projection {}...".format(projection.name))
+            handled = runner.rebuild(workers=options['workers'])
+        finally:
+            app.close()
+        print("=> Done. Handled {} events.".format(handled))
@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10.8 on 2026-10-18 05:31
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('djangoevents', '0003_auto_20171220_0404'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Snapshot',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('aggregate_id', models.CharField(max_length=255)),
+                ('aggregate_type', models.CharField(max_length=255)),
+                ('aggregate_version', models.IntegerField()),
+                ('snapshot_version', models.IntegerField()),
+                ('snapshot_data', models.TextField()),
+                ('create_date', models.DateTimeField()),
+                ('stored_entity_id', models.CharField(db_column='_stored_entity_id', max_length=255)),
+            ],
+            options={
+                'db_table': 'event_snapshot',
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='snapshot',
+            unique_together=set([('stored_entity_id', 'aggregate_version', 'snapshot_version')]),
+        ),
+    ]
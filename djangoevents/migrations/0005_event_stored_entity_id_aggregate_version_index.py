@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10.8 on 2026-10-18 05:34
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('djangoevents', '0004_snapshot'),
+    ]
+
+    operations = [
+        # Composite index covers lookups by `stored_entity_id` alone, so the
+        # single column index is dropped once the composite one exists.
+        migrations.AlterIndexTogether(
+            name='event',
+            index_together=set([('stored_entity_id', 'aggregate_version')]),
+        ),
+        migrations.AlterField(
+            model_name='event',
+            name='stored_entity_id',
+            field=models.CharField(db_column='_stored_entity_id', max_length=255),
+        ),
+    ]
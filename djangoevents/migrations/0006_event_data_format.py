@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10.8 on 2026-10-18 05:36
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('djangoevents', '0005_event_stored_entity_id_aggregate_version_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='event_data_binary',
+            field=models.BinaryField(null=True),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='event_data_format',
+            field=models.CharField(default='json', max_length=32),
+        ),
+    ]
@@ -6,6 +6,8 @@ class Event(models.Model):
     event_type = models.CharField(max_length=255)
     event_version = models.IntegerField(null=True)
     event_data = models.TextField()
+    event_data_format = models.CharField(max_length=32, default='json')
+    event_data_binary = models.BinaryField(null=True)
     aggregate_id = models.CharField(max_length=255, db_index=True)
     aggregate_type = models.CharField(max_length=255)
     aggregate_version = models.IntegerField()
@@ -13,11 +15,54 @@ class Event(models.Model):
     metadata = models.TextField()
     module_name = models.CharField(max_length=255, db_column='_module_name')
     class_name = models.CharField(max_length=255, db_column='_class_name')
-    stored_entity_id = models.CharField(max_length=255, db_column='_stored_entity_id', db_index=True)
+    stored_entity_id = models.CharField(max_length=255, db_column='_stored_entity_id')
 
     class Meta:
         unique_together = (("aggregate_id", "aggregate_type", "aggregate_version"),)
+        index_together = (("stored_entity_id", "aggregate_version"),)
         db_table = 'event_journal'
 
     def __str__(self):
         return '%s.%s | %s | %s' % (self.aggregate_type, self.event_type, self.event_id, self.create_date)
+
+
+class Snapshot(models.Model):
+    aggregate_id = models.CharField(max_length=255)
+    aggregate_type = models.CharField(max_length=255)
+    aggregate_version = models.IntegerField()
+    snapshot_version = models.IntegerField()
+    snapshot_data = models.TextField()
+    create_date = models.DateTimeField()
+    stored_entity_id = models.CharField(max_length=255, db_column='_stored_entity_id')
+
+    class Meta:
+        unique_together = (("stored_entity_id", "aggregate_version", "snapshot_version"),)
+        db_table = 'event_snapshot'
+
+    def __str__(self):
+        return '%s | %s | %s' % (self.aggregate_type, self.aggregate_id, self.aggregate_version)
+
+
+class Checkpoint(models.Model):
+    name = models.CharField(max_length=255, unique=True)
+    position = models.BigIntegerField(default=0)
+    update_date = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'event_checkpoint'
+
+    def __str__(self):
+        return '%s | %s' % (self.name, self.position)
+
+
+class OutboxMessage(models.Model):
+    event_id = models.CharField(max_length=255)
+    create_date = models.DateTimeField()
+    attempts = models.IntegerField(default=0)
+    last_error = models.TextField(blank=True, default='')
+
+    class Meta:
+        db_table = 'event_outbox'
+
+    def __str__(self):
+        return '%s | %s' % (self.event_id, self.attempts)
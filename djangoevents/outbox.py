@@ -0,0 +1,129 @@
+"""
+Transactional outbox for publishing stored events to external consumers.
+
+With `OUTBOX.ENABLED` every event inserted into the journal gets a row in
+the `event_outbox` table in the same transaction. `OutboxDispatcher`
+(run by the `dispatch_outbox` management command) drains the table in
+batches to a transport and deletes rows only after the transport accepted
+them. Delivery is at-least-once: a batch that failed part way through is
+sent again in full, so consumers have to tolerate duplicates.
+"""
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import F
+from django.utils.module_loading import import_string
+from djangoevents.exceptions import OutboxDispatchError
+from djangoevents.settings import get_outbox_batch_size
+from djangoevents.settings import get_outbox_transport
+from .repository import from_model_instance
+from .unifiedtranscoder import UnifiedTranscoder
+
+
+class LocalTransport(object):
+    """
+    In-process stand-in for a message broker. Sent events are decoded and
+    passed to handlers whose predicate matches, like `subscribe()` does for
+    events being stored.
+    """
+
+    def __init__(self, transcoder=None):
+        self._transcoder = transcoder
+        self.handlers = []
+
+    @property
+    def transcoder(self):
+        # Created lazily as the transcoder reads Django settings.
+        if self._transcoder is None:
+            self._transcoder = UnifiedTranscoder(json_encoder_cls=DjangoJSONEncoder)
+        return self._transcoder
+
+    def subscribe(self, event_predicate, handler):
+        if (event_predicate, handler) not in self.handlers:
+            self.handlers.append((event_predicate, handler))
+
+    def unsubscribe(self, event_predicate, handler):
+        if (event_predicate, handler) in self.handlers:
+            self.handlers.remove((event_predicate, handler))
+
+    def send(self, stored_events):
+        for stored_event in stored_events:
+            event = self.transcoder.deserialize(stored_event)
+            for event_predicate, handler in list(self.handlers):
+                if event_predicate(event):
+                    handler(event)
+
+
+local_transport = LocalTransport()
+
+
+def get_transport():
+    """
+    Returns transport configured with `OUTBOX.TRANSPORT`: dotted path to
+    either a transport instance or a class instantiated without arguments.
+    """
+    transport = import_string(get_outbox_transport())
+    if isinstance(transport, type):
+        transport = transport()
+    return transport
+
+
+class OutboxDispatcher(object):
+    """
+    Sends events queued in the outbox to `transport` - any object with a
+    `send(stored_events)` method taking a list of `UnifiedStoredEvent`s.
+    """
+
+    def __init__(self, transport=None, batch_size=None):
+        from .models import Event, OutboxMessage  # import models at runtime for making top level import possible
+        self.EventModel = Event
+        self.OutboxModel = OutboxMessage
+        self.transport = transport if transport is not None else get_transport()
+        self.batch_size = batch_size or get_outbox_batch_size()
+
+    def dispatch_batch(self):
+        """
+        Sends up to `batch_size` oldest queued events. Returns the number of
+        sent events or raises `OutboxDispatchError` if the transport failed,
+        in which case the batch stays queued with its `attempts` increased.
+        """
+        error = None
+        with transaction.atomic():
+            messages = list(self.OutboxModel.objects.select_for_update().order_by('id')[:self.batch_size])
+            if not messages:
+                return 0
+
+            message_ids = [message.id for message in messages]
+            events = {
+                event.event_id: from_model_instance(event)
+                for event in self.EventModel.objects.filter(event_id__in=[m.event_id for m in messages])
+            }
+            # Messages of events missing from the journal are dropped.
+            stored_events = [events[m.event_id] for m in messages if m.event_id in events]
+
+            try:
+                # Savepoint, so that database changes of a failed transport are rolled back.
+                with transaction.atomic():
+                    self.transport.send(stored_events)
+            except Exception as e:
+                self.OutboxModel.objects.filter(id__in=message_ids).update(
+                    attempts=F('attempts') + 1,
+                    last_error=repr(e),
+                )
+                error = e
+            else:
+                self.OutboxModel.objects.filter(id__in=message_ids).delete()
+
+        if error is not None:
+            raise OutboxDispatchError("Sending outbox batch failed: %r" % error) from error
+        return len(messages)
+
+    def dispatch(self):
+        """
+        Sends queued events batch by batch until the outbox is empty. Returns the number of sent events.
+        """
+        dispatched = 0
+        while True:
+            sent = self.dispatch_batch()
+            dispatched += sent
+            if sent < self.batch_size:
+                return dispatched
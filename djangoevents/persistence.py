@@ -0,0 +1,44 @@
+from collections import OrderedDict
+from contextlib import contextmanager
+from eventsourcing.application.subscribers.persistence import PersistenceSubscriber
+import threading
+
+
+_batch = threading.local()
+
+
+class DjangoPersistenceSubscriber(PersistenceSubscriber):
+    """
+    `PersistenceSubscriber` that buffers published events while
+    `batched_persistence()` is active in the current thread.
+    """
+
+    def store_domain_event(self, event):
+        pending = getattr(_batch, 'pending', None)
+        if pending is None:
+            self.event_store.append(event)
+        else:
+            pending.setdefault(self, []).append(event)
+
+
+@contextmanager
+def batched_persistence():
+    """
+    Collects events published within the block and writes them with a single
+    `append_many()` call per event store once the block exits cleanly.
+    Events are discarded if the block raises.
+    """
+    if getattr(_batch, 'pending', None) is not None:
+        # Nested block: outer one flushes.
+        yield
+        return
+
+    _batch.pending = OrderedDict()
+    try:
+        yield
+        pending = _batch.pending
+    finally:
+        _batch.pending = None
+
+    for subscriber, events in pending.items():
+        subscriber.event_store.append_many(events)
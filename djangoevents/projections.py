@@ -0,0 +1,162 @@
+"""
+Read models (projections) fed from the event journal.
+
+A `Projection` is kept up to date by `ProjectionRunner.catch_up()` which
+reads the journal from the projection's checkpoint and hands decoded
+events to it in batches, so read models can be written with bulk queries.
+`ProjectionRunner.rebuild()` resets the read model and replays the journal,
+optionally handled by worker threads, split by `aggregate_id` hash.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from django.db import connections
+from django.db import transaction
+from .reader import DjangoCheckpointStore
+from .reader import JournalReader
+
+import zlib
+
+
+class Projection(object):
+    """
+    Base class of read models built from events.
+
+    `name` - identifies the projection's checkpoint.
+    `aggregate_types` & `event_types` - optionally limit events passed to the projection.
+    `batch_size` - number of journal rows read & handled at once.
+    """
+    name = None
+    aggregate_types = None
+    event_types = None
+    batch_size = 1000
+
+    def handle_batch(self, events):
+        """
+        Applies a list of domain events. Called in a transaction which also
+        saves the checkpoint. Override to write the read model in bulk.
+        """
+        for event in events:
+            self.handle(event)
+
+    def handle(self, event):
+        raise NotImplementedError("Projection has to implement `handle()` or `handle_batch()`.")
+
+    def reset(self):
+        """
+        Removes all data of the read model before it is rebuilt.
+        """
+        raise NotImplementedError("Projection has to implement `reset()` to be rebuilt.")
+
+
+def get_partition(aggregate_id, partitions):
+    """
+    Returns partition (0 to `partitions` - 1) of given aggregate. Stable between processes.
+    """
+    return zlib.crc32(str(aggregate_id).encode('utf-8')) % partitions
+
+
+class ProjectionRunner(object):
+    """
+    Feeds `projection` with events read from the journal after its checkpoint.
+
+    With `partitions` > 1 only events of aggregates in `partition` are
+    handled, under a checkpoint of their own. Events of an aggregate always
+    fall into the same partition, so they are handled in order.
+    """
+
+    def __init__(self, projection, stored_event_repo, transcoder, checkpoint_store=None, batch_size=None,
+                 partition=0, partitions=1):
+        if projection.name is None:
+            raise ValueError("Projection %r has no name." % projection)
+
+        self.projection = projection
+        self.stored_event_repo = stored_event_repo
+        self.transcoder = transcoder
+        self.checkpoint_store = checkpoint_store or DjangoCheckpointStore()
+        self.batch_size = batch_size or projection.batch_size
+        self.partition = partition
+        self.partitions = partitions
+
+    @property
+    def checkpoint_name(self):
+        if self.partitions == 1:
+            return self.projection.name
+        return '{}:{}/{}'.format(self.projection.name, self.partition, self.partitions)
+
+    @property
+    def position(self):
+        return self.checkpoint_store.get_position(self.checkpoint_name)
+
+    def catch_up(self, until_position=None):
+        """
+        Handles events stored after the checkpoint. Returns the number of handled events.
+        """
+        handled = 0
+        for batch in self._get_reader().read_batches(after_position=self.position, until_position=until_position):
+            events = [
+                self.transcoder.deserialize(positioned_event.stored_event)
+                for positioned_event in batch
+                if self._in_partition(positioned_event.stored_event)
+            ]
+            with transaction.atomic():
+                if events:
+                    self.projection.handle_batch(events)
+                self.checkpoint_store.save_position(self.checkpoint_name, batch[-1].position)
+            handled += len(events)
+
+        return handled
+
+    def rebuild(self, workers=1):
+        """
+        Resets the projection and replays the journal into it. With `workers`
+        > 1 the journal is still read once, events of every batch are split
+        between that many threads by aggregate, so `handle_batch()` has to be
+        thread safe. Returns the number of handled events.
+        """
+        self.projection.reset()
+        self.checkpoint_store.reset(self.checkpoint_name)
+        if workers == 1:
+            return self.catch_up()
+
+        # Events before this position can't show up later, see `djangoevents.reader`.
+        reader = self._get_reader()
+        until_position = reader.get_last_settled_position()
+        handled = 0
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            # Next batch is read while the previous one is handled. Batches are handed over one at a time,
+            # so events of an aggregate are handled in order.
+            futures = []
+            for batch in reader.read_batches(until_position=until_position):
+                partitions = [[] for _ in range(workers)]
+                for positioned_event in batch:
+                    stored_event = positioned_event.stored_event
+                    partitions[get_partition(stored_event.aggregate_id, workers)].append(stored_event)
+
+                handled += sum(future.result() for future in futures)
+                futures = [executor.submit(self._handle_in_thread, stored_events)
+                           for stored_events in partitions if stored_events]
+            handled += sum(future.result() for future in futures)
+
+        self.checkpoint_store.save_position(self.checkpoint_name, until_position)
+        return handled
+
+    def _get_reader(self):
+        return JournalReader(
+            self.stored_event_repo,
+            aggregate_types=self.projection.aggregate_types,
+            event_types=self.projection.event_types,
+            batch_size=self.batch_size,
+        )
+
+    def _handle_in_thread(self, stored_events):
+        try:
+            events = [self.transcoder.deserialize(stored_event) for stored_event in stored_events]
+            with transaction.atomic():
+                self.projection.handle_batch(events)
+            return len(events)
+        finally:
+            connections.close_all()
+
+    def _in_partition(self, stored_event):
+        if self.partitions == 1:
+            return True
+        return get_partition(stored_event.aggregate_id, self.partitions) == self.partition
@@ -0,0 +1,182 @@
+"""
+Reading the event journal across all aggregates in global order.
+
+Position of an event is the `id` of its `event_journal` row. Note that rows
+are numbered when they are inserted, not when they are committed: a
+transaction committing after a later one may make an event with a lower
+position visible after higher positions have been read.
+
+Readers do not read past such gaps in positions while they may still be
+filled, i.e. until events stored after them are older than `settle_time`
+seconds (`JOURNAL_SETTLE_TIME` setting). Gaps left by rolled back
+transactions hold readers back for that long. Age of events is judged by
+their `create_date`, so transactions storing events have to commit within
+`settle_time` from creating them.
+"""
+from collections import namedtuple
+from datetime import timedelta
+from django.db import transaction
+from django.utils import timezone
+from djangoevents.settings import get_journal_settle_time
+
+
+PositionedEvent = namedtuple('PositionedEvent', ['position', 'stored_event'])
+
+
+class JournalReader(object):
+    """
+    Streams `UnifiedStoredEvent`s of all aggregates in global order, optionally
+    only these of given `aggregate_types` and/or `event_types`.
+
+    `batch_size` - number of journal rows fetched per query.
+
+    `settle_time` - seconds after which gaps in positions are not waited
+    for anymore (defaults to `JOURNAL_SETTLE_TIME` setting, 0 disables
+    waiting).
+    """
+
+    def __init__(self, stored_event_repo, aggregate_types=None, event_types=None, batch_size=1000,
+                 settle_time=None):
+        self.stored_event_repo = stored_event_repo
+        self.aggregate_types = _to_list(aggregate_types)
+        self.event_types = _to_list(event_types)
+        self.batch_size = batch_size
+        if settle_time is None:
+            settle_time = get_journal_settle_time()
+        self.settle_time = settle_time
+
+    def read(self, after_position=0, until_position=None):
+        """
+        Yields `PositionedEvent`s stored after `after_position`.
+        """
+        for batch in self.read_batches(after_position=after_position, until_position=until_position):
+            yield from batch
+
+    def read_batches(self, after_position=0, until_position=None):
+        """
+        Yields lists of up to `batch_size` `PositionedEvent`s stored after
+        `after_position` until the end of the journal (or `until_position`
+        inclusive) or a gap which may still be filled is reached.
+        """
+        while True:
+            events = self.stored_event_repo.get_events_after_position(
+                after_position,
+                limit=self.batch_size,
+                aggregate_types=self.aggregate_types,
+                event_types=self.event_types,
+                until_position=until_position,
+            )
+            if not events:
+                return
+
+            unsettled_position = None
+            if not _are_consecutive(after_position, events):
+                unsettled_position = self._get_first_unsettled_position(after_position, events[-1][0])
+            if unsettled_position is not None:
+                events = [(position, event) for position, event in events if position < unsettled_position]
+            if events:
+                yield [PositionedEvent(position=position, stored_event=event) for position, event in events]
+
+            if unsettled_position is not None or len(events) < self.batch_size:
+                return
+            after_position = events[-1][0]
+
+    def get_last_settled_position(self):
+        """
+        Returns the position up to which the journal has no gaps which may still be filled.
+        """
+        last_position = self.stored_event_repo.get_last_position()
+        unsettled_position = self._get_first_unsettled_position(0, last_position)
+        return last_position if unsettled_position is None else unsettled_position - 1
+
+    def _get_first_unsettled_position(self, after_position, until_position):
+        """
+        Returns the first missing position after `after_position` followed by
+        events younger than `settle_time`, None if there is no such position.
+        Positions below the first event in the journal are never waited for.
+        """
+        if not self.settle_time:
+            return None
+
+        created_before = timezone.now() - timedelta(seconds=self.settle_time)
+        settled_position = max(after_position, self.stored_event_repo.get_last_position(created_before=created_before))
+        if settled_position >= until_position:
+            return None
+
+        positions = self.stored_event_repo.get_positions(settled_position, until_position)
+        expected = settled_position + 1 if settled_position else positions[0]
+        for position in positions:
+            if position != expected:
+                return expected
+            expected += 1
+        return None
+
+
+class DjangoCheckpointStore(object):
+    """
+    Stores positions up to which named consumers have read the journal.
+    """
+
+    def __init__(self):
+        from .models import Checkpoint  # import model at runtime for making top level import possible
+        self.CheckpointModel = Checkpoint
+
+    def get_position(self, name):
+        position = self.CheckpointModel.objects.filter(name=name).values_list('position', flat=True).first()
+        return position or 0
+
+    def save_position(self, name, position):
+        self.CheckpointModel.objects.update_or_create(name=name, defaults={'position': position})
+
+    def reset(self, name):
+        self.CheckpointModel.objects.filter(name=name).delete()
+
+
+class CatchUpSubscription(object):
+    """
+    Passes events stored after the checkpoint of subscription `name` to
+    `handler` (called with `PositionedEvent`s).
+
+    Every batch of events is handled in a single transaction together with
+    saving the checkpoint, so changes handlers make in the database are
+    never applied twice.
+    """
+
+    def __init__(self, name, handler, reader, checkpoint_store=None):
+        self.name = name
+        self.handler = handler
+        self.reader = reader
+        self.checkpoint_store = checkpoint_store or DjangoCheckpointStore()
+
+    @property
+    def position(self):
+        return self.checkpoint_store.get_position(self.name)
+
+    def catch_up(self):
+        """
+        Handles all events stored after the checkpoint. Returns the number of handled events.
+        """
+        handled = 0
+        for batch in self.reader.read_batches(after_position=self.position):
+            with transaction.atomic():
+                for event in batch:
+                    self.handler(event)
+                self.checkpoint_store.save_position(self.name, batch[-1].position)
+            handled += len(batch)
+
+        return handled
+
+
+def _are_consecutive(after_position, events):
+    first_position = events[0][0]
+    if after_position and first_position != after_position + 1:
+        return False
+    return events[-1][0] - first_position == len(events) - 1
+
+
+def _to_list(values):
+    if values is None:
+        return None
+    if isinstance(values, str):
+        return [values]
+    return list(values)
@@ -0,0 +1,83 @@
+"""
+Registry of metadata derived from event classes.
+
+Stored events carry the aggregate type, event type and entity ID prefix of
+their event class. These only depend on the class, so they are computed
+once per class and looked up afterwards. Events of all aggregates are
+registered at startup, other event classes on first use.
+
+Event versions are not registered: they change whenever schema files are
+detected again, so `schema.get_event_version()` is called on every use.
+"""
+from .domain import DomainEvent
+from .utils import camel_case_to_snake_case
+from .utils import list_aggregate_events
+from .utils import list_concrete_aggregates
+from collections import namedtuple
+from eventsourcing.domain.services.transcoding import id_prefix_from_event_class
+
+import inspect
+
+
+EventMetadata = namedtuple('EventMetadata', [
+    'aggregate_type',
+    # None if the event class computes its `event_type` per instance.
+    'event_type',
+    'id_prefix',
+    'module_name',
+    'class_name',
+])
+
+_event_metadata = {}
+
+
+def get_event_metadata(event_cls):
+    """
+    Returns `EventMetadata` of given event class, registering it on first use.
+    """
+    try:
+        return _event_metadata[event_cls]
+    except KeyError:
+        return register_event_class(event_cls)
+
+
+def get_event_type(domain_event, event_metadata=None):
+    event_metadata = event_metadata or get_event_metadata(type(domain_event))
+    # `event_type` may be set on the event itself or computed per instance.
+    if event_metadata.event_type is None or 'event_type' in domain_event.__dict__:
+        return getattr(domain_event, 'event_type')
+    return event_metadata.event_type
+
+
+def register_event_class(event_cls):
+    assert issubclass(event_cls, DomainEvent), event_cls
+    aggregate_type = event_cls.__qualname__.split('.')[0]
+
+    event_type = inspect.getattr_static(event_cls, 'event_type', None)
+    if event_type is None:
+        event_type = camel_case_to_snake_case('%s%s' % (aggregate_type, event_cls.__name__))
+    elif not isinstance(event_type, str):
+        event_type = None
+
+    metadata = EventMetadata(
+        aggregate_type=aggregate_type,
+        event_type=event_type,
+        id_prefix=id_prefix_from_event_class(event_cls),
+        module_name=event_cls.__module__,
+        class_name=event_cls.__qualname__,
+    )
+    _event_metadata[event_cls] = metadata
+    return metadata
+
+
+def register_aggregate_events():
+    """
+    Registers events of all aggregates defined within the application.
+    """
+    for aggregate in list_concrete_aggregates():
+        for event_cls in list_aggregate_events(aggregate_cls=aggregate):
+            get_event_metadata(event_cls)
+
+
+def clear_event_metadata():
+    _event_metadata.clear()
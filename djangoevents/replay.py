@@ -0,0 +1,135 @@
+"""
+Lazy events for replaying aggregates.
+
+A `ReplayEvent` wraps a journal row: it is an instance of the event class
+holding only `entity_id`, `entity_version` and `domain_event_id` until any
+other attribute is looked up. Then the whole payload is decoded, event data
+can't be decoded partially. Only handlers which never read the payload
+(e.g. counting events) skip decoding, handlers reading it cost about the
+same as with regular events.
+
+Events of classes defining their own `__init__()` or plain class attributes
+(e.g. defaults the payload may override) are deserialized fully.
+
+Enabled with `LIGHTWEIGHT_REPLAY` setting, see `DjangoEventSourcedRepository`.
+"""
+from .domain import DomainEvent
+from .settings import adds_schema_version_to_event_data
+from eventsourcing.domain.model.entity import EventSourcedEntity
+
+
+# Event classes whose `__init__()` only sets attributes from its arguments.
+_PLAIN_INIT_CLASSES = (EventSourcedEntity.Created,)
+
+_replay_event_classes = {}
+
+
+def supports_replay_event(event_cls):
+    """
+    Returns whether events of `event_cls` can be replayed as `ReplayEvent`s.
+    """
+    return get_replay_event_class(event_cls) is not None
+
+
+def get_replay_event_class(event_cls):
+    """
+    Returns `ReplayEvent` subclass of `event_cls` or None if `event_cls` is
+    not supported. Classes are created once per event class.
+    """
+    try:
+        return _replay_event_classes[event_cls]
+    except KeyError:
+        pass
+
+    replay_cls = None
+    classes = event_cls.__mro__[:event_cls.__mro__.index(DomainEvent)]
+    if all(_is_replayable(klass) for klass in classes):
+        replay_cls = type(event_cls.__name__, (ReplayEvent, event_cls), {
+            '__slots__': ('_stored_event', '_transcoder'),
+            '__module__': event_cls.__module__,
+            '__qualname__': event_cls.__qualname__,
+            '_event_cls': event_cls,
+        })
+
+    _replay_event_classes[event_cls] = replay_cls
+    return replay_cls
+
+
+def _is_replayable(klass):
+    if '__init__' in klass.__dict__ and klass not in _PLAIN_INIT_CLASSES:
+        return False
+    # Payload attributes are looked up in the payload only when the class lacks them.
+    return not any(
+        not name.startswith('_') and not hasattr(value, '__get__') and not isinstance(value, type)
+        for name, value in klass.__dict__.items()
+    )
+
+
+class ReplayEvent(object):
+    """
+    Base of lazy events, see `get_replay_event_class()`. Instances are
+    read-only instances of the event class and compare equal to the domain
+    event they stand in for. `stored_event` is decoded with `transcoder` on
+    first access to a payload attribute.
+    """
+    __slots__ = ()
+
+    def __init__(self, stored_event, transcoder):
+        object.__setattr__(self, '_stored_event', stored_event)
+        object.__setattr__(self, '_transcoder', transcoder)
+        self.__dict__.update(
+            entity_id=stored_event.aggregate_id,
+            entity_version=stored_event.aggregate_version,
+            domain_event_id=stored_event.event_id,
+        )
+
+    def __getattr__(self, name):
+        # Called for attributes missing from the instance and its class.
+        if not name.startswith('__') and name not in ('_stored_event', '_transcoder') and self._decode():
+            return getattr(self, name)
+        raise AttributeError("'{}' object has no attribute '{}'".format(self._event_cls.__qualname__, name))
+
+    def _decode(self):
+        """
+        Adds the payload to the instance dict. Returns False if it is already there.
+        """
+        stored_event = self._stored_event
+        if stored_event is None:
+            return False
+
+        if adds_schema_version_to_event_data():
+            self.__dict__['schema_version'] = None
+        self.__dict__.update(self._transcoder._decode_event_data(stored_event, self._event_cls))
+        # Let the journal row go.
+        object.__setattr__(self, '_stored_event', None)
+        object.__setattr__(self, '_transcoder', None)
+        return True
+
+    def to_event(self):
+        """
+        Returns the domain event this `ReplayEvent` stands in for.
+        """
+        self._decode()
+        return _make_event(self._event_cls, self.__dict__)
+
+    def __reduce__(self):
+        # Copies & pickles are regular domain events.
+        self._decode()
+        return _make_event, (self._event_cls, self.__dict__.copy())
+
+    def __eq__(self, rhs):
+        if isinstance(rhs, ReplayEvent):
+            rhs = rhs.to_event()
+        return self.to_event() == rhs
+
+    def __hash__(self):
+        return hash(self.to_event())
+
+    def __repr__(self):
+        return repr(self.to_event())
+
+
+def _make_event(event_cls, attrs):
+    event = object.__new__(event_cls)
+    event.__dict__.update(attrs)
+    return event
@@ -1,8 +1,15 @@
+from .unifiedtranscoder import JSON_FORMAT
 from .unifiedtranscoder import UnifiedStoredEvent
 from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
 from django.db.utils import IntegrityError
 from django.utils import timezone
 from djangoevents.exceptions import AlreadyExists
+from djangoevents.exceptions import ConcurrencyConflict
+from djangoevents.instrumentation import get_instrumentation
+from djangoevents.settings import get_replay_chunk_size
+from djangoevents.settings import is_outbox_enabled
 from eventsourcing.domain.services.eventstore import AbstractStoredEventRepository
 from eventsourcing.domain.services.eventstore import EntityVersionDoesNotExist
 from eventsourcing.domain.services.transcoding import EntityVersion
@@ -13,8 +20,10 @@ import datetime
 class DjangoStoredEventRepository(AbstractStoredEventRepository):
 
     def __init__(self, *args, **kwargs):
-        from .models import Event  # import model at runtime for making top level import possible
+        from .models import Event, OutboxMessage  # import models at runtime for making top level import possible
         self.EventModel = Event
+        self.OutboxModel = OutboxMessage
+        self.instrumentation = get_instrumentation()
         super(DjangoStoredEventRepository, self).__init__(*args, **kwargs)
 
     def append(self, new_stored_event, new_version_number=None, max_retries=3, artificial_failure_rate=0):
@@ -35,78 +44,331 @@ class DjangoStoredEventRepository(AbstractStoredEventRepository):
         )
 
     def get_entity_version(self, stored_entity_id, version_number):
-        events_query = self.EventModel.objects.filter(stored_entity_id=stored_entity_id)\
-            .filter(aggregate_version=version_number)
-        if not events_query.exists():
+        event_id = self.EventModel.objects.filter(stored_entity_id=stored_entity_id)\
+            .filter(aggregate_version=version_number)\
+            .values_list('event_id', flat=True)\
+            .first()
+        if event_id is None:
             raise EntityVersionDoesNotExist()
 
         return EntityVersion(
             entity_version_id=self.make_entity_version_id(stored_entity_id, version_number),
-            event_id=events_query[0].event_id,
+            event_id=event_id,
         )
 
+    def append_many(self, new_stored_events):
+        """
+        Saves given stored events in this repository with a single INSERT.
+        """
+        # Check the new events are stored event instances.
+        assert all(isinstance(e, UnifiedStoredEvent) for e in new_stored_events)
+
+        if not new_stored_events:
+            return
+
+        timer = self.instrumentation.timer('write_duration',
+                                           aggregate_type=_common_value(e.aggregate_type for e in new_stored_events),
+                                           event_type=_common_value(e.event_type for e in new_stored_events))
+        try:
+            with timer, transaction.atomic():
+                self.EventModel.objects.bulk_create([self.to_model_instance(e) for e in new_stored_events])
+                if is_outbox_enabled():
+                    self.add_to_outbox(new_stored_events)
+        except IntegrityError as err:
+            existing = self.find_existing_aggregates(e for e in new_stored_events if not e.aggregate_version)
+            if existing:
+                msg = "Aggregate with id %r already exists" % existing[0]
+                raise AlreadyExists(msg)
+
+            conflict = self.find_version_conflict(new_stored_events)
+            if conflict is not None:
+                raise conflict from err
+            raise err
+
+    def find_existing_aggregates(self, create_stored_events):
+        """
+        Returns ids of aggregates from given creation events that are already in the journal.
+        """
+        existing = []
+        for stored_event in create_stored_events:
+            query = self.EventModel.objects.filter(
+                aggregate_id=stored_event.aggregate_id,
+                aggregate_type=stored_event.aggregate_type,
+                aggregate_version=stored_event.aggregate_version,
+            )
+            if query.exists():
+                existing.append(stored_event.aggregate_id)
+        return existing
+
+    def find_version_conflict(self, stored_events):
+        """
+        Returns `ConcurrencyConflict` for the first of given events which is
+        not newer than the most recent event of its aggregate in the journal
+        (and counts it as `concurrency_conflicts`), or None.
+        """
+        checked = set()
+        for stored_event in stored_events:
+            if stored_event.stored_entity_id in checked:
+                continue
+            checked.add(stored_event.stored_entity_id)
+
+            last_event = self.get_last_entity_event(stored_event.stored_entity_id)
+            if last_event is not None and stored_event.aggregate_version <= last_event[0]:
+                self.instrumentation.increment('concurrency_conflicts', 1, {
+                    'aggregate_type': stored_event.aggregate_type,
+                    'event_type': stored_event.event_type,
+                })
+                return ConcurrencyConflict(
+                    aggregate_id=stored_event.aggregate_id,
+                    attempted_version=stored_event.aggregate_version,
+                    current_version=last_event[0],
+                )
+        return None
+
     def write_version_and_event(self, new_stored_event, new_version_number=None, max_retries=3,
                                 artificial_failure_rate=0):
+        timer = self.instrumentation.timer('write_duration', aggregate_type=new_stored_event.aggregate_type,
+                                           event_type=new_stored_event.event_type)
+        outbox_enabled = is_outbox_enabled()
         try:
-            self.EventModel.objects.create(
-                event_id=new_stored_event.event_id,
-                event_type=new_stored_event.event_type,
-                event_version=new_stored_event.event_version,
-                event_data=new_stored_event.event_data,
-                aggregate_id=new_stored_event.aggregate_id,
-                aggregate_type=new_stored_event.aggregate_type,
-                aggregate_version=new_stored_event.aggregate_version,
-                create_date=make_aware_if_needed(new_stored_event.create_date),
-                metadata=new_stored_event.metadata,
-                module_name=new_stored_event.module_name,
-                class_name=new_stored_event.class_name,
-                stored_entity_id=new_stored_event.stored_entity_id,
-            )
+            with timer:
+                # Inside a transaction a savepoint keeps it usable after a conflict, `save()` failing without one
+                # marks the transaction for rollback. Outside of one `save()` runs in a transaction of its own.
+                if transaction.get_connection().in_atomic_block or outbox_enabled:
+                    with transaction.atomic():
+                        self._insert_event(new_stored_event, outbox_enabled)
+                else:
+                    self._insert_event(new_stored_event, outbox_enabled)
         except IntegrityError as err:
             create_attempt = not new_version_number
             if create_attempt:
                 msg = "Aggregate with id %r already exists" % new_stored_event.aggregate_id
                 raise AlreadyExists(msg)
-            else:
-                raise err
+
+            conflict = self.find_version_conflict([new_stored_event])
+            if conflict is not None:
+                raise conflict from err
+            raise err
+
+    def _insert_event(self, stored_event, outbox_enabled):
+        self.to_model_instance(stored_event).save(force_insert=True)
+        if outbox_enabled:
+            self.add_to_outbox([stored_event])
+
+    def add_to_outbox(self, stored_events):
+        """
+        Queues given stored events for `OutboxDispatcher`. Has to be called
+        in the transaction inserting the events into the journal.
+        """
+        now = timezone.now()
+        self.OutboxModel.objects.bulk_create([
+            self.OutboxModel(event_id=e.event_id, create_date=now) for e in stored_events
+        ])
+
+    def to_model_instance(self, stored_event):
+        if stored_event.event_data_format == JSON_FORMAT:
+            event_data, event_data_binary = stored_event.event_data, None
+        else:
+            event_data, event_data_binary = '', stored_event.event_data
+
+        return self.EventModel(
+            event_id=stored_event.event_id,
+            event_type=stored_event.event_type,
+            event_version=stored_event.event_version,
+            event_data=event_data,
+            event_data_format=stored_event.event_data_format,
+            event_data_binary=event_data_binary,
+            aggregate_id=stored_event.aggregate_id,
+            aggregate_type=stored_event.aggregate_type,
+            aggregate_version=stored_event.aggregate_version,
+            create_date=make_aware_if_needed(stored_event.create_date),
+            metadata=stored_event.metadata,
+            module_name=stored_event.module_name,
+            class_name=stored_event.class_name,
+            stored_entity_id=stored_event.stored_entity_id,
+        )
 
     def get_entity_events(self, stored_entity_id, after=None, until=None, limit=None, query_ascending=True,
-                          results_ascending=True):
+                          results_ascending=True, after_version=None, until_version=None):
+        """
+        Returns events for given entity ID in `aggregate_version` order.
+
+        `after_version` (exclusive) and `until_version` (inclusive) narrow results
+        to a range of aggregate versions which is an index range scan. They should
+        be preferred over `after` & `until` event IDs which are compared by the
+        timestamp encoded in the IDs.
+        """
         events = self.EventModel.objects.filter(stored_entity_id=stored_entity_id)
         if query_ascending:
-            events = events.order_by('id')
+            events = events.order_by('aggregate_version')
         else:
-            events = events.order_by('-id')
+            events = events.order_by('-aggregate_version')
 
         if after is not None:
-            after_ts = datetime.datetime.fromtimestamp(timestamp_from_uuid(after))
+            after_ts = make_aware_if_needed(datetime.datetime.fromtimestamp(timestamp_from_uuid(after)))
             if query_ascending:
                 events = events.filter(create_date__gt=after_ts)
             else:
                 events = events.filter(create_date__gte=after_ts)
 
         if until is not None:
-            until_ts = datetime.datetime.fromtimestamp(timestamp_from_uuid(until))
+            until_ts = make_aware_if_needed(datetime.datetime.fromtimestamp(timestamp_from_uuid(until)))
             if query_ascending:
                 events = events.filter(create_date__lte=until_ts)
             else:
                 events = events.filter(create_date__lt=until_ts)
 
+        if after_version is not None:
+            events = events.filter(aggregate_version__gt=after_version)
+
+        if until_version is not None:
+            events = events.filter(aggregate_version__lte=until_version)
+
         if limit is not None:
             events = events[:limit]
 
-        events = list(events)
+        events = [from_row(row) for row in events.values_list(*STORED_EVENT_COLUMNS)]
         if results_ascending != query_ascending:
             events.reverse()
-        return [from_model_instance(e) for e in events]
+        return events
+
+    def entity_exists(self, stored_entity_id):
+        """
+        Returns whether there is any event for given entity ID in the journal.
+        """
+        return self.EventModel.objects.filter(stored_entity_id=stored_entity_id).exists()
+
+    def get_last_entity_event(self, stored_entity_id):
+        """
+        Returns `(aggregate_version, event_id)` of the most recent event of given
+        entity ID or None. Reads a single entry of the version index.
+        """
+        return self.EventModel.objects.filter(stored_entity_id=stored_entity_id)\
+            .order_by('-aggregate_version')\
+            .values_list('aggregate_version', 'event_id')\
+            .first()
+
+    def stream_entity_events(self, stored_entity_id, after_version=None, chunk_size=None):
+        """
+        Yields all events for given entity ID in `aggregate_version` order.
+
+        Events are fetched in chunks of `chunk_size` rows using keyset pagination
+        on `aggregate_version` and each chunk is read with `QuerySet.iterator()`
+        (a server-side cursor where the backend supports it), so memory use does
+        not depend on the length of the entity's history.
+        """
+        chunk_size = chunk_size or get_replay_chunk_size()
+
+        while True:
+            events = self.EventModel.objects.filter(stored_entity_id=stored_entity_id)
+            if after_version is not None:
+                events = events.filter(aggregate_version__gt=after_version)
+            rows = events.order_by('aggregate_version').values_list(*STORED_EVENT_COLUMNS)[:chunk_size]
+
+            fetched = 0
+            for row in rows.iterator():
+                fetched += 1
+                stored_event = from_row(row)
+                after_version = stored_event.aggregate_version
+                yield stored_event
+
+            if fetched < chunk_size:
+                return
+
+    def stream_entities_events(self, stored_entity_ids, after_versions=None):
+        """
+        Yields events of all given entities with a single query, ordered by
+        `stored_entity_id` & `aggregate_version`.
+
+        `after_versions` - optional dict of stored entity IDs to versions, only
+        events after these versions are returned for the respective entities.
+        """
+        after_versions = after_versions or {}
+        condition = Q(stored_entity_id__in=[i for i in stored_entity_ids if i not in after_versions])
+        for stored_entity_id, after_version in after_versions.items():
+            condition |= Q(stored_entity_id=stored_entity_id, aggregate_version__gt=after_version)
+
+        events = self.EventModel.objects.filter(condition).order_by('stored_entity_id', 'aggregate_version')
+        for row in events.values_list(*STORED_EVENT_COLUMNS).iterator():
+            yield from_row(row)
+
+    def get_events_after_position(self, after_position, limit, aggregate_types=None, event_types=None,
+                                  until_position=None):
+        """
+        Returns up to `limit` `(position, stored_event)` pairs of all entities
+        stored after `after_position` (and up to `until_position` inclusive)
+        in global order. The position of an event is the `id` of its journal row.
+        """
+        events = self.EventModel.objects.filter(id__gt=after_position)
+        if until_position is not None:
+            events = events.filter(id__lte=until_position)
+        if aggregate_types is not None:
+            events = events.filter(aggregate_type__in=aggregate_types)
+        if event_types is not None:
+            events = events.filter(event_type__in=event_types)
+        rows = events.order_by('id').values_list('id', *STORED_EVENT_COLUMNS)[:limit]
+        return [(row[0], from_row(row[1:])) for row in rows]
+
+    def get_last_position(self, created_before=None):
+        """
+        Returns position of the last event in the journal (optionally of the
+        last one created before `created_before`) or 0 if there is none.
+        """
+        events = self.EventModel.objects.all()
+        if created_before is not None:
+            events = events.filter(create_date__lt=created_before)
+        return events.order_by('-id').values_list('id', flat=True).first() or 0
+
+    def get_positions(self, after_position, until_position):
+        """
+        Returns positions of all events stored after `after_position` up to
+        `until_position` inclusive, in order.
+        """
+        events = self.EventModel.objects.filter(id__gt=after_position, id__lte=until_position)
+        return list(events.order_by('id').values_list('id', flat=True))
+
+
+def _common_value(values):
+    """
+    Returns the value shared by all `values` or 'mixed' if they differ.
+    """
+    values = set(values)
+    return values.pop() if len(values) == 1 else 'mixed'
+
+
+# Journal columns in the order of `UnifiedStoredEvent` fields followed by `event_data_binary`.
+# Reading them with `values_list()` skips instantiating `Event` models.
+STORED_EVENT_COLUMNS = UnifiedStoredEvent._fields + ('event_data_binary',)
+
+_EVENT_DATA = UnifiedStoredEvent._fields.index('event_data')
+_EVENT_DATA_FORMAT = UnifiedStoredEvent._fields.index('event_data_format')
+
+
+def from_row(row):
+    """
+    Returns `UnifiedStoredEvent` for a journal row read with `values_list(*STORED_EVENT_COLUMNS)`.
+    """
+    if row[_EVENT_DATA_FORMAT] == JSON_FORMAT:
+        return UnifiedStoredEvent._make(row[:-1])
+
+    # Some database backends return `memoryview` for binary fields.
+    fields = list(row[:-1])
+    fields[_EVENT_DATA] = bytes(row[-1])
+    return UnifiedStoredEvent._make(fields)
 
 
 def from_model_instance(event):
+    if event.event_data_format == JSON_FORMAT:
+        event_data = event.event_data
+    else:
+        # Some database backends return `memoryview` for binary fields.
+        event_data = bytes(event.event_data_binary)
+
     return UnifiedStoredEvent(
         event_id=event.event_id,
         event_type=event.event_type,
         event_version=event.event_version,
-        event_data=event.event_data,
+        event_data=event_data,
         aggregate_id=event.aggregate_id,
         aggregate_type=event.aggregate_type,
         aggregate_version=event.aggregate_version,
@@ -114,7 +376,8 @@ def from_model_instance(event):
         metadata=event.metadata,
         module_name=event.module_name,
         class_name=event.class_name,
-        stored_entity_id=event.stored_entity_id
+        stored_entity_id=event.stored_entity_id,
+        event_data_format=event.event_data_format,
     )
 
 
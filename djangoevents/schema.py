@@ -3,20 +3,40 @@ Aggregate event avro schema validation
 """
 
 import avro.schema
+import hashlib
 import itertools
+import json
 import os
 import stringcase
+import warnings
 
-from avro.io import Validate as avro_validate
 from .settings import get_avro_dir
+from .settings import get_schema_index_path
+from .settings import is_schema_lazy_loading_enabled
 from .utils import list_concrete_aggregates
 from .utils import list_aggregate_events
 from .utils import event_to_json
 from .exceptions import EventSchemaError
+from .validators import compile_validator
 
 
 schemas = {}
 
+# (schema, validator) pairs compiled from `schemas`, see `validate_event()`.
+validators = {}
+
+# Schemas of other than the latest event versions, loaded on first use.
+versioned_schemas = {}
+
+# Event classes whose version has been looked up on first use, see `get_event_version()`.
+lazily_versioned_events = set()
+
+# Loaded schema indexes (or None if missing or out of date) keyed by path, see `get_schema_index()`.
+schema_indexes = {}
+
+# Bump when the layout of schema index files changes.
+SCHEMA_INDEX_FORMAT = 1
+
 
 def load_all_event_schemas():
     """
@@ -27,6 +47,7 @@ def load_all_event_schemas():
         for event in list_aggregate_events(aggregate_cls=aggregate):
             try:
                 schemas[event] = load_event_schema(aggregate, event)
+                validators[event] = (schemas[event], compile_validator(schemas[event]))
             except EventSchemaError as e:
                 errors.append(str(e))
 
@@ -43,14 +64,32 @@ def set_event_version(aggregate_cls, event_cls, avro_dir=None):
 
 
 def get_event_version(event_cls):
-    return getattr(event_cls, 'version', None) or 1
+    version = getattr(event_cls, 'version', None)
+    if version is None and event_cls not in lazily_versioned_events and is_schema_lazy_loading_enabled():
+        # Schemas were not loaded at startup, look the version up once.
+        lazily_versioned_events.add(event_cls)
+        try:
+            set_event_version(find_event_aggregate(event_cls), event_cls)
+        except EventSchemaError:
+            pass
+        version = getattr(event_cls, 'version', None)
+    return version or 1
 
 
 def load_event_schema(aggregate, event):
     set_event_version(aggregate, event)
     spec_path = event_to_schema_path(aggregate, event)
+    return _load_event_schema_file(event, spec_path)
+
 
+def _load_event_schema_file(event, spec_path):
+    index = get_schema_index()
     try:
+        if index is not None and index.covers(spec_path):
+            if spec_path not in index.schemas:
+                raise FileNotFoundError(spec_path)
+            return avro.schema.SchemaFromJSONData(index.schemas[spec_path], avro.schema.Names())
+
         with open(spec_path) as fp:
             return parse_event_schema(fp.read())
     except FileNotFoundError:
@@ -61,6 +100,13 @@ def load_event_schema(aggregate, event):
         raise EventSchemaError(msg.format(event=event, path=spec_path)) from e
 
 
+def _schema_file_exists(spec_path):
+    index = get_schema_index()
+    if index is not None and index.covers(spec_path):
+        return spec_path in index.schemas
+    return os.path.exists(spec_path)
+
+
 def event_to_schema_path(aggregate_cls, event_cls, avro_dir=None):
     avro_dir = avro_dir or get_avro_dir()
     version = get_event_version(event_cls)
@@ -71,7 +117,7 @@ def _find_highest_event_version_based_on_schemas(aggregate_cls, event_cls, avro_
     version = None
     for version_candidate in itertools.count(1):
         schema_path = _event_to_schema_path(aggregate_cls, event_cls, avro_dir, version_candidate)
-        if os.path.exists(schema_path):
+        if _schema_file_exists(schema_path):
             version = version_candidate
         else:
             break
@@ -103,10 +149,162 @@ def parse_event_schema(spec_body):
 
 def get_schema_for_event(event_cls):
     if event_cls not in schemas:
-        raise EventSchemaError("Cached Schema not found for: {}".format(event_cls))
+        if not is_schema_lazy_loading_enabled():
+            raise EventSchemaError("Cached Schema not found for: {}".format(event_cls))
+        schemas[event_cls] = load_event_schema(find_event_aggregate(event_cls), event_cls)
     return schemas[event_cls]
 
 
+def get_schema_for_event_version(event_cls, version):
+    """
+    Returns schema of given event version. The latest version is served from the
+    lookup cache, others are loaded from schema files once and cached.
+    """
+    if version == get_event_version(event_cls) and event_cls in schemas:
+        return schemas[event_cls]
+
+    key = (event_cls, version)
+    if key not in versioned_schemas:
+        aggregate_cls = find_event_aggregate(event_cls)
+        spec_path = _event_to_schema_path(aggregate_cls, event_cls, get_avro_dir(), version)
+        versioned_schemas[key] = _load_event_schema_file(event_cls, spec_path)
+    return versioned_schemas[key]
+
+
+def find_event_aggregate(event_cls):
+    for aggregate in list_concrete_aggregates():
+        if event_cls in list_aggregate_events(aggregate_cls=aggregate):
+            return aggregate
+    raise EventSchemaError("No aggregate found for: {}".format(event_cls))
+
+
+def get_validator_for_event(event_cls):
+    """
+    Returns validator compiled from the cached schema of the event.
+    """
+    schema = get_schema_for_event(event_cls)
+    compiled_schema, validator = validators.get(event_cls, (None, None))
+    if compiled_schema is not schema:
+        validator = compile_validator(schema)
+        validators[event_cls] = (schema, validator)
+    return validator
+
+
 def validate_event(event, schema=None):
-    schema = schema or get_schema_for_event(event.__class__)
-    return avro_validate(schema, event_to_json(event))
+    if schema is None:
+        validator = get_validator_for_event(event.__class__)
+    else:
+        validator = compile_validator(schema)
+    return validator(event_to_json(event))
+
+
+class SchemaIndex(object):
+    """
+    Schemas of all files in `avro_dir` read from a schema index. `schemas`
+    maps absolute paths of schema files to their parsed JSON.
+    """
+
+    def __init__(self, avro_dir, schemas):
+        self.avro_dir = avro_dir
+        self.schemas = schemas
+
+    def covers(self, spec_path):
+        return spec_path.startswith(self.avro_dir + os.sep)
+
+
+def build_schema_index(avro_dir=None):
+    """
+    Returns index of all schema files in `avro_dir`: their parsed JSON along
+    with modification time, size and SHA-1 checked by `load_schema_index()`.
+    """
+    avro_dir = avro_dir or get_avro_dir()
+    files = {}
+    for spec_path in _list_schema_files(avro_dir):
+        with open(spec_path, 'rb') as fp:
+            body = fp.read()
+        try:
+            data = json.loads(body.decode('utf-8'))
+        except ValueError as e:
+            raise EventSchemaError("Can't parse schema from {}.".format(spec_path)) from e
+
+        stat = os.stat(spec_path)
+        files[os.path.relpath(spec_path, avro_dir)] = {
+            'mtime': stat.st_mtime,
+            'size': stat.st_size,
+            'sha1': hashlib.sha1(body).hexdigest(),
+            'schema': data,
+        }
+    return {'format': SCHEMA_INDEX_FORMAT, 'files': files}
+
+
+def write_schema_index(index_path, avro_dir=None):
+    """
+    Builds schema index of `avro_dir` and writes it to `index_path`. Returns the index.
+    """
+    index = build_schema_index(avro_dir)
+    tmp_path = index_path + '.tmp'
+    with open(tmp_path, 'w') as fp:
+        json.dump(index, fp, sort_keys=True)
+    os.replace(tmp_path, index_path)
+    return index
+
+
+def load_schema_index(index_path, avro_dir=None):
+    """
+    Reads schema index from `index_path`. Returns `SchemaIndex` or None if
+    the index is missing or out of date: schema files were added, removed or
+    changed (modification time or size differs and so does the content hash).
+    """
+    avro_dir = avro_dir or get_avro_dir()
+    try:
+        with open(index_path) as fp:
+            index = json.load(fp)
+    except FileNotFoundError:
+        warnings.warn("Event schema index {} not found.".format(index_path), UserWarning)
+        return None
+
+    files = index.get('files', {}) if index.get('format') == SCHEMA_INDEX_FORMAT else None
+    if files is None or not _is_schema_index_up_to_date(files, avro_dir):
+        msg = "Event schema index {} is out of date, run `build_event_schema_index` management command."
+        warnings.warn(msg.format(index_path), UserWarning)
+        return None
+
+    return SchemaIndex(avro_dir, {os.path.join(avro_dir, name): entry['schema'] for name, entry in files.items()})
+
+
+def get_schema_index():
+    """
+    Returns `SchemaIndex` read from the file configured with `SCHEMA_INDEX`
+    once per process, or None if not configured, missing or out of date.
+    """
+    index_path = get_schema_index_path()
+    if index_path is None:
+        return None
+    if index_path not in schema_indexes:
+        schema_indexes[index_path] = load_schema_index(index_path)
+    return schema_indexes[index_path]
+
+
+def _is_schema_index_up_to_date(files, avro_dir):
+    spec_paths = _list_schema_files(avro_dir)
+    if {os.path.relpath(spec_path, avro_dir) for spec_path in spec_paths} != set(files):
+        return False
+
+    for spec_path in spec_paths:
+        entry = files[os.path.relpath(spec_path, avro_dir)]
+        stat = os.stat(spec_path)
+        if stat.st_size != entry['size']:
+            return False
+        if stat.st_mtime != entry['mtime']:
+            # E.g. a fresh checkout, compare the content.
+            with open(spec_path, 'rb') as fp:
+                if hashlib.sha1(fp.read()).hexdigest() != entry['sha1']:
+                    return False
+    return True
+
+
+def _list_schema_files(avro_dir):
+    spec_paths = []
+    for dir_path, _, file_names in os.walk(avro_dir):
+        spec_paths.extend(os.path.join(dir_path, name) for name in file_names if name.endswith('.json'))
+    return sorted(spec_paths)
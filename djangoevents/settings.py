@@ -7,8 +7,45 @@ _DEFAULTS = {
     'EVENT_SCHEMA_VALIDATION': {
         'ENABLED': False,
         'SCHEMA_DIR': 'avro',
+        'LAZY_LOADING': False,
+        'SCHEMA_INDEX': None,
     },
     'ADDS_SCHEMA_VERSION_TO_EVENT_DATA': False,
+    'SNAPSHOTS': {
+        'ENABLED': False,
+        'EVERY_N_EVENTS': None,
+    },
+    'REPLAY_CHUNK_SIZE': 1000,
+    'JOURNAL_SETTLE_TIME': 5,
+    'LIGHTWEIGHT_REPLAY': False,
+    'JSON_CODEC': 'auto',
+    'EVENT_DATA_FORMAT': 'json',
+    'AGGREGATE_CACHE': {
+        'ENABLED': False,
+        'MAX_SIZE': 1000,
+        'TTL': None,
+    },
+    'SHARED_AGGREGATE_CACHE': {
+        'ENABLED': False,
+        'CACHE': 'default',
+        'TIMEOUT': 300,
+    },
+    'OUTBOX': {
+        'ENABLED': False,
+        'TRANSPORT': 'djangoevents.outbox.local_transport',
+        'BATCH_SIZE': 100,
+    },
+    'ASYNC_HANDLERS': {
+        'MAX_WORKERS': 4,
+        'MAX_QUEUE_SIZE': 1000,
+        'QUEUE_TIMEOUT': None,
+    },
+    'ASYNC_API': {
+        'MAX_WORKERS': 8,
+    },
+    'INSTRUMENTATION': {
+        'BACKEND': 'djangoevents.instrumentation.NullInstrumentation',
+    },
 }
 
 
@@ -37,6 +74,125 @@ def get_avro_dir():
     return avro_dir
 
 
+def is_schema_lazy_loading_enabled():
+    config = get_config()
+    default = _DEFAULTS['EVENT_SCHEMA_VALIDATION']['LAZY_LOADING']
+    return config.get('EVENT_SCHEMA_VALIDATION', {}).get('LAZY_LOADING', default)
+
+
+def get_schema_index_path():
+    config = get_config()
+    index_path = config.get('EVENT_SCHEMA_VALIDATION', {}).get('SCHEMA_INDEX')
+    if index_path is None:
+        return None
+    return os.path.abspath(os.path.join(settings.BASE_DIR, '..', index_path))
+
+
 def adds_schema_version_to_event_data():
     config = get_config()
     return config.get('ADDS_SCHEMA_VERSION_TO_EVENT_DATA', False)
+
+
+def is_snapshotting_enabled():
+    config = get_config()
+    return config.get('SNAPSHOTS', {}).get('ENABLED', False)
+
+
+def get_snapshot_every_n_events():
+    config = get_config()
+    return config.get('SNAPSHOTS', {}).get('EVERY_N_EVENTS', None)
+
+
+def get_replay_chunk_size():
+    config = get_config()
+    return config.get('REPLAY_CHUNK_SIZE', _DEFAULTS['REPLAY_CHUNK_SIZE'])
+
+
+def get_journal_settle_time():
+    config = get_config()
+    return config.get('JOURNAL_SETTLE_TIME', _DEFAULTS['JOURNAL_SETTLE_TIME'])
+
+
+def is_lightweight_replay_enabled():
+    config = get_config()
+    return config.get('LIGHTWEIGHT_REPLAY', _DEFAULTS['LIGHTWEIGHT_REPLAY'])
+
+
+def get_json_codec_name():
+    config = get_config()
+    return config.get('JSON_CODEC', _DEFAULTS['JSON_CODEC'])
+
+
+def get_event_data_format():
+    config = get_config()
+    return config.get('EVENT_DATA_FORMAT', _DEFAULTS['EVENT_DATA_FORMAT'])
+
+
+def is_aggregate_cache_enabled():
+    config = get_config()
+    return config.get('AGGREGATE_CACHE', {}).get('ENABLED', False)
+
+
+def get_aggregate_cache_max_size():
+    config = get_config()
+    return config.get('AGGREGATE_CACHE', {}).get('MAX_SIZE', _DEFAULTS['AGGREGATE_CACHE']['MAX_SIZE'])
+
+
+def get_aggregate_cache_ttl():
+    config = get_config()
+    return config.get('AGGREGATE_CACHE', {}).get('TTL', None)
+
+
+def is_shared_aggregate_cache_enabled():
+    config = get_config()
+    return config.get('SHARED_AGGREGATE_CACHE', {}).get('ENABLED', False)
+
+
+def get_shared_aggregate_cache_alias():
+    config = get_config()
+    return config.get('SHARED_AGGREGATE_CACHE', {}).get('CACHE', _DEFAULTS['SHARED_AGGREGATE_CACHE']['CACHE'])
+
+
+def get_shared_aggregate_cache_timeout():
+    config = get_config()
+    return config.get('SHARED_AGGREGATE_CACHE', {}).get('TIMEOUT', _DEFAULTS['SHARED_AGGREGATE_CACHE']['TIMEOUT'])
+
+
+def is_outbox_enabled():
+    config = get_config()
+    return config.get('OUTBOX', {}).get('ENABLED', False)
+
+
+def get_outbox_transport():
+    config = get_config()
+    return config.get('OUTBOX', {}).get('TRANSPORT', _DEFAULTS['OUTBOX']['TRANSPORT'])
+
+
+def get_outbox_batch_size():
+    config = get_config()
+    return config.get('OUTBOX', {}).get('BATCH_SIZE', _DEFAULTS['OUTBOX']['BATCH_SIZE'])
+
+
+def get_async_handlers_max_workers():
+    config = get_config()
+    return config.get('ASYNC_HANDLERS', {}).get('MAX_WORKERS', _DEFAULTS['ASYNC_HANDLERS']['MAX_WORKERS'])
+
+
+def get_async_handlers_max_queue_size():
+    config = get_config()
+    return config.get('ASYNC_HANDLERS', {}).get('MAX_QUEUE_SIZE', _DEFAULTS['ASYNC_HANDLERS']['MAX_QUEUE_SIZE'])
+
+
+def get_async_handlers_queue_timeout():
+    config = get_config()
+    return config.get('ASYNC_HANDLERS', {}).get('QUEUE_TIMEOUT', _DEFAULTS['ASYNC_HANDLERS']['QUEUE_TIMEOUT'])
+
+
+def get_async_api_max_workers():
+    config = get_config()
+    return config.get('ASYNC_API', {}).get('MAX_WORKERS', _DEFAULTS['ASYNC_API']['MAX_WORKERS'])
+
+
+def get_instrumentation_backend():
+    config = get_config()
+    return config.get('INSTRUMENTATION', {}).get('BACKEND', _DEFAULTS['INSTRUMENTATION']['BACKEND'])
@@ -1,4 +1,5 @@
 from django.http import Http404
+from eventsourcing.exceptions import RepositoryKeyError
 import warnings
 
 
@@ -9,9 +10,15 @@ def get_aggregate_or_404(repo, aggregate_id):
 
     `repo` has to be a EventSourcedRepository object.
     """
-    if aggregate_id not in repo:
+    try:
+        return repo[aggregate_id]
+    except RepositoryKeyError:
+        raise Http404
+    except KeyError:
+        # Raised by a plain mapping or by an event handler of an existing aggregate.
+        if aggregate_id in repo:
+            raise
         raise Http404
-    return repo[aggregate_id]
 
 
 def get_entity_or_404(repo, entity_id):
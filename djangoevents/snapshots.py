@@ -0,0 +1,82 @@
+"""
+Aggregate snapshots stored next to the event journal.
+"""
+from .repository import make_aware_if_needed
+from django.db import transaction
+from django.db.utils import IntegrityError
+from eventsourcing.domain.services.transcoding import id_prefix_from_entity_class
+from eventsourcing.domain.services.transcoding import make_stored_entity_id
+from collections import namedtuple
+from datetime import datetime
+
+
+AggregateSnapshot = namedtuple('AggregateSnapshot', ['aggregate_version', 'aggregate'])
+
+
+class DjangoSnapshotStore(object):
+
+    def __init__(self, transcoder):
+        from .models import Snapshot  # import model at runtime for making top level import possible
+        self.SnapshotModel = Snapshot
+        self.transcoder = transcoder
+
+    def get_snapshot(self, aggregate_cls, stored_entity_id):
+        """
+        Returns the most recent snapshot of the aggregate or None. Snapshots
+        taken with a different `snapshot_version` of the aggregate are ignored.
+        """
+        snapshot = self.SnapshotModel.objects\
+            .filter(stored_entity_id=stored_entity_id, snapshot_version=aggregate_cls.snapshot_version)\
+            .order_by('-aggregate_version')\
+            .first()
+        if snapshot is None:
+            return None
+
+        aggregate = self.transcoder.deserialize_aggregate(aggregate_cls, snapshot.snapshot_data)
+        return AggregateSnapshot(aggregate_version=snapshot.aggregate_version, aggregate=aggregate)
+
+    def get_snapshots(self, aggregate_cls, stored_entity_ids):
+        """
+        Returns the most recent snapshots of given aggregates with a single
+        query, as a dict keyed by stored entity ID. Aggregates without a
+        snapshot are left out.
+        """
+        snapshots = self.SnapshotModel.objects\
+            .filter(stored_entity_id__in=list(stored_entity_ids), snapshot_version=aggregate_cls.snapshot_version)\
+            .order_by('stored_entity_id', '-aggregate_version')
+
+        result = {}
+        for snapshot in snapshots:
+            if snapshot.stored_entity_id not in result:
+                aggregate = self.transcoder.deserialize_aggregate(aggregate_cls, snapshot.snapshot_data)
+                result[snapshot.stored_entity_id] = AggregateSnapshot(
+                    aggregate_version=snapshot.aggregate_version,
+                    aggregate=aggregate,
+                )
+        return result
+
+    def take_snapshot(self, aggregate):
+        """
+        Stores current state of the aggregate. Snapshot covers all events
+        up to (and including) `aggregate.version - 1`.
+        """
+        aggregate_cls = type(aggregate)
+        aggregate_type = id_prefix_from_entity_class(aggregate_cls)
+        aggregate_version = aggregate.version - 1
+
+        try:
+            with transaction.atomic():
+                self.SnapshotModel.objects.create(
+                    aggregate_id=aggregate.id,
+                    aggregate_type=aggregate_type,
+                    aggregate_version=aggregate_version,
+                    snapshot_version=aggregate_cls.snapshot_version,
+                    snapshot_data=self.transcoder.serialize_aggregate(aggregate),
+                    create_date=make_aware_if_needed(datetime.now()),
+                    stored_entity_id=make_stored_entity_id(aggregate_type, aggregate.id),
+                )
+        except IntegrityError:
+            # Another process has already taken a snapshot at this version.
+            pass
+
+        return AggregateSnapshot(aggregate_version=aggregate_version, aggregate=aggregate)
@@ -41,6 +41,13 @@ DATABASES = {
     }
 }
 
+# Stands in for a shared cache (e.g. memcached) in tests.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
 TEMPLATES = [
     {
     },
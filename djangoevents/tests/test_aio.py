@@ -0,0 +1,137 @@
+from .. import aio
+from .. import store_event_async
+from .. import store_events_async
+from ..aio import AsyncRepository
+from ..aio import run_sync
+from ..domain import BaseAggregate
+from ..domain import DomainEvent
+from ..exceptions import EventSchemaError
+from unittest import mock
+import asyncio
+import pytest
+import threading
+
+
+class Book(BaseAggregate):
+    class Created(BaseAggregate.Created):
+        def mutate_event(self, event, klass):
+            return klass(entity_id=event.entity_id, entity_version=event.entity_version,
+                         domain_event_id=event.domain_event_id, title=event.title)
+
+    class Renamed(DomainEvent):
+        def mutate_event(self, event, aggregate):
+            aggregate.title = event.title
+            return aggregate
+
+    def __init__(self, title, **kwargs):
+        super().__init__(**kwargs)
+        self.title = title
+
+
+@pytest.fixture
+def loop():
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    yield loop
+    loop.close()
+    asyncio.set_event_loop(None)
+
+
+# Executor threads check their database connections.
+@pytest.mark.django_db
+def test_run_sync_runs_in_executor_thread(loop):
+    thread = loop.run_until_complete(run_sync(threading.current_thread))
+
+    assert thread is not threading.current_thread()
+
+
+def test_run_sync_keeps_connections_after_call(loop):
+    with mock.patch.object(aio, 'close_old_connections') as close_old_connections:
+        loop.run_until_complete(run_sync(threading.current_thread))
+
+    # Only expired connections are closed, before the call.
+    assert close_old_connections.call_count == 1
+
+
+@pytest.mark.django_db
+def test_run_sync_propagates_exceptions(loop):
+    def fail():
+        raise ValueError("Failed")
+
+    with pytest.raises(ValueError):
+        loop.run_until_complete(run_sync(fail))
+
+
+# Database is accessed from executor threads, so data has to be committed.
+@pytest.mark.django_db(transaction=True)
+def test_store_event_async_and_get(loop, app):
+    repo = app.get_async_repo_for_aggregate(Book)
+
+    async def scenario():
+        await store_event_async(Book.Created(entity_id='b1', title='Dune'))
+        await store_events_async([
+            Book.Created(entity_id='b2', title='Emma'),
+            Book.Renamed(entity_id='b2', entity_version=1, title='Persuasion'),
+        ])
+        return await repo.get('b1'), await repo.get('b2'), await repo.get('missing')
+
+    b1, b2, missing = loop.run_until_complete(scenario())
+
+    assert (b1.title, b2.title, b2.version) == ('Dune', 'Persuasion', 2)
+    assert missing is None
+    assert loop.run_until_complete(repo.contains('b1'))
+    assert not loop.run_until_complete(repo.contains('missing'))
+
+
+@pytest.mark.django_db(transaction=True)
+def test_gather_loads_aggregates_concurrently(loop, app):
+    for i in range(5):
+        app.event_store.append(Book.Created(entity_id='b%s' % i, title='Title %s' % i))
+    repo = AsyncRepository(app.get_repo_for_aggregate(Book), max_concurrency=2)
+
+    running = []
+    max_running = []
+    load_entity = repo.repo.get_entity
+
+    def get_entity(entity_id):
+        running.append(entity_id)
+        max_running.append(len(running))
+        try:
+            return load_entity(entity_id)
+        finally:
+            running.remove(entity_id)
+
+    with mock.patch.object(repo.repo, 'get_entity', side_effect=get_entity):
+        books = loop.run_until_complete(repo.gather(['b%s' % i for i in range(5)] + ['missing']))
+
+    assert sorted(books) == ['b%s' % i for i in range(5)]
+    assert books['b3'].title == 'Title 3'
+    assert max(max_running) <= 2
+
+
+@pytest.mark.django_db
+def test_gather_propagates_handler_errors(loop):
+    repo = mock.MagicMock()
+    repo.__getitem__.side_effect = KeyError('title')
+
+    with pytest.raises(KeyError):
+        loop.run_until_complete(AsyncRepository(repo).gather(['b1']))
+
+
+@pytest.mark.django_db
+def test_store_event_async_validates_event(loop):
+    with mock.patch('djangoevents.is_validation_enabled', return_value=True), \
+            mock.patch('djangoevents.validate_event', return_value=False), \
+            mock.patch('djangoevents.es_publish') as publish:
+        with pytest.raises(EventSchemaError):
+            loop.run_until_complete(store_event_async(Book.Created(entity_id='b1', title='Dune')))
+
+    publish.assert_not_called()
+
+
+def test_shutdown_executor():
+    executor = aio.get_executor()
+    assert aio.get_executor() is executor
+
+    aio.shutdown_executor()
+    assert aio.get_executor() is not executor
@@ -0,0 +1,139 @@
+from ..cache import AggregateCache
+from ..cache import CacheInfo
+from ..cache import SharedAggregateCache
+from ..domain import BaseAggregate
+from ..unifiedtranscoder import UnifiedTranscoder
+from django.core.cache import caches
+from django.core.serializers.json import DjangoJSONEncoder
+from unittest import mock
+import pytest
+
+
+class Room(BaseAggregate):
+    class Created(BaseAggregate.Created):
+        def mutate_event(self, event, klass):
+            return klass(entity_id=event.entity_id, entity_version=event.entity_version,
+                         domain_event_id=event.domain_event_id, name=event.name)
+
+    def __init__(self, name, **kwargs):
+        super().__init__(**kwargs)
+        self.name = name
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+def test_get_and_set():
+    cache = AggregateCache(maxsize=2)
+    cache.set('a', 'aggregate-a', 'event-a')
+
+    entry = cache.get('a')
+
+    assert entry.aggregate == 'aggregate-a'
+    assert entry.last_event_id == 'event-a'
+    assert cache.get('missing') is None
+    assert cache.info() == CacheInfo(hits=1, misses=1, maxsize=2, currsize=1)
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = AggregateCache(maxsize=2)
+    cache.set('a', 'aggregate-a', 'event-a')
+    cache.set('b', 'aggregate-b', 'event-b')
+    cache.get('a')
+
+    cache.set('c', 'aggregate-c', 'event-c')
+
+    assert cache.peek('b') is None
+    assert cache.peek('a') is not None
+    assert cache.peek('c') is not None
+    assert len(cache) == 2
+
+
+def test_entries_expire_after_ttl():
+    clock = FakeClock()
+    cache = AggregateCache(ttl=10, clock=clock)
+    cache.set('a', 'aggregate-a', 'event-a')
+
+    clock.now = 9
+    assert cache.get('a') is not None
+
+    clock.now = 10
+    assert cache.get('a') is None
+    assert len(cache) == 0
+
+
+def test_peek_does_not_change_order_nor_statistics():
+    cache = AggregateCache(maxsize=2)
+    cache.set('a', 'aggregate-a', 'event-a')
+    cache.set('b', 'aggregate-b', 'event-b')
+
+    cache.peek('a')
+    cache.set('c', 'aggregate-c', 'event-c')
+
+    assert cache.peek('a') is None
+    assert cache.info().hits == 0
+    assert cache.info().misses == 0
+
+
+def test_discard_and_clear():
+    cache = AggregateCache()
+    cache.set('a', 'aggregate-a', 'event-a')
+    cache.set('b', 'aggregate-b', 'event-b')
+    cache.get('a')
+
+    cache.discard('a')
+    cache.discard('missing')
+    assert cache.peek('a') is None
+
+    cache.clear()
+    assert cache.info() == CacheInfo(hits=0, misses=0, maxsize=1000, currsize=0)
+
+
+@pytest.fixture
+def shared_cache():
+    caches['default'].clear()
+    yield SharedAggregateCache(transcoder=UnifiedTranscoder(json_encoder_cls=DjangoJSONEncoder))
+    caches['default'].clear()
+
+
+def test_shared_cache_round_trip(shared_cache):
+    created = Room.Created(entity_id='r1', name='Lobby')
+    room = Room.mutate(event=created)
+
+    shared_cache.set(room, created.domain_event_id)
+
+    cached = shared_cache.get(Room, 'r1', 0, created.domain_event_id)
+    assert cached.__dict__ == room.__dict__
+    assert cached is not room
+
+
+def test_shared_cache_misses(shared_cache):
+    created = Room.Created(entity_id='r1', name='Lobby')
+    shared_cache.set(Room.mutate(event=created), created.domain_event_id)
+
+    assert shared_cache.get(Room, 'r1', 1, created.domain_event_id) is None
+    assert shared_cache.get(Room, 'r2', 0, created.domain_event_id) is None
+    # Same version, different event (e.g. state cached from a rolled back event).
+    assert shared_cache.get(Room, 'r1', 0, 'other-event-id') is None
+
+    with mock.patch.object(Room, 'snapshot_version', 2):
+        assert shared_cache.get(Room, 'r1', 0, created.domain_event_id) is None
+
+
+def test_shared_cache_key(shared_cache):
+    assert shared_cache.make_key(Room, 'r1', 3) == 'djangoevents:aggregate:Room:1:3:r1'
+    assert shared_cache.make_key(Room, 'a:b', 3) == 'djangoevents:aggregate:Room:1:3:a:b'
+
+
+@pytest.mark.parametrize('aggregate_id', ['with space', 'x' * 200, 'new\nline'])
+def test_shared_cache_key_hashes_unsafe_ids(shared_cache, aggregate_id):
+    key = shared_cache.make_key(Room, aggregate_id, 3)
+
+    assert key.startswith('djangoevents:aggregate:Room:1:3:')
+    assert len(key) < 100
+    assert ' ' not in key and '\n' not in key
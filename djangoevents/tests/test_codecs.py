@@ -0,0 +1,338 @@
+from .. import codecs
+from .. import schema
+from ..codecs import AvroCodec
+from ..codecs import JSONCodec
+from ..codecs import MsgpackCodec
+from ..codecs import OrjsonCodec
+from ..codecs import get_binary_codec
+from ..codecs import avro_encoded
+from ..codecs import get_codec
+from ..domain import BaseAggregate
+from ..exceptions import EventSchemaError
+from ..unifiedtranscoder import UnifiedTranscoder
+from decimal import Decimal
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from eventsourcing.domain.model.entity import EventSourcedEntity
+from unittest import mock
+import datetime
+import enum
+import json
+import os
+import pytest
+import uuid
+
+
+class SampleAggregate(EventSourcedEntity):
+    class Created(EventSourcedEntity.Created):
+        pass
+
+
+class Label(str):
+    pass
+
+
+class Color(enum.Enum):
+    RED = 'red'
+
+
+class Size(enum.IntEnum):
+    SMALL = 1
+
+
+PAYLOADS = [
+    {},
+    [],
+    None,
+    {'b': 1, 'a': 'x', 'c': [3, 2, 1], 'd': {'z': None, 'y': True, 'x': False}},
+    {'ints': [0, -1, 2 ** 31, 2 ** 63 - 1, -2 ** 63, 2 ** 64, 2 ** 70]},
+    {'floats': [0.1, 1.5, -0.0, 1.0, 123456.789, 1e16, 1e22, 1e-7, 0.0001, 1.2345678901234568e+20]},
+    {'text': 'zażółć gęślą jaźń', 'emoji': '\U0001F600', 'separators': '  '},
+    {'ascii': ''.join(chr(i) for i in range(128))},
+    {'naive': datetime.datetime(2017, 12, 20, 4, 4, 1, 123456)},
+    {'aware': datetime.datetime(2017, 12, 20, 4, 4, 1, tzinfo=timezone.utc)},
+    {'date': datetime.date(2017, 12, 20), 'time': datetime.time(4, 4, 1, 500)},
+    {'decimal': Decimal('1.10'), 'big_decimal': Decimal('12345678901234567890.000001')},
+    {'uuid': uuid.UUID('b089a0a6-e0b3-480d-9382-c47f99103b3d')},
+    {'tuple': (1, 'a', None)},
+    {2: 'int key', 1: 'int key'},
+    {'label': Label('subclass')},
+    {'ąść': 'non ascii key', 'a': 1},
+    {'nan': float('nan'), 'inf': [float('inf'), float('-inf')], 'nested': {'nan': [float('nan')]}},
+    {'size': Size.SMALL},
+    {'color': Color.RED},
+]
+
+CODECS = [
+    JSONCodec,
+    pytest.param(OrjsonCodec, marks=pytest.mark.skipif(codecs.orjson is None, reason="orjson is not installed")),
+]
+
+
+def canonical_encode(data):
+    return json.dumps(data, separators=(',', ':'), sort_keys=True, cls=DjangoJSONEncoder)
+
+
+@pytest.mark.parametrize('codec_cls', CODECS)
+@pytest.mark.parametrize('data', PAYLOADS)
+def test_codec_output_is_byte_identical(codec_cls, data):
+    codec = codec_cls(json_encoder_cls=DjangoJSONEncoder)
+    try:
+        expected = canonical_encode(data)
+    except TypeError:
+        # Rejected by the encoder, e.g. enums.
+        with pytest.raises(TypeError):
+            codec.encode(data)
+    else:
+        assert codec.encode(data) == expected
+
+
+@pytest.mark.parametrize('codec_cls', CODECS)
+@pytest.mark.parametrize('data', PAYLOADS)
+def test_codec_decodes_canonical_output(codec_cls, data):
+    codec = codec_cls(json_encoder_cls=DjangoJSONEncoder)
+    try:
+        encoded = canonical_encode(data)
+    except TypeError:
+        pytest.skip("Payload rejected by the encoder.")
+    # NaN is not equal to itself, compare encoded values.
+    assert canonical_encode(codec.decode(encoded)) == canonical_encode(JSONCodec().decode(encoded))
+
+
+@pytest.mark.parametrize('codec_cls', CODECS)
+@pytest.mark.parametrize('encoded', [
+    '{"d":{"ISO8601_datetime":"2017-12-20T04:04:01.000000+0000"}}',
+    '{"d":{"ISO8601_date":"2017-12-20"}}',
+    '{"f":NaN,"g":Infinity}',
+    '{"s":"\\ud800"}',
+    '{"i":123456789012345678901234567890}',
+    '{"i":18446744073709551616,"j":-9223372036854775809}',
+])
+def test_codec_decodes_legacy_and_non_standard_json(codec_cls, encoded):
+    codec = codec_cls(json_encoder_cls=DjangoJSONEncoder)
+    decoded = codec.decode(encoded)
+    expected = JSONCodec().decode(encoded)
+    assert json.dumps(decoded, default=str, sort_keys=True) == json.dumps(expected, default=str, sort_keys=True)
+
+
+@pytest.mark.parametrize('codec_cls', CODECS)
+def test_codec_raises_on_unsupported_values(codec_cls):
+    codec = codec_cls(json_encoder_cls=DjangoJSONEncoder)
+    with pytest.raises(TypeError):
+        codec.encode({'set': {1, 2}})
+
+
+@pytest.mark.parametrize('codec_cls', CODECS)
+def test_transcoder_event_data_is_byte_identical(codec_cls):
+    event = SampleAggregate.Created(
+        entity_id='b089a0a6-e0b3-480d-9382-c47f99103b3d',
+        title='Zażółć',
+        due=datetime.date(2017, 12, 20),
+        price=Decimal('9.99'),
+        owner_id=uuid.UUID('b089a0a6-e0b3-480d-9382-c47f99103b3d'),
+        tags=['a', 'b'],
+        metadata={'command_id': 123},
+    )
+
+    reference = UnifiedTranscoder(json_encoder_cls=DjangoJSONEncoder, codec=JSONCodec(DjangoJSONEncoder))
+    transcoder = UnifiedTranscoder(json_encoder_cls=DjangoJSONEncoder, codec=codec_cls(DjangoJSONEncoder))
+
+    stored_event = transcoder.serialize(event)
+    assert stored_event.event_data == reference.serialize(event).event_data
+    assert stored_event.metadata == reference.serialize(event).metadata
+    assert transcoder.deserialize(stored_event) == reference.deserialize(stored_event)
+
+
+def test_get_codec_auto():
+    codec = get_codec(json_encoder_cls=DjangoJSONEncoder, name='auto')
+    expected_cls = JSONCodec if codecs.orjson is None else OrjsonCodec
+    assert type(codec) is expected_cls
+
+
+@mock.patch.object(codecs, 'orjson', None)
+def test_get_codec_auto_without_orjson():
+    assert type(get_codec(json_encoder_cls=DjangoJSONEncoder, name='auto')) is JSONCodec
+
+
+@mock.patch.object(codecs, 'orjson', None)
+def test_get_codec_orjson_not_installed():
+    with pytest.raises(ImportError):
+        get_codec(json_encoder_cls=DjangoJSONEncoder, name='orjson')
+
+
+def test_get_codec_json():
+    assert type(get_codec(json_encoder_cls=DjangoJSONEncoder, name='json')) is JSONCodec
+
+
+def test_get_codec_custom_encoder_uses_json():
+    class CustomEncoder(DjangoJSONEncoder):
+        pass
+
+    codec = get_codec(json_encoder_cls=CustomEncoder, name='auto')
+    assert type(codec) is JSONCodec
+    assert codec.json_encoder_cls is CustomEncoder
+
+
+def test_get_codec_unknown():
+    with pytest.raises(ValueError):
+        get_codec(json_encoder_cls=DjangoJSONEncoder, name='ujson')
+
+
+@pytest.mark.skipif(codecs.msgpack is None, reason="msgpack is not installed")
+def test_msgpack_codec_matches_json_semantics():
+    data = {
+        'text': 'zażółć',
+        'date': datetime.date(2017, 12, 20),
+        'decimal': Decimal('1.10'),
+        'uuid': uuid.UUID('b089a0a6-e0b3-480d-9382-c47f99103b3d'),
+        'tuple': (1, 'a', None),
+        'nested': {'float': 0.1, 'int': 2 ** 40},
+        'counts': {1: 'a', 2: 'b'},
+        'ratios': [{2.5: True}],
+    }
+    codec = MsgpackCodec(json_encoder_cls=DjangoJSONEncoder)
+
+    encoded = codec.encode(data)
+
+    assert isinstance(encoded, bytes)
+    assert len(encoded) < len(canonical_encode(data))
+    assert codec.decode(encoded) == JSONCodec().decode(canonical_encode(data))
+
+
+@pytest.mark.skipif(codecs.msgpack is None, reason="msgpack is not installed")
+def test_msgpack_codec_rejects_keys_json_rejects():
+    codec = MsgpackCodec(json_encoder_cls=DjangoJSONEncoder)
+    with pytest.raises(TypeError):
+        codec.encode({'counts': {(1, 2): 'a'}})
+
+
+@mock.patch.object(codecs, 'msgpack', None)
+def test_msgpack_not_installed():
+    with pytest.raises(ImportError):
+        get_binary_codec('msgpack', json_encoder_cls=DjangoJSONEncoder)
+
+
+def test_get_binary_codec_unknown():
+    with pytest.raises(ValueError):
+        get_binary_codec('xml', json_encoder_cls=DjangoJSONEncoder)
+
+
+class Parcel(BaseAggregate):
+    class Created(BaseAggregate.Created):
+        def mutate_event(self, event, klass):
+            return klass(entity_id=event.entity_id, entity_version=event.entity_version,
+                         domain_event_id=event.domain_event_id)
+
+
+def parcel_created_schema(*extra_fields):
+    return json.dumps({
+        "name": "parcel_created",
+        "type": "record",
+        "fields": [
+            {"name": "entity_id", "type": "string"},
+            {"name": "entity_version", "type": "long"},
+            {"name": "domain_event_id", "type": "string"},
+            {"name": "weight", "type": "int"},
+        ] + list(extra_fields),
+    })
+
+
+@pytest.fixture
+def parcel_schemas(tmpdir, settings):
+    parcel_dir = tmpdir.mkdir('avro').mkdir('parcel')
+    parcel_dir.join('v1_parcel_created.json').write(parcel_created_schema())
+    settings.BASE_DIR = str(tmpdir.mkdir('src'))
+    settings.DJANGOEVENTS_CONFIG = {'EVENT_SCHEMA_VALIDATION': {'ENABLED': True, 'SCHEMA_DIR': 'avro'}}
+
+    with mock.patch.dict(schema.schemas, clear=True), mock.patch.dict(schema.versioned_schemas, clear=True), \
+            mock.patch.object(codecs, '_avro_codec', None):
+        schema.set_event_version(Parcel, Parcel.Created)
+        yield parcel_dir
+
+    Parcel.Created.version = None
+
+
+def test_avro_transcoder_round_trip(parcel_schemas):
+    event = Parcel.Created(entity_id='parcel-1', weight=12, metadata={'command_id': 1})
+    transcoder = UnifiedTranscoder(json_encoder_cls=DjangoJSONEncoder, event_data_format='avro')
+    json_transcoder = UnifiedTranscoder(json_encoder_cls=DjangoJSONEncoder)
+
+    stored_event = transcoder.serialize(event)
+
+    assert stored_event.event_data_format == 'avro'
+    assert stored_event.event_version == 1
+    assert isinstance(stored_event.event_data, bytes)
+    assert len(stored_event.event_data) < len(json_transcoder.serialize(event).event_data)
+    assert stored_event.metadata == json_transcoder.serialize(event).metadata
+    assert transcoder.deserialize(stored_event) == Parcel.Created(
+        entity_id='parcel-1', weight=12, domain_event_id=event.domain_event_id)
+
+
+def test_avro_decodes_events_with_schema_of_their_version(parcel_schemas):
+    transcoder = UnifiedTranscoder(json_encoder_cls=DjangoJSONEncoder, event_data_format='avro')
+    v1_event = Parcel.Created(entity_id='parcel-1', weight=12)
+    v1_stored_event = transcoder.serialize(v1_event)
+
+    destination = {"name": "destination", "type": "string"}
+    parcel_schemas.join('v2_parcel_created.json').write(parcel_created_schema(destination))
+    schema.set_event_version(Parcel, Parcel.Created)
+    v2_event = Parcel.Created(entity_id='parcel-2', weight=5, destination='Warsaw')
+    v2_stored_event = transcoder.serialize(v2_event)
+
+    assert v2_stored_event.event_version == 2
+    assert transcoder.deserialize(v1_stored_event) == v1_event
+    assert transcoder.deserialize(v2_stored_event) == v2_event
+
+
+@pytest.mark.parametrize('attrs', [
+    {'weight': 'heavy'},
+    {},
+    {'weight': 12, 'color': 'red'},
+])
+def test_avro_rejects_events_not_matching_schema(parcel_schemas, attrs):
+    event = Parcel.Created(entity_id='parcel-1', **attrs)
+    transcoder = UnifiedTranscoder(json_encoder_cls=DjangoJSONEncoder, event_data_format='avro')
+
+    with pytest.raises(EventSchemaError):
+        transcoder.serialize(event)
+
+
+def test_avro_missing_schema(parcel_schemas):
+    os.remove(str(parcel_schemas.join('v1_parcel_created.json')))
+    event = Parcel.Created(entity_id='parcel-1', weight=12)
+
+    with pytest.raises(EventSchemaError):
+        AvroCodec().encode_event(event)
+
+
+def test_avro_encoded_events_are_encoded_once(parcel_schemas):
+    events = [Parcel.Created(entity_id='parcel-1', weight=12), Parcel.Created(entity_id='parcel-2', weight=5)]
+    transcoder = UnifiedTranscoder(json_encoder_cls=DjangoJSONEncoder, event_data_format='avro')
+
+    with mock.patch.object(codecs.avro.io, 'BinaryEncoder', wraps=codecs.avro.io.BinaryEncoder) as encoder:
+        with avro_encoded(events):
+            stored_events = [transcoder.serialize(event) for event in events]
+        assert encoder.call_count == 2
+
+        assert [transcoder.serialize(event) for event in events] == stored_events
+        assert encoder.call_count == 4
+
+
+def test_avro_encoded_reuses_compiled_schemas(parcel_schemas):
+    get_schema_for_event_version = codecs.get_schema_for_event_version
+    with mock.patch.object(codecs, 'get_schema_for_event_version', wraps=get_schema_for_event_version) as get_schema:
+        for entity_id in ['parcel-1', 'parcel-2']:
+            with avro_encoded([Parcel.Created(entity_id=entity_id, weight=12)]):
+                pass
+
+    assert get_schema.call_count == 1
+
+
+def test_avro_encoded_validates_all_events_upfront(parcel_schemas):
+    events = [Parcel.Created(entity_id='parcel-1', weight=12), Parcel.Created(entity_id='parcel-2', weight='heavy')]
+
+    with pytest.raises(EventSchemaError):
+        with avro_encoded(events):
+            pass
+
+    assert codecs._avro_encoded.events == {}
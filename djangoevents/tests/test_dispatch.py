@@ -0,0 +1,174 @@
+from .. import dispatch
+from ..dispatch import AsyncDispatcher
+from ..dispatch import HandlerStats
+from ..dispatch import get_async_dispatcher
+from ..dispatch import shutdown_async_dispatcher
+from ..dispatch import subscribe_to
+from ..dispatch import unsubscribe_async
+from ..domain import BaseAggregate
+from ..domain import DomainEvent
+from ..exceptions import AlreadyExists
+from django.db import transaction
+from django.test import override_settings
+from eventsourcing.domain.model.events import _event_handlers
+from eventsourcing.domain.model.events import publish
+from eventsourcing.domain.model.events import unsubscribe
+import pytest
+import threading
+
+
+class Bell(BaseAggregate):
+    class Created(BaseAggregate.Created):
+        pass
+
+    class Rang(DomainEvent):
+        pass
+
+
+Rang = Bell.Rang
+
+
+@pytest.fixture
+def dispatcher():
+    dispatcher = AsyncDispatcher(max_workers=2, max_queue_size=10)
+    yield dispatcher
+    dispatcher.shutdown()
+
+
+@pytest.fixture
+def global_dispatcher(dispatcher):
+    original, dispatch._dispatcher = dispatch._dispatcher, dispatcher
+    yield dispatcher
+    dispatch._dispatcher = original
+
+
+@pytest.fixture
+def handled():
+    handled = []
+
+    def handler(event):
+        handled.append((event, threading.current_thread()))
+
+    yield handled, handler
+
+    unsubscribe_async(handler)
+
+
+def test_dispatcher_runs_handlers_in_worker_threads(dispatcher):
+    handled = []
+    event = Rang(entity_id='1', entity_version=0)
+
+    assert dispatcher.submit(lambda e: handled.append((e, threading.current_thread())), event)
+    assert dispatcher.wait(timeout=5)
+
+    assert handled[0][0] is event
+    assert handled[0][1] is not threading.current_thread()
+    assert dispatcher.pending == 0
+
+
+def test_dispatcher_captures_handler_errors(dispatcher):
+    def failing(event):
+        raise ValueError("Projection failed")
+
+    event = Rang(entity_id='1', entity_version=0)
+    dispatcher.submit(failing, event)
+    dispatcher.submit(lambda e: None, event)
+    dispatcher.wait(timeout=5)
+
+    assert len(dispatcher.errors) == 1
+    assert dispatcher.errors[0].event is event
+    assert isinstance(dispatcher.errors[0].exception, ValueError)
+
+    stats = dispatcher.stats()
+    failing_stats = stats['djangoevents.tests.test_dispatch.test_dispatcher_captures_handler_errors.<locals>.failing']
+    expected = HandlerStats(submitted=1, succeeded=0, failed=1, rejected=0, total_time=0)
+    assert failing_stats._replace(total_time=0) == expected
+    assert sum(s.succeeded for s in stats.values()) == 1
+
+
+def test_dispatcher_applies_backpressure():
+    dispatcher = AsyncDispatcher(max_workers=1, max_queue_size=1, queue_timeout=0.01)
+    release = threading.Event()
+    event = Rang(entity_id='1', entity_version=0)
+
+    def slow(event):
+        release.wait(5)
+
+    try:
+        assert dispatcher.submit(slow, event)
+        assert dispatcher.submit(slow, event)
+        # Worker is busy & queue is full.
+        assert not dispatcher.submit(slow, event)
+        assert dispatcher.pending == 2
+    finally:
+        release.set()
+        dispatcher.wait(timeout=5)
+        dispatcher.shutdown()
+
+    assert list(dispatcher.stats().values())[0].rejected == 1
+    assert dispatcher.pending == 0
+
+
+def test_subscribe_to_sync_handler(handled):
+    events, handler = handled
+    sync_handler = subscribe_to(Rang)(handler)
+    try:
+        event = Rang(entity_id='1', entity_version=0)
+        publish(event)
+    finally:
+        for predicate, handlers in list(_event_handlers.items()):
+            for subscribed in list(handlers):
+                if subscribed is handler:
+                    unsubscribe(predicate, subscribed)
+
+    assert events == [(event, threading.current_thread())]
+    assert sync_handler.__wrapped__ is handler
+
+
+@pytest.mark.django_db(transaction=True)
+def test_async_handlers_run_after_commit(app, global_dispatcher, handled):
+    events, handler = handled
+    assert subscribe_to(Rang, run_async=True)(handler) is handler
+
+    committed = Rang(entity_id='1', entity_version=0)
+    with transaction.atomic():
+        publish(committed)
+        assert global_dispatcher.wait(timeout=5)
+        assert events == []
+
+    with pytest.raises(RuntimeError):
+        with transaction.atomic():
+            publish(Rang(entity_id='2', entity_version=0))
+            raise RuntimeError()
+
+    assert global_dispatcher.wait(timeout=5)
+    assert [event for event, thread in events] == [committed]
+    assert events[0][1] is not threading.current_thread()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_async_handlers_skip_events_failing_to_store(app, global_dispatcher, handled):
+    events, handler = handled
+    subscribe_to(Bell.Created, run_async=True)(handler)
+
+    created = Bell.Created(entity_id='d1')
+    publish(created)
+    with pytest.raises(AlreadyExists):
+        publish(Bell.Created(entity_id='d1'))
+
+    assert global_dispatcher.wait(timeout=5)
+    assert [event for event, thread in events] == [created]
+
+
+@override_settings(DJANGOEVENTS_CONFIG={'ASYNC_HANDLERS': {'MAX_WORKERS': 3, 'QUEUE_TIMEOUT': 2}})
+def test_global_dispatcher_from_settings():
+    original, dispatch._dispatcher = dispatch._dispatcher, None
+    try:
+        dispatcher = get_async_dispatcher()
+        assert get_async_dispatcher() is dispatcher
+        assert (dispatcher.max_workers, dispatcher.max_queue_size, dispatcher.queue_timeout) == (3, 1000, 2)
+
+        shutdown_async_dispatcher()
+        assert dispatch._dispatcher is None
+    finally:
+        dispatch._dispatcher = original
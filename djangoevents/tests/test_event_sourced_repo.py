@@ -0,0 +1,600 @@
+from .. import codecs
+from .. import store_event
+from ..app import EventSourcingWithDjango
+from ..domain import BaseAggregate
+from ..domain import DomainEvent
+from ..exceptions import ConcurrencyConflict
+from ..exceptions import SnapshotStateError
+from ..models import Snapshot
+from decimal import Decimal
+from django.core.cache import caches
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from eventsourcing.domain.model import events
+from eventsourcing.exceptions import RepositoryKeyError
+from unittest import mock
+import pytest
+
+
+class Counter(BaseAggregate):
+    class Created(BaseAggregate.Created):
+        def mutate_event(self, event, klass):
+            return klass(
+                entity_id=event.entity_id,
+                entity_version=event.entity_version,
+                domain_event_id=event.domain_event_id,
+            )
+
+    class Incremented(DomainEvent):
+        def mutate_event(self, event, aggregate):
+            aggregate.value += event.by
+            return aggregate
+
+    def __init__(self, value=0, **kwargs):
+        super().__init__(**kwargs)
+        self.value = value
+
+
+class Invoice(BaseAggregate):
+    class Created(BaseAggregate.Created):
+        def mutate_event(self, event, klass):
+            return klass(
+                entity_id=event.entity_id,
+                entity_version=event.entity_version,
+                domain_event_id=event.domain_event_id,
+                total=Decimal(event.total),
+            )
+
+    def __init__(self, total, **kwargs):
+        super().__init__(**kwargs)
+        self.total = total
+
+
+class SnapshotInvoice(Invoice):
+    class Created(Invoice.Created):
+        pass
+
+    def get_snapshot_state(self):
+        return dict(self.__dict__, total=str(self.total))
+
+    @classmethod
+    def from_snapshot_state(cls, state):
+        return super().from_snapshot_state(dict(state, total=Decimal(state['total'])))
+
+
+def store_counter(app, aggregate_id, increments):
+    app.event_store.append(Counter.Created(entity_id=aggregate_id))
+    for version, by in enumerate(increments, start=1):
+        app.event_store.append(Counter.Incremented(entity_id=aggregate_id, entity_version=version, by=by))
+
+
+@pytest.mark.django_db
+def test_snapshots_are_disabled_by_default(app):
+    repo = app.get_repo_for_aggregate(Counter)
+    assert repo.snapshot_store is None
+
+    with pytest.raises(ValueError):
+        repo.take_snapshot('c1')
+
+
+@pytest.mark.django_db
+def test_take_snapshot_on_demand(app):
+    repo = app.get_repo_for_aggregate(Counter, use_snapshots=True)
+    store_counter(app, 'c1', [1, 2, 3])
+
+    snapshot = repo.take_snapshot('c1')
+
+    assert snapshot.aggregate_version == 3
+    stored = Snapshot.objects.get()
+    assert stored.aggregate_id == 'c1'
+    assert stored.aggregate_type == 'Counter'
+    assert stored.aggregate_version == 3
+    assert stored.snapshot_version == 1
+    assert stored.stored_entity_id == 'Counter::c1'
+
+
+@pytest.mark.django_db
+def test_take_snapshot_of_missing_aggregate(app):
+    repo = app.get_repo_for_aggregate(Counter, use_snapshots=True)
+
+    with pytest.raises(RepositoryKeyError):
+        repo.take_snapshot('missing')
+
+
+@pytest.mark.django_db
+def test_take_snapshot_of_state_not_surviving_json(app):
+    repo = app.get_repo_for_aggregate(Invoice, use_snapshots=True)
+    app.event_store.append(Invoice.Created(entity_id='i1', total='9.99'))
+
+    with pytest.raises(SnapshotStateError) as exc_info:
+        repo.take_snapshot('i1')
+    assert "state['total']" in str(exc_info.value)
+    assert not Snapshot.objects.exists()
+
+
+@pytest.mark.django_db
+def test_take_snapshot_with_custom_state(app):
+    repo = app.get_repo_for_aggregate(SnapshotInvoice, use_snapshots=True)
+    app.event_store.append(SnapshotInvoice.Created(entity_id='i1', total='9.99'))
+    repo.take_snapshot('i1')
+
+    snapshot = repo.snapshot_store.get_snapshot(SnapshotInvoice, 'SnapshotInvoice::i1')
+    assert snapshot.aggregate.total == Decimal('9.99')
+
+
+@pytest.mark.django_db
+def test_load_replays_only_events_after_snapshot(app):
+    repo = app.get_repo_for_aggregate(Counter, use_snapshots=True)
+    store_counter(app, 'c1', [1, 2, 3])
+    repo.take_snapshot('c1')
+    app.event_store.append(Counter.Incremented(entity_id='c1', entity_version=4, by=10))
+
+    with mock.patch.object(repo.stored_event_repo, 'stream_entity_events',
+                           wraps=repo.stored_event_repo.stream_entity_events) as stream_entity_events:
+        counter = repo['c1']
+
+    assert stream_entity_events.call_args == mock.call('Counter::c1', after_version=3, chunk_size=None)
+    assert counter.value == 16
+    assert counter.version == 5
+
+
+@pytest.mark.django_db
+def test_load_with_snapshot_matches_full_replay(app):
+    store_counter(app, 'c1', [1, 2, 3])
+    full_replay = app.get_repo_for_aggregate(Counter)['c1']
+
+    repo = app.get_repo_for_aggregate(Counter, use_snapshots=True)
+    repo.take_snapshot('c1')
+
+    assert repo['c1'].__dict__ == full_replay.__dict__
+
+
+@pytest.mark.django_db
+def test_snapshot_is_taken_every_n_events(app):
+    repo = app.get_repo_for_aggregate(Counter, use_snapshots=True, snapshot_every=3)
+    store_counter(app, 'c1', [1])
+
+    repo['c1']
+    assert not Snapshot.objects.exists()
+
+    app.event_store.append(Counter.Incremented(entity_id='c1', entity_version=2, by=1))
+    repo['c1']
+    assert list(Snapshot.objects.values_list('aggregate_version', flat=True)) == [2]
+
+    app.event_store.append(Counter.Incremented(entity_id='c1', entity_version=3, by=1))
+    repo['c1']
+    assert list(Snapshot.objects.values_list('aggregate_version', flat=True)) == [2]
+
+
+@pytest.mark.django_db
+def test_snapshots_with_outdated_snapshot_version_are_ignored(app):
+    repo = app.get_repo_for_aggregate(Counter, use_snapshots=True)
+    store_counter(app, 'c1', [1, 2])
+    repo.take_snapshot('c1')
+
+    with mock.patch.object(Counter, 'snapshot_version', 2):
+        assert repo.snapshot_store.get_snapshot(Counter, 'Counter::c1') is None
+        assert repo['c1'].value == 3
+
+
+@pytest.mark.django_db
+def test_snapshot_is_retaken_after_snapshot_version_change(app):
+    repo = app.get_repo_for_aggregate(Counter, use_snapshots=True)
+    store_counter(app, 'c1', [1, 2])
+    repo.take_snapshot('c1')
+
+    with mock.patch.object(Counter, 'snapshot_version', 2):
+        repo.take_snapshot('c1')
+        snapshot = repo.snapshot_store.get_snapshot(Counter, 'Counter::c1')
+        assert (snapshot.aggregate_version, snapshot.aggregate.value) == (2, 3)
+
+    assert Snapshot.objects.filter(stored_entity_id='Counter::c1', aggregate_version=2).count() == 2
+
+
+@pytest.mark.django_db
+@override_settings(DJANGOEVENTS_CONFIG={
+    'SNAPSHOTS': {
+        'ENABLED': True,
+        'EVERY_N_EVENTS': 2,
+    },
+})
+def test_snapshot_settings(app):
+    repo = app.get_repo_for_aggregate(Counter)
+    assert repo.snapshot_store is not None
+    assert repo.snapshot_every == 2
+
+
+@pytest.mark.django_db
+def test_load_streams_events_in_chunks(app):
+    repo = app.get_repo_for_aggregate(Counter, replay_chunk_size=2)
+    store_counter(app, 'c1', [1, 2, 3, 4])
+
+    with CaptureQueriesContext(connection) as queries:
+        counter = repo['c1']
+
+    assert counter.value == 10
+    assert counter.version == 5
+    assert len(queries.captured_queries) == 3
+
+
+@pytest.mark.django_db
+def test_fastforward_replays_only_missing_events(app):
+    repo = app.get_repo_for_aggregate(Counter)
+    store_counter(app, 'c1', [1, 2])
+    stale = repo['c1']
+    app.event_store.append(Counter.Incremented(entity_id='c1', entity_version=3, by=10))
+
+    with mock.patch.object(repo.stored_event_repo, 'stream_entity_events',
+                           wraps=repo.stored_event_repo.stream_entity_events) as stream_entity_events:
+        fresh = repo.fastforward(stale)
+
+    assert stream_entity_events.call_args == mock.call('Counter::c1', after_version=2, chunk_size=None)
+    assert fresh.value == 13
+    assert fresh.version == 4
+    # Given instance is left intact.
+    assert stale.value == 3
+    assert stale.version == 3
+
+
+@pytest.mark.django_db
+@pytest.mark.skipif(codecs.msgpack is None, reason="msgpack is not installed")
+def test_load_aggregate_with_json_and_binary_events(app):
+    store_counter(app, 'c1', [1, 2])
+
+    with override_settings(DJANGOEVENTS_CONFIG={'EVENT_DATA_FORMAT': 'msgpack'}):
+        binary_app = EventSourcingWithDjango()
+    try:
+        binary_app.event_store.append(Counter.Incremented(entity_id='c1', entity_version=3, by=10))
+        counter = binary_app.get_repo_for_aggregate(Counter)['c1']
+    finally:
+        binary_app.close()
+
+    assert counter.value == 13
+    assert counter.version == 4
+
+
+@pytest.mark.django_db
+def test_aggregate_cache_is_disabled_by_default(app):
+    repo = app.get_repo_for_aggregate(Counter)
+    assert repo.aggregate_cache is None
+
+
+@pytest.mark.django_db
+@override_settings(DJANGOEVENTS_CONFIG={
+    'AGGREGATE_CACHE': {
+        'ENABLED': True,
+        'MAX_SIZE': 10,
+        'TTL': 60,
+    },
+})
+def test_aggregate_cache_settings(app):
+    repo = app.get_repo_for_aggregate(Counter)
+    assert repo.aggregate_cache.maxsize == 10
+    assert repo.aggregate_cache.ttl == 60
+
+
+@pytest.mark.django_db
+def test_cached_aggregate_is_checked_with_a_single_query(app):
+    repo = app.get_repo_for_aggregate(Counter, use_aggregate_cache=True)
+    store_counter(app, 'c1', [1, 2])
+    first = repo['c1']
+
+    with CaptureQueriesContext(connection) as queries:
+        second = repo['c1']
+
+    assert len(queries.captured_queries) == 1
+    assert second.__dict__ == first.__dict__
+    assert second is not first
+    assert repo.aggregate_cache.info().hits == 1
+
+    # Returned aggregates are copies of the cached one.
+    second.value = 100
+    assert repo['c1'].value == 3
+
+
+@pytest.mark.django_db
+def test_cached_aggregate_is_fastforwarded_with_events_stored_elsewhere(app):
+    repo = app.get_repo_for_aggregate(Counter, use_aggregate_cache=True)
+    store_counter(app, 'c1', [1, 2])
+    repo['c1']
+    app.event_store.append(Counter.Incremented(entity_id='c1', entity_version=3, by=10))
+
+    with mock.patch.object(repo.stored_event_repo, 'stream_entity_events',
+                           wraps=repo.stored_event_repo.stream_entity_events) as stream_entity_events:
+        counter = repo['c1']
+
+    # The last cached event is read again to make sure it is still in the journal.
+    assert stream_entity_events.call_args == mock.call('Counter::c1', after_version=1, chunk_size=None)
+    assert counter.value == 13
+    assert counter.version == 4
+    assert repo['c1'].__dict__ == counter.__dict__
+
+
+@pytest.mark.django_db
+def test_published_events_update_cached_aggregate(app):
+    repo = app.get_repo_for_aggregate(Counter, use_aggregate_cache=True)
+    store_counter(app, 'c1', [1, 2])
+    repo['c1']
+
+    with mock.patch('djangoevents.event_sourced_repo.transaction.on_commit', side_effect=lambda func: func()):
+        event = Counter.Incremented(entity_id='c1', entity_version=3, by=10)
+        store_event(event)
+
+    cached = repo.aggregate_cache.peek('Counter::c1')
+    assert cached.aggregate.value == 13
+    assert cached.last_event_id == event.domain_event_id
+
+    with CaptureQueriesContext(connection) as queries:
+        counter = repo['c1']
+
+    assert len(queries.captured_queries) == 1
+    assert counter.value == 13
+
+
+@pytest.mark.django_db
+def test_cached_events_missing_in_journal_are_dropped(app):
+    repo = app.get_repo_for_aggregate(Counter, use_aggregate_cache=True)
+    store_counter(app, 'c1', [1, 2])
+    repo['c1']
+
+    # E.g. event published in a transaction which failed to commit.
+    repo._apply_published_event(Counter.Incremented(entity_id='c1', entity_version=3, by=10))
+    assert repo.aggregate_cache.peek('Counter::c1').aggregate.value == 13
+
+    counter = repo['c1']
+    assert counter.value == 3
+    assert counter.version == 3
+
+
+@pytest.mark.django_db
+def test_published_events_out_of_order_drop_cached_aggregate(app):
+    repo = app.get_repo_for_aggregate(Counter, use_aggregate_cache=True)
+    store_counter(app, 'c1', [1, 2])
+    repo['c1']
+
+    repo._apply_published_event(Counter.Incremented(entity_id='c1', entity_version=5, by=10))
+
+    assert repo.aggregate_cache.peek('Counter::c1') is None
+
+
+@pytest.mark.django_db
+def test_missing_aggregate_is_not_cached(app):
+    repo = app.get_repo_for_aggregate(Counter, use_aggregate_cache=True)
+
+    with pytest.raises(RepositoryKeyError):
+        repo['missing']
+
+    assert len(repo.aggregate_cache) == 0
+
+
+@pytest.mark.django_db
+def test_closing_app_unsubscribes_aggregate_cache(app):
+    repo = app.get_repo_for_aggregate(Counter, use_aggregate_cache=True)
+    assert repo._on_aggregate_event in events._event_handlers[repo._is_aggregate_event]
+
+    app.close()
+
+    assert repo._is_aggregate_event not in events._event_handlers
+
+
+def test_app_keeps_only_repos_to_close(app):
+    app.get_repo_for_aggregate(Counter)
+    cached_repo = app.get_repo_for_aggregate(Counter, use_aggregate_cache=True)
+
+    assert app.repos == [cached_repo]
+
+
+@pytest.fixture
+def shared_cache():
+    caches['default'].clear()
+    yield caches['default']
+    caches['default'].clear()
+
+
+@pytest.mark.django_db
+def test_shared_aggregate_cache_is_disabled_by_default(app):
+    assert app.get_repo_for_aggregate(Counter).shared_aggregate_cache is None
+
+
+@pytest.mark.django_db
+def test_shared_aggregate_cache_is_used_across_repositories(app, shared_cache):
+    store_counter(app, 'c1', [1, 2])
+    loaded = app.get_repo_for_aggregate(Counter, use_shared_aggregate_cache=True)['c1']
+
+    # E.g. repository of another worker process.
+    repo = app.get_repo_for_aggregate(Counter, use_shared_aggregate_cache=True)
+    with mock.patch.object(repo.stored_event_repo, 'stream_entity_events') as stream_entity_events:
+        with CaptureQueriesContext(connection) as queries:
+            counter = repo['c1']
+
+    assert stream_entity_events.call_count == 0
+    assert len(queries.captured_queries) == 1
+    assert counter.__dict__ == loaded.__dict__
+
+
+@pytest.mark.django_db
+def test_shared_aggregate_cache_is_never_stale(app, shared_cache):
+    repo = app.get_repo_for_aggregate(Counter, use_shared_aggregate_cache=True)
+    store_counter(app, 'c1', [1, 2])
+    repo['c1']
+
+    app.event_store.append(Counter.Incremented(entity_id='c1', entity_version=3, by=10))
+    counter = repo['c1']
+
+    assert counter.value == 13
+    assert counter.version == 4
+    assert shared_cache.get('djangoevents:aggregate:Counter:1:3:c1') is not None
+
+
+@pytest.mark.django_db
+def test_shared_aggregate_cache_with_in_process_cache(app, shared_cache):
+    store_counter(app, 'c1', [1, 2])
+    app.get_repo_for_aggregate(Counter, use_shared_aggregate_cache=True)['c1']
+
+    repo = app.get_repo_for_aggregate(Counter, use_aggregate_cache=True, use_shared_aggregate_cache=True)
+    with mock.patch.object(repo.stored_event_repo, 'stream_entity_events') as stream_entity_events:
+        counter = repo['c1']
+
+    assert stream_entity_events.call_count == 0
+    assert counter.value == 3
+    assert repo.aggregate_cache.peek('Counter::c1').aggregate.__dict__ == counter.__dict__
+
+
+@pytest.mark.django_db
+@override_settings(DJANGOEVENTS_CONFIG={
+    'SHARED_AGGREGATE_CACHE': {
+        'ENABLED': True,
+        'CACHE': 'default',
+        'TIMEOUT': 60,
+    },
+})
+def test_shared_aggregate_cache_settings(app):
+    repo = app.get_repo_for_aggregate(Counter)
+    assert repo.shared_aggregate_cache.cache is caches['default']
+    assert repo.shared_aggregate_cache.timeout == 60
+
+
+@pytest.mark.django_db
+def test_get_many(app):
+    repo = app.get_repo_for_aggregate(Counter)
+    store_counter(app, 'c1', [1, 2])
+    store_counter(app, 'c2', [])
+    store_counter(app, 'c3', [5])
+
+    with CaptureQueriesContext(connection) as queries:
+        aggregates, missing = repo.get_many(['c3', 'missing', 'c1', 'c2', 'c1'])
+
+    assert len(queries.captured_queries) == 1
+    assert {aggregate_id: (a.value, a.version) for aggregate_id, a in aggregates.items()} == {
+        'c1': (3, 3),
+        'c2': (0, 1),
+        'c3': (5, 2),
+    }
+    assert missing == ['missing']
+
+
+@pytest.mark.django_db
+def test_get_many_in_chunks(app):
+    repo = app.get_repo_for_aggregate(Counter)
+    for i in range(5):
+        store_counter(app, 'c%s' % i, [i])
+
+    with CaptureQueriesContext(connection) as queries:
+        result = repo.get_many(['c%s' % i for i in range(5)], chunk_size=2)
+
+    assert len(queries.captured_queries) == 3
+    assert {aggregate_id: a.value for aggregate_id, a in result.aggregates.items()} == {
+        'c%s' % i: i for i in range(5)
+    }
+    assert result.missing == []
+
+
+@pytest.mark.django_db
+def test_get_many_with_snapshots(app):
+    repo = app.get_repo_for_aggregate(Counter, use_snapshots=True)
+    store_counter(app, 'c1', [1, 2])
+    store_counter(app, 'c2', [3])
+    repo.take_snapshot('c1')
+    repo.take_snapshot('c2')
+    app.event_store.append(Counter.Incremented(entity_id='c1', entity_version=3, by=10))
+
+    with CaptureQueriesContext(connection) as queries:
+        aggregates, missing = repo.get_many(['c1', 'c2'])
+
+    # Snapshots & events.
+    assert len(queries.captured_queries) == 2
+    assert (aggregates['c1'].value, aggregates['c1'].version) == (13, 4)
+    assert (aggregates['c2'].value, aggregates['c2'].version) == (3, 2)
+    assert missing == []
+
+    # Events before snapshots are not replayed.
+    with mock.patch.object(Counter.Incremented, 'mutate_event', side_effect=Counter.Incremented.mutate_event,
+                           autospec=True) as mutate_event:
+        repo.get_many(['c1', 'c2'])
+    assert mutate_event.call_count == 1
+
+
+@pytest.mark.django_db
+def test_contains_does_not_replay_events(app):
+    repo = app.get_repo_for_aggregate(Counter)
+    store_counter(app, 'c1', [1, 2])
+
+    with CaptureQueriesContext(connection) as queries, \
+            mock.patch.object(repo.transcoder, 'deserialize') as deserialize:
+        assert 'c1' in repo
+        assert 'missing' not in repo
+
+    assert len(queries.captured_queries) == 2
+    assert 'EXISTS' in queries.captured_queries[0]['sql'] or 'LIMIT 1' in queries.captured_queries[0]['sql']
+    deserialize.assert_not_called()
+
+
+@pytest.mark.django_db
+def test_contains_uses_aggregate_cache(app):
+    repo = app.get_repo_for_aggregate(Counter, use_aggregate_cache=True)
+    store_counter(app, 'c1', [1])
+    repo['c1']
+
+    with CaptureQueriesContext(connection) as queries:
+        assert 'c1' in repo
+    assert len(queries.captured_queries) == 0
+
+    with CaptureQueriesContext(connection) as queries:
+        assert 'missing' not in repo
+    assert len(queries.captured_queries) == 1
+
+
+@pytest.mark.django_db
+def test_execute_command(app):
+    repo = app.get_repo_for_aggregate(Counter)
+    store_counter(app, 'c1', [1])
+
+    def increment(counter):
+        app.event_store.append(Counter.Incremented(entity_id='c1', entity_version=counter.version, by=2))
+        return counter.version
+
+    assert repo.execute('c1', increment) == 2
+    assert repo['c1'].value == 3
+
+
+@pytest.mark.django_db
+def test_execute_command_retries_on_conflict_with_missing_events_only(app):
+    repo = app.get_repo_for_aggregate(Counter)
+    store_counter(app, 'c1', [1, 2])
+    stale = repo['c1']
+    # Stored by another process after `stale` had been loaded.
+    app.event_store.append(Counter.Incremented(entity_id='c1', entity_version=3, by=10))
+
+    seen = []
+
+    def increment(counter):
+        seen.append((counter.version, counter.value))
+        app.event_store.append(Counter.Incremented(entity_id='c1', entity_version=counter.version, by=1))
+
+    stream_entity_events = repo.stored_event_repo.stream_entity_events
+    with mock.patch.object(repo, 'get_entity', return_value=stale), \
+            mock.patch.object(repo.stored_event_repo, 'stream_entity_events',
+                              side_effect=stream_entity_events) as stream:
+        repo.execute('c1', increment)
+
+    assert seen == [(3, 3), (4, 13)]
+    stream.assert_called_once_with('Counter::c1', after_version=2, chunk_size=None)
+    assert repo['c1'].value == 14
+
+
+@pytest.mark.django_db
+def test_execute_command_gives_up_after_max_retries(app):
+    repo = app.get_repo_for_aggregate(Counter)
+    store_counter(app, 'c1', [1])
+    calls = []
+
+    def conflicting(counter):
+        calls.append(counter.version)
+        app.event_store.append(Counter.Incremented(entity_id='c1', entity_version=1, by=1))
+
+    with pytest.raises(ConcurrencyConflict) as exc_info:
+        repo.execute('c1', conflicting, max_retries=2)
+
+    assert calls == [2, 2, 2]
+    assert exc_info.value.current_version == 1
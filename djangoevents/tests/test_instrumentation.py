@@ -0,0 +1,176 @@
+from .. import instrumentation
+from .. import store_event
+from .. import store_events
+from ..domain import BaseAggregate
+from ..domain import DomainEvent
+from ..exceptions import ConcurrencyConflict
+from ..instrumentation import Instrumentation
+from ..instrumentation import NullInstrumentation
+from ..instrumentation import StatsdInstrumentation
+from ..instrumentation import get_instrumentation
+from django.test import override_settings
+from unittest import mock
+import pytest
+
+
+class Rocket(BaseAggregate):
+    class Created(BaseAggregate.Created):
+        def mutate_event(self, event, klass):
+            return klass(entity_id=event.entity_id, entity_version=event.entity_version,
+                         domain_event_id=event.domain_event_id)
+
+    class Launched(DomainEvent):
+        def mutate_event(self, event, aggregate):
+            aggregate.launched = True
+            return aggregate
+
+
+class RecordingInstrumentation(Instrumentation):
+    def __init__(self):
+        self.records = []
+
+    def timing(self, name, seconds, tags):
+        assert seconds >= 0
+        self.records.append(('timing', name, tags))
+
+    def increment(self, name, value, tags):
+        self.records.append(('increment', name, value, tags))
+
+    def observe(self, name, value, tags):
+        self.records.append(('observe', name, value, tags))
+
+    def timings(self, name):
+        return [record[2] for record in self.records if record[:2] == ('timing', name)]
+
+
+@pytest.fixture
+def recording():
+    config = {'INSTRUMENTATION': {'BACKEND': 'djangoevents.tests.test_instrumentation.RecordingInstrumentation'}}
+    with mock.patch.dict(instrumentation._instrumentations, clear=True), \
+            override_settings(DJANGOEVENTS_CONFIG=config):
+        yield get_instrumentation()
+
+
+@pytest.fixture
+def app(recording, app):
+    # Components of the app pick up the instrumentation when created.
+    return app
+
+
+def test_null_instrumentation_by_default():
+    null = get_instrumentation()
+
+    assert isinstance(null, NullInstrumentation)
+    assert get_instrumentation() is null
+    with null.timer('replay_duration') as timer:
+        timer.tag(aggregate_type='Rocket')
+
+
+def test_backend_instance_from_settings(recording):
+    assert isinstance(recording, RecordingInstrumentation)
+    assert get_instrumentation() is recording
+
+
+def test_timer_skips_failed_blocks(recording):
+    with pytest.raises(ValueError):
+        with recording.timer('write_duration', aggregate_type='Rocket'):
+            raise ValueError()
+
+    with recording.timer('write_duration', aggregate_type='Rocket') as timer:
+        timer.tag_event(Rocket.Launched(entity_id='r1', entity_version=1))
+
+    assert recording.records == [
+        ('timing', 'write_duration', {'aggregate_type': 'Rocket', 'event_type': 'rocket_launched'}),
+    ]
+
+
+@pytest.mark.django_db
+def test_store_and_load_are_instrumented(app, recording):
+    with mock.patch('djangoevents.is_validation_enabled', return_value=True), \
+            mock.patch('djangoevents.validate_event', return_value=True):
+        store_event(Rocket.Created(entity_id='r1'))
+        store_event(Rocket.Launched(entity_id='r1', entity_version=1))
+
+    rocket = app.get_repo_for_aggregate(Rocket)['r1']
+
+    created_tags = {'aggregate_type': 'Rocket', 'event_type': 'rocket_created'}
+    launched_tags = {'aggregate_type': 'Rocket', 'event_type': 'rocket_launched'}
+    assert rocket.launched
+    assert recording.timings('validation_duration') == [created_tags, launched_tags]
+    assert recording.timings('write_duration') == [created_tags, launched_tags]
+    assert recording.timings('transcode_duration') == [
+        dict(created_tags, operation='serialize'),
+        dict(launched_tags, operation='serialize'),
+        dict(created_tags, operation='deserialize'),
+        dict(launched_tags, operation='deserialize'),
+    ]
+    assert recording.timings('replay_duration') == [{'aggregate_type': 'Rocket'}]
+    assert ('observe', 'events_per_load', 2, {'aggregate_type': 'Rocket'}) in recording.records
+
+
+@pytest.mark.django_db
+def test_batched_writes_are_instrumented(app, recording):
+    store_events([Rocket.Created(entity_id='r1'), Rocket.Launched(entity_id='r1', entity_version=1)])
+    store_events([Rocket.Created(entity_id='r2')])
+
+    assert recording.timings('write_duration') == [
+        {'aggregate_type': 'Rocket', 'event_type': 'mixed'},
+        {'aggregate_type': 'Rocket', 'event_type': 'rocket_created'},
+    ]
+
+
+@pytest.mark.django_db
+def test_concurrency_conflicts_are_counted(app, recording):
+    app.event_store.append(Rocket.Created(entity_id='r1'))
+    app.event_store.append(Rocket.Launched(entity_id='r1', entity_version=1))
+
+    with pytest.raises(ConcurrencyConflict):
+        app.event_store.append(Rocket.Launched(entity_id='r1', entity_version=1))
+
+    assert ('increment', 'concurrency_conflicts', 1, {
+        'aggregate_type': 'Rocket', 'event_type': 'rocket_launched'}) in recording.records
+
+
+def test_statsd_appends_tag_values_to_names():
+    client = mock.Mock(spec=['timing', 'incr'])
+    statsd = StatsdInstrumentation(client=client)
+
+    statsd.timing('replay_duration', 0.25, {'aggregate_type': 'Rocket'})
+    statsd.increment('concurrency_conflicts', 1, {'event_type': 'rocket_launched', 'aggregate_type': 'Rocket'})
+    statsd.observe('events_per_load', 12, {'aggregate_type': 'Rocket'})
+
+    assert client.mock_calls == [
+        mock.call.timing('djangoevents.replay_duration.Rocket', 250.0),
+        mock.call.incr('djangoevents.concurrency_conflicts.Rocket.rocket_launched', 1),
+        mock.call.timing('djangoevents.events_per_load.Rocket', 12),
+    ]
+
+
+def test_statsd_passes_tags_to_dogstatsd_clients():
+    client = mock.Mock(spec=['timing', 'increment', 'histogram'])
+    statsd = StatsdInstrumentation(client=client, prefix='app', use_tags=True)
+
+    statsd.increment('concurrency_conflicts', 1, {'event_type': 'rocket_launched', 'aggregate_type': 'Rocket'})
+    statsd.observe('events_per_load', 12, {'aggregate_type': 'Rocket'})
+
+    assert client.mock_calls == [
+        mock.call.increment('app.concurrency_conflicts', 1,
+                            tags=['aggregate_type:Rocket', 'event_type:rocket_launched']),
+        mock.call.histogram('app.events_per_load', 12, tags=['aggregate_type:Rocket']),
+    ]
+
+
+def test_prometheus_records_labelled_metrics():
+    prometheus_client = pytest.importorskip('prometheus_client')
+    from ..instrumentation import PrometheusInstrumentation
+
+    registry = prometheus_client.CollectorRegistry()
+    prometheus = PrometheusInstrumentation(registry=registry)
+
+    prometheus.timing('replay_duration', 0.25, {'aggregate_type': 'Rocket'})
+    prometheus.increment('concurrency_conflicts', 1, {'aggregate_type': 'Rocket', 'event_type': 'rocket_launched'})
+
+    labels = {'aggregate_type': 'Rocket'}
+    assert registry.get_sample_value('djangoevents_replay_duration_seconds_sum', labels) == 0.25
+    assert registry.get_sample_value('djangoevents_concurrency_conflicts_total',
+                                     dict(labels, event_type='rocket_launched')) == 1
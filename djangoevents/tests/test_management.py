@@ -0,0 +1,104 @@
+from ..app import EventSourcingWithDjango
+from ..domain import BaseAggregate
+from ..models import OutboxMessage
+from ..outbox import local_transport
+from ..projections import Projection
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import override_settings
+from django.utils import timezone
+import pytest
+
+
+class Parcel(BaseAggregate):
+    class Created(BaseAggregate.Created):
+        def mutate_event(self, event, klass):
+            return klass(entity_id=event.entity_id, entity_version=event.entity_version,
+                         domain_event_id=event.domain_event_id)
+
+
+@pytest.fixture
+def received():
+    received = []
+    handler = (lambda event: isinstance(event, Parcel.Created), received.append)
+    local_transport.subscribe(*handler)
+    yield received
+    local_transport.unsubscribe(*handler)
+
+
+@override_settings(DJANGOEVENTS_CONFIG={'OUTBOX': {'ENABLED': True}})
+@pytest.mark.django_db
+def test_dispatch_outbox(received, capsys):
+    app = EventSourcingWithDjango()
+    try:
+        app.event_store.append(Parcel.Created(entity_id='p1'))
+        app.event_store.append(Parcel.Created(entity_id='p2'))
+    finally:
+        app.close()
+
+    call_command('dispatch_outbox', batch_size=1)
+
+    assert [event.entity_id for event in received] == ['p1', 'p2']
+    assert not OutboxMessage.objects.exists()
+    assert 'Dispatched 2 events' in capsys.readouterr().out
+
+
+@pytest.mark.django_db
+def test_dispatch_outbox_failure():
+    OutboxMessage.objects.create(event_id='e1', create_date=timezone.now())
+
+    with override_settings(DJANGOEVENTS_CONFIG={'OUTBOX': {
+        'TRANSPORT': 'djangoevents.tests.test_management.FailingTransport',
+    }}):
+        with pytest.raises(CommandError):
+            call_command('dispatch_outbox')
+
+    assert OutboxMessage.objects.get().attempts == 1
+
+
+class FailingTransport(object):
+    def send(self, stored_events):
+        raise ValueError("Broker unavailable")
+
+
+class ParcelCount(Projection):
+    name = 'parcel_count'
+    count = 0
+
+    def handle(self, event):
+        ParcelCount.count += 1
+
+    def reset(self):
+        ParcelCount.count = 0
+
+
+@pytest.mark.django_db
+def test_rebuild_projection(capsys):
+    app = EventSourcingWithDjango()
+    try:
+        app.event_store.append(Parcel.Created(entity_id='p1'))
+        app.event_store.append(Parcel.Created(entity_id='p2'))
+    finally:
+        app.close()
+    ParcelCount.count = 5
+
+    call_command('rebuild_projection', 'djangoevents.tests.test_management.ParcelCount', batch_size=1)
+
+    assert ParcelCount.count == 2
+    assert 'Handled 2 events' in capsys.readouterr().out
+
+
+def test_build_event_schema_index(tmpdir, settings, capsys):
+    tmpdir.mkdir('avro').mkdir('parcel').join('v1_parcel_created.json').write('{"type": "string"}')
+    settings.BASE_DIR = str(tmpdir.mkdir('src'))
+    settings.DJANGOEVENTS_CONFIG = {'EVENT_SCHEMA_VALIDATION': {'SCHEMA_DIR': 'avro', 'SCHEMA_INDEX': 'schemas.idx'}}
+
+    call_command('build_event_schema_index')
+
+    assert tmpdir.join('schemas.idx').check()
+    assert "Indexed 1 schema files" in capsys.readouterr().out
+
+
+def test_build_event_schema_index_requires_path():
+    with pytest.raises(CommandError):
+        call_command('build_event_schema_index')
@@ -0,0 +1,138 @@
+from ..domain import BaseAggregate
+from ..domain import DomainEvent
+from ..exceptions import AlreadyExists
+from ..exceptions import OutboxDispatchError
+from ..models import Event
+from ..models import OutboxMessage
+from ..outbox import LocalTransport
+from ..outbox import OutboxDispatcher
+from ..outbox import get_transport
+from ..outbox import local_transport
+from django.db import transaction
+from django.test import override_settings
+from django.utils import timezone
+import pytest
+
+
+class Parcel(BaseAggregate):
+    class Created(BaseAggregate.Created):
+        def mutate_event(self, event, klass):
+            return klass(entity_id=event.entity_id, entity_version=event.entity_version,
+                         domain_event_id=event.domain_event_id)
+
+    class Shipped(DomainEvent):
+        def mutate_event(self, event, aggregate):
+            return aggregate
+
+
+outbox_enabled = override_settings(DJANGOEVENTS_CONFIG={'OUTBOX': {'ENABLED': True}})
+
+
+@pytest.fixture
+def transport():
+    transport = LocalTransport()
+    received = []
+    transport.subscribe(lambda event: True, received.append)
+    transport.received = received
+    return transport
+
+
+@pytest.mark.django_db
+def test_outbox_disabled_by_default(app):
+    app.event_store.append(Parcel.Created(entity_id='p1'))
+
+    assert not OutboxMessage.objects.exists()
+
+
+@outbox_enabled
+@pytest.mark.django_db
+def test_stored_events_are_queued(app):
+    created = Parcel.Created(entity_id='p1')
+    shipped = Parcel.Shipped(entity_id='p1', entity_version=1)
+
+    app.event_store.append(created)
+    app.stored_event_repo.append_many([app.event_store.transcoder.serialize(shipped)])
+
+    messages = OutboxMessage.objects.order_by('id')
+    assert [m.event_id for m in messages] == [created.domain_event_id, shipped.domain_event_id]
+    assert all(m.attempts == 0 for m in messages)
+
+
+@outbox_enabled
+@pytest.mark.django_db
+def test_outbox_is_written_in_journal_transaction(app):
+    app.event_store.append(Parcel.Created(entity_id='p1'))
+
+    with pytest.raises(AlreadyExists):
+        app.event_store.append(Parcel.Created(entity_id='p1'))
+
+    with pytest.raises(RuntimeError):
+        with transaction.atomic():
+            app.event_store.append(Parcel.Created(entity_id='p2'))
+            raise RuntimeError()
+
+    assert OutboxMessage.objects.count() == Event.objects.count() == 1
+
+
+@outbox_enabled
+@pytest.mark.django_db
+def test_dispatch_in_batches(app, transport):
+    events = [Parcel.Created(entity_id='p%s' % i) for i in range(5)]
+    for event in events:
+        app.event_store.append(event)
+
+    dispatcher = OutboxDispatcher(transport=transport, batch_size=2)
+
+    assert dispatcher.dispatch_batch() == 2
+    assert dispatcher.dispatch() == 3
+    assert [e.domain_event_id for e in transport.received] == [e.domain_event_id for e in events]
+    assert transport.received[0].__dict__ == events[0].__dict__
+    assert not OutboxMessage.objects.exists()
+    assert dispatcher.dispatch() == 0
+
+
+@outbox_enabled
+@pytest.mark.django_db
+def test_failed_batch_is_kept_for_retry(app, transport):
+    app.event_store.append(Parcel.Created(entity_id='p1'))
+    app.event_store.append(Parcel.Shipped(entity_id='p1', entity_version=1))
+
+    def fail_once(event):
+        transport.unsubscribe(is_shipped, fail_once)
+        raise ValueError("Broker unavailable")
+
+    def is_shipped(event):
+        return isinstance(event, Parcel.Shipped)
+
+    transport.subscribe(is_shipped, fail_once)
+    dispatcher = OutboxDispatcher(transport=transport)
+
+    with pytest.raises(OutboxDispatchError):
+        dispatcher.dispatch()
+
+    messages = OutboxMessage.objects.all()
+    assert [m.attempts for m in messages] == [1, 1]
+    assert 'Broker unavailable' in messages[0].last_error
+
+    # At-least-once: the whole batch is sent again.
+    assert dispatcher.dispatch() == 2
+    assert len(transport.received) == 4
+    assert not OutboxMessage.objects.exists()
+
+
+@pytest.mark.django_db
+def test_messages_of_missing_events_are_dropped(transport):
+    OutboxMessage.objects.create(event_id='missing', create_date=timezone.now())
+
+    assert OutboxDispatcher(transport=transport).dispatch() == 1
+    assert transport.received == []
+    assert not OutboxMessage.objects.exists()
+
+
+def test_get_transport():
+    assert get_transport() is local_transport
+
+    with override_settings(DJANGOEVENTS_CONFIG={'OUTBOX': {'TRANSPORT': 'djangoevents.outbox.LocalTransport'}}):
+        transport = get_transport()
+    assert isinstance(transport, LocalTransport)
+    assert transport is not local_transport
@@ -0,0 +1,80 @@
+from ..domain import BaseAggregate
+from ..models import Event
+from ..persistence import batched_persistence
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from djangoevents import store_events
+from eventsourcing.domain.model.events import publish
+import pytest
+
+
+class Ticket(BaseAggregate):
+    class Created(BaseAggregate.Created):
+        def mutate_event(self, event, klass):
+            return klass(
+                entity_id=event.entity_id,
+                entity_version=event.entity_version,
+                domain_event_id=event.domain_event_id,
+            )
+
+    class Commented(BaseAggregate.AttributeChanged):
+        def mutate_event(self, event, aggregate):
+            return aggregate
+
+
+def ticket_events(aggregate_id, count):
+    events = [Ticket.Created(entity_id=aggregate_id)]
+    events += [Ticket.Commented(entity_id=aggregate_id, entity_version=v, text='c%d' % v) for v in range(1, count)]
+    return events
+
+
+@pytest.mark.django_db
+def test_store_events_uses_single_insert(app):
+    events = ticket_events('t1', 50)
+
+    with CaptureQueriesContext(connection) as queries:
+        store_events(events)
+
+    inserts = [q for q in queries.captured_queries if q['sql'].startswith('INSERT')]
+    assert len(inserts) == 1
+    assert list(Event.objects.order_by('id').values_list('aggregate_version', flat=True)) == list(range(50))
+
+
+@pytest.mark.django_db
+def test_event_store_append_many(app):
+    events = ticket_events('t1', 3)
+    app.event_store.append_many(events)
+
+    stored_events = app.stored_event_repo.get_entity_events('Ticket::t1')
+    assert [app.event_store.transcoder.deserialize(e) for e in stored_events] == events
+
+
+@pytest.mark.django_db
+def test_batched_persistence_discards_events_on_error(app):
+    with pytest.raises(RuntimeError):
+        with batched_persistence():
+            for event in ticket_events('t1', 3):
+                publish(event)
+            raise RuntimeError()
+
+    assert not Event.objects.exists()
+
+
+@pytest.mark.django_db
+def test_nested_batched_persistence_flushes_once(app):
+    with CaptureQueriesContext(connection) as queries:
+        with batched_persistence():
+            publish(Ticket.Created(entity_id='t1'))
+            with batched_persistence():
+                publish(Ticket.Created(entity_id='t2'))
+            assert not Event.objects.exists()
+
+    inserts = [q for q in queries.captured_queries if q['sql'].startswith('INSERT')]
+    assert len(inserts) == 1
+    assert Event.objects.count() == 2
+
+
+@pytest.mark.django_db
+def test_publish_outside_of_batch_is_stored_immediately(app):
+    publish(Ticket.Created(entity_id='t1'))
+    assert Event.objects.count() == 1
@@ -0,0 +1,195 @@
+from ..domain import BaseAggregate
+from ..domain import DomainEvent
+from ..models import Checkpoint
+from ..models import Event
+from ..projections import Projection
+from ..projections import get_partition
+from concurrent.futures import Future
+from unittest import mock
+import pytest
+import threading
+
+
+class Account(BaseAggregate):
+    class Created(BaseAggregate.Created):
+        def mutate_event(self, event, klass):
+            return klass(entity_id=event.entity_id, entity_version=event.entity_version,
+                         domain_event_id=event.domain_event_id)
+
+    class Deposited(DomainEvent):
+        def mutate_event(self, event, aggregate):
+            return aggregate
+
+
+class Balances(Projection):
+    name = 'balances'
+    aggregate_types = ['Account']
+
+    def __init__(self):
+        self.balances = {}
+        self.batches = []
+        self.lock = threading.Lock()
+
+    def handle_batch(self, events):
+        with self.lock:
+            self.batches.append(events)
+            for event in events:
+                if isinstance(event, Account.Created):
+                    self.balances[event.entity_id] = 0
+                else:
+                    self.balances[event.entity_id] += event.amount
+
+    def reset(self):
+        self.balances = {}
+        self.batches = []
+
+
+@pytest.fixture
+def accounts(app):
+    for i in range(6):
+        app.event_store.append(Account.Created(entity_id='a%s' % i))
+    for i in range(6):
+        app.event_store.append(Account.Deposited(entity_id='a%s' % i, entity_version=1, amount=i * 10))
+
+
+@pytest.mark.django_db
+def test_catch_up_in_batches(app, accounts):
+    projection = Balances()
+    runner = app.get_projection_runner(projection, batch_size=5)
+
+    assert runner.catch_up() == 12
+    assert [len(batch) for batch in projection.batches] == [5, 5, 2]
+    assert projection.balances == {'a%s' % i: i * 10 for i in range(6)}
+    assert runner.position == app.stored_event_repo.get_last_position()
+    assert runner.catch_up() == 0
+
+    app.event_store.append(Account.Deposited(entity_id='a1', entity_version=2, amount=5))
+    assert runner.catch_up() == 1
+    assert projection.balances['a1'] == 15
+
+
+@pytest.mark.django_db
+def test_failed_batch_does_not_move_checkpoint(app, accounts):
+    projection = Balances()
+    runner = app.get_projection_runner(projection, batch_size=5)
+    runner.catch_up()
+    position = runner.position
+
+    app.event_store.append(Account.Deposited(entity_id='missing', entity_version=1, amount=5))
+    with pytest.raises(KeyError):
+        runner.catch_up()
+
+    assert runner.position == position
+
+
+@pytest.mark.django_db
+def test_rebuild(app, accounts):
+    projection = Balances()
+    runner = app.get_projection_runner(projection)
+    runner.catch_up()
+    projection.balances['a0'] = 1000
+
+    assert runner.rebuild() == 12
+    assert projection.balances['a0'] == 0
+    assert len(projection.batches) == 1
+
+
+@pytest.mark.django_db
+def test_partitions_split_aggregates(app, accounts):
+    projection = Balances()
+    runners = [app.get_projection_runner(projection, partition=p, partitions=3) for p in range(3)]
+
+    assert sum(runner.catch_up() for runner in runners) == 12
+    assert projection.balances == {'a%s' % i: i * 10 for i in range(6)}
+    for runner, batches in zip(runners, projection.batches):
+        assert {get_partition(event.entity_id, 3) for event in batches} == {runner.partition}
+    assert {runner.checkpoint_name for runner in runners} == {'balances:0/3', 'balances:1/3', 'balances:2/3'}
+
+
+def test_get_partition():
+    assert get_partition('a1', 4) == get_partition('a1', 4)
+    assert {get_partition('a%s' % i, 4) for i in range(100)} == {0, 1, 2, 3}
+
+
+class InlineExecutor(object):
+    """
+    Runs partitions one after another - SQLite test database does not support concurrent writes.
+    """
+
+    def __init__(self, max_workers):
+        self.max_workers = max_workers
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def submit(self, func, *args):
+        future = Future()
+        try:
+            future.set_result(func(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+
+@pytest.mark.django_db
+def test_rebuild_in_parallel(app, accounts):
+    projection = Balances()
+    runner = app.get_projection_runner(projection, batch_size=4)
+
+    with mock.patch('djangoevents.projections.ThreadPoolExecutor', InlineExecutor), \
+            mock.patch('djangoevents.projections.connections'):
+        assert runner.rebuild(workers=3) == 12
+    assert projection.balances == {'a%s' % i: i * 10 for i in range(6)}
+    # Partition checkpoints are merged into the projection checkpoint.
+    assert list(Checkpoint.objects.values_list('name', 'position')) == [
+        ('balances', app.stored_event_repo.get_last_position()),
+    ]
+    assert runner.catch_up() == 0
+
+
+@pytest.mark.django_db
+def test_parallel_rebuild_reads_journal_once(app, accounts):
+    projection = Balances()
+    runner = app.get_projection_runner(projection, batch_size=4)
+    read = mock.Mock(wraps=app.stored_event_repo.get_events_after_position)
+
+    with mock.patch('djangoevents.projections.ThreadPoolExecutor', InlineExecutor), \
+            mock.patch('djangoevents.projections.connections'), \
+            mock.patch.object(app.stored_event_repo, 'get_events_after_position', read):
+        assert runner.rebuild(workers=3) == 12
+
+    # 12 events in batches of 4 and a final empty read.
+    assert read.call_count == 4
+    # Every worker call gets events of a single partition.
+    assert sum(len(batch) for batch in projection.batches) == 12
+    for batch in projection.batches:
+        assert len({get_partition(event.entity_id, 3) for event in batch}) == 1
+
+
+@pytest.mark.django_db
+def test_parallel_rebuild_stops_before_unsettled_gap(app, accounts):
+    # The last deposit waits for its transaction to commit.
+    row = Event.objects.order_by('id').last()
+    position = row.id
+    row.delete()
+    app.event_store.append(Account.Deposited(entity_id='a0', entity_version=2, amount=5))
+    projection = Balances()
+    runner = app.get_projection_runner(projection)
+
+    with mock.patch('djangoevents.projections.ThreadPoolExecutor', InlineExecutor), \
+            mock.patch('djangoevents.projections.connections'):
+        assert runner.rebuild(workers=3) == 11
+    assert runner.position == position - 1
+
+    row.id = position
+    row.save(force_insert=True)
+    assert runner.catch_up() == 2
+    assert projection.balances == {'a0': 5, 'a1': 10, 'a2': 20, 'a3': 30, 'a4': 40, 'a5': 50}
+
+
+def test_projection_requires_name(app):
+    with pytest.raises(ValueError):
+        app.get_projection_runner(Projection())
@@ -0,0 +1,219 @@
+from ..domain import BaseAggregate
+from ..domain import DomainEvent
+from ..models import Checkpoint
+from ..models import Event
+from ..reader import CatchUpSubscription
+from ..reader import DjangoCheckpointStore
+from ..reader import JournalReader
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+import datetime
+import pytest
+
+
+class Order(BaseAggregate):
+    class Created(BaseAggregate.Created):
+        def mutate_event(self, event, klass):
+            return klass(entity_id=event.entity_id, entity_version=event.entity_version,
+                         domain_event_id=event.domain_event_id)
+
+    class Paid(DomainEvent):
+        def mutate_event(self, event, aggregate):
+            return aggregate
+
+
+class Invoice(BaseAggregate):
+    class Created(BaseAggregate.Created):
+        def mutate_event(self, event, klass):
+            return klass(entity_id=event.entity_id, entity_version=event.entity_version,
+                         domain_event_id=event.domain_event_id)
+
+
+@pytest.fixture
+def journal(app):
+    """
+    Stores events of two orders & an invoice interleaved.
+    """
+    events = [
+        Order.Created(entity_id='o1'),
+        Invoice.Created(entity_id='i1'),
+        Order.Created(entity_id='o2'),
+        Order.Paid(entity_id='o1', entity_version=1),
+        Order.Paid(entity_id='o2', entity_version=1),
+    ]
+    for event in events:
+        app.event_store.append(event)
+    return [event.domain_event_id for event in events]
+
+
+def event_ids(positioned_events):
+    return [event.stored_event.event_id for event in positioned_events]
+
+
+@pytest.mark.django_db
+def test_read_all_events_in_global_order(app, journal):
+    events = list(app.get_journal_reader().read())
+
+    assert event_ids(events) == journal
+    positions = [event.position for event in events]
+    assert positions == sorted(positions)
+    assert events[0].stored_event.aggregate_type == 'Order'
+    assert events[1].stored_event.aggregate_type == 'Invoice'
+
+
+@pytest.mark.django_db
+def test_read_after_position(app, journal):
+    events = list(app.get_journal_reader().read())
+
+    assert event_ids(app.get_journal_reader().read(after_position=events[2].position)) == journal[3:]
+    assert list(app.get_journal_reader().read(after_position=events[-1].position)) == []
+
+
+@pytest.mark.django_db
+def test_read_until_position(app, journal):
+    events = list(app.get_journal_reader().read())
+    reader = app.get_journal_reader(batch_size=2)
+
+    assert event_ids(reader.read(until_position=events[2].position)) == journal[:3]
+    assert event_ids(reader.read(after_position=events[0].position, until_position=events[3].position)) == journal[1:4]
+    assert app.stored_event_repo.get_last_position() == events[-1].position
+
+
+@pytest.mark.django_db
+def test_get_last_position_of_empty_journal(app):
+    assert app.stored_event_repo.get_last_position() == 0
+
+
+@pytest.mark.django_db
+def test_read_filtered_events(app, journal):
+    assert event_ids(app.get_journal_reader(aggregate_types='Invoice').read()) == journal[1:2]
+    assert event_ids(app.get_journal_reader(event_types=['order_paid']).read()) == journal[3:]
+    assert event_ids(app.get_journal_reader(aggregate_types=['Order'], event_types=['order_created']).read()) == [
+        journal[0], journal[2],
+    ]
+
+
+@pytest.mark.django_db
+def test_read_in_batches(app, journal):
+    reader = app.get_journal_reader(batch_size=2)
+
+    with CaptureQueriesContext(connection) as queries:
+        batches = list(reader.read_batches())
+
+    assert [len(batch) for batch in batches] == [2, 2, 1]
+    assert len(queries.captured_queries) == 3
+    assert event_ids(event for batch in batches for event in batch) == journal
+
+
+@pytest.mark.django_db
+def test_read_in_batches_of_exact_size(app, journal):
+    reader = app.get_journal_reader(batch_size=5)
+
+    with CaptureQueriesContext(connection) as queries:
+        batches = list(reader.read_batches())
+
+    assert [len(batch) for batch in batches] == [5]
+    assert len(queries.captured_queries) == 2
+
+
+@pytest.mark.django_db
+def test_checkpoint_store():
+    store = DjangoCheckpointStore()
+    assert store.get_position('projection') == 0
+
+    store.save_position('projection', 10)
+    store.save_position('projection', 12)
+    store.save_position('other', 3)
+
+    assert store.get_position('projection') == 12
+    assert Checkpoint.objects.count() == 2
+
+    store.reset('projection')
+    assert store.get_position('projection') == 0
+
+
+@pytest.mark.django_db
+def test_catch_up_subscription_resumes_from_checkpoint(app, journal):
+    handled = []
+    reader = JournalReader(app.stored_event_repo, aggregate_types=['Order'], batch_size=2)
+    subscription = CatchUpSubscription('orders', handled.append, reader=reader)
+
+    assert subscription.catch_up() == 4
+    assert event_ids(handled) == [journal[0], journal[2], journal[3], journal[4]]
+    assert subscription.position == handled[-1].position
+
+    assert subscription.catch_up() == 0
+
+    app.event_store.append(Invoice.Created(entity_id='i2'))
+    new_event = Order.Created(entity_id='o3')
+    app.event_store.append(new_event)
+
+    assert subscription.catch_up() == 1
+    assert handled[-1].stored_event.event_id == new_event.domain_event_id
+
+
+@pytest.mark.django_db
+def test_catch_up_subscription_failed_batch_is_retried(app, journal):
+    handled = []
+    fail_on = {journal[3]}
+
+    def handler(event):
+        handled.append(event)
+        if event.stored_event.event_id in fail_on:
+            fail_on.clear()
+            raise ValueError("Handler failed")
+
+    subscription = CatchUpSubscription('all', handler, reader=app.get_journal_reader(batch_size=2))
+
+    with pytest.raises(ValueError):
+        subscription.catch_up()
+
+    # First batch has been committed, second one has to be handled again.
+    assert event_ids(handled) == journal[:3] + [journal[3]]
+    assert subscription.position == handled[1].position
+
+    assert subscription.catch_up() == 3
+    assert event_ids(handled[4:]) == journal[2:]
+
+
+@pytest.fixture
+def uncommitted(journal):
+    """
+    Removes the third event from the journal as if it was stored by a transaction yet to commit.
+    Returns a function committing it.
+    """
+    row = Event.objects.order_by('id')[2]
+    position = row.id
+    row.delete()
+
+    def commit():
+        row.id = position
+        row.save(force_insert=True)
+    return commit
+
+
+@pytest.mark.django_db
+def test_read_stops_before_unsettled_gap(app, journal, uncommitted):
+    handled = []
+    subscription = CatchUpSubscription('all', handled.append, reader=app.get_journal_reader(batch_size=2))
+
+    assert event_ids(app.get_journal_reader().read()) == journal[:2]
+    assert event_ids(app.get_journal_reader(aggregate_types=['Order']).read()) == journal[:1]
+    assert subscription.catch_up() == 2
+    assert app.get_journal_reader().get_last_settled_position() == subscription.position
+
+    uncommitted()
+
+    assert subscription.catch_up() == 3
+    assert event_ids(handled) == journal
+
+
+@pytest.mark.django_db
+def test_read_past_settled_gap(app, journal, uncommitted):
+    expected = journal[:2] + journal[3:]
+    assert event_ids(app.get_journal_reader(settle_time=0).read()) == expected
+
+    Event.objects.update(create_date=timezone.now() - datetime.timedelta(seconds=10))
+    assert event_ids(app.get_journal_reader().read()) == expected
+    assert app.get_journal_reader().get_last_settled_position() == app.stored_event_repo.get_last_position()
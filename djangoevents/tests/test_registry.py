@@ -0,0 +1,66 @@
+from .. import registry
+from ..domain import BaseAggregate
+from ..domain import DomainEvent
+from ..registry import get_event_metadata
+from ..registry import get_event_type
+from ..registry import register_aggregate_events
+from unittest import mock
+
+
+class WarehouseItem(BaseAggregate):
+    class Created(BaseAggregate.Created):
+        def mutate_event(self, event, klass):
+            return klass(entity_id=event.entity_id, entity_version=event.entity_version,
+                         domain_event_id=event.domain_event_id)
+
+    class Moved(DomainEvent):
+        event_type = 'item_moved'
+
+        def mutate_event(self, event, aggregate):
+            return aggregate
+
+    class Counted(DomainEvent):
+        @property
+        def event_type(self):
+            return 'item_counted_{}'.format(self.quantity)
+
+        def mutate_event(self, event, aggregate):
+            return aggregate
+
+
+def test_event_metadata():
+    metadata = get_event_metadata(WarehouseItem.Created)
+
+    assert metadata.aggregate_type == 'WarehouseItem'
+    assert metadata.event_type == 'warehouse_item_created'
+    assert metadata.id_prefix == 'WarehouseItem'
+    assert metadata.module_name == 'djangoevents.tests.test_registry'
+    assert metadata.class_name == 'WarehouseItem.Created'
+
+
+def test_event_metadata_is_computed_once():
+    with mock.patch.dict(registry._event_metadata, clear=True), \
+            mock.patch.object(registry, 'camel_case_to_snake_case', wraps=registry.camel_case_to_snake_case) as convert:
+        metadata = get_event_metadata(WarehouseItem.Created)
+        assert get_event_metadata(WarehouseItem.Created) is metadata
+
+    assert convert.call_count == 1
+
+
+def test_event_type_overrides():
+    assert get_event_type(WarehouseItem.Moved(entity_id='i1', entity_version=1)) == 'item_moved'
+    assert get_event_metadata(WarehouseItem.Counted).event_type is None
+    assert get_event_type(WarehouseItem.Counted(entity_id='i1', entity_version=1, quantity=3)) == 'item_counted_3'
+
+    event = WarehouseItem.Created(entity_id='i1')
+    event.__dict__['event_type'] = 'item_created'
+    assert get_event_type(event) == 'item_created'
+
+
+def test_register_aggregate_events():
+    with mock.patch.dict(registry._event_metadata, clear=True), \
+            mock.patch.object(registry, 'list_concrete_aggregates', return_value=[WarehouseItem]):
+        register_aggregate_events()
+        registered = set(registry._event_metadata)
+
+    assert registered == {WarehouseItem.Created, WarehouseItem.Moved, WarehouseItem.Counted}
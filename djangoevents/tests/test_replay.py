@@ -0,0 +1,137 @@
+from .. import store_event
+from ..domain import BaseAggregate
+from ..domain import DomainEvent
+from ..replay import ReplayEvent
+from ..replay import supports_replay_event
+from ..unifiedtranscoder import UnifiedTranscoder
+from django.core.serializers.json import DjangoJSONEncoder
+from django.test import override_settings
+from eventsourcing.domain.model.entity import EventSourcedEntity
+from unittest import mock
+import copy
+import pickle
+import pytest
+
+
+class Parcel(BaseAggregate):
+    class Created(BaseAggregate.Created):
+        def mutate_event(self, event, klass):
+            return klass(entity_id=event.entity_id, entity_version=event.entity_version,
+                         domain_event_id=event.domain_event_id, weight=event.weight)
+
+    class Scanned(DomainEvent):
+        def mutate_event(self, event, aggregate):
+            aggregate.scans += 1
+            return aggregate
+
+    class Labelled(DomainEvent):
+        label = 'none'
+
+        def mutate_event(self, event, aggregate):
+            aggregate.label = event.label
+            return aggregate
+
+    class Weighed(DomainEvent):
+        def __init__(self, weight, **kwargs):
+            super().__init__(weight=float(weight), **kwargs)
+
+        def mutate_event(self, event, aggregate):
+            aggregate.weight = event.weight
+            return aggregate
+
+    def __init__(self, weight, scans=0, label='none', **kwargs):
+        super().__init__(**kwargs)
+        self.weight = weight
+        self.scans = scans
+        self.label = label
+
+
+class Queue(EventSourcedEntity):
+    pass
+
+
+@pytest.fixture
+def transcoder():
+    return UnifiedTranscoder(json_encoder_cls=DjangoJSONEncoder)
+
+
+def test_replay_event_stands_in_for_domain_event(transcoder):
+    event = Parcel.Created(entity_id='p1', weight=5)
+    replay_event = transcoder.deserialize_for_replay(transcoder.serialize(event))
+
+    assert isinstance(replay_event, ReplayEvent)
+    assert isinstance(replay_event, Parcel.Created)
+    assert replay_event.weight == 5
+    assert replay_event == event
+    assert event == replay_event
+    assert hash(replay_event) == hash(event)
+    assert repr(replay_event) == repr(event)
+
+    with pytest.raises(AttributeError):
+        replay_event.weight = 6
+    with pytest.raises(AttributeError):
+        replay_event.height
+
+
+def test_payload_is_decoded_on_first_access(transcoder):
+    event = Parcel.Created(entity_id='p1', entity_version=0, weight=5)
+    stored_event = transcoder.serialize(event)
+
+    with mock.patch.object(transcoder, '_decode_event_data', wraps=transcoder._decode_event_data) as decode:
+        replay_event = transcoder.deserialize_for_replay(stored_event)
+        assert (replay_event.entity_id, replay_event.entity_version) == ('p1', 0)
+        assert replay_event.domain_event_id == event.domain_event_id
+        assert replay_event.mutate_event
+        assert decode.call_count == 0
+
+        assert replay_event.weight == 5
+        assert replay_event.__dict__ == event.__dict__
+        assert decode.call_count == 1
+
+
+def test_copies_are_domain_events(transcoder):
+    event = Parcel.Scanned(entity_id='p1', entity_version=1)
+    replay_event = transcoder.deserialize_for_replay(transcoder.serialize(event))
+
+    for copied in [replay_event.to_event(), copy.deepcopy(replay_event), pickle.loads(pickle.dumps(replay_event))]:
+        assert type(copied) is Parcel.Scanned
+        assert copied == event
+
+
+def test_events_with_own_init_or_defaults_are_deserialized_fully(transcoder):
+    assert supports_replay_event(Parcel.Created)
+    assert not supports_replay_event(Parcel.Weighed)
+    # The payload has to take precedence over class attribute defaults.
+    assert not supports_replay_event(Parcel.Labelled)
+
+    for event in [Parcel.Weighed(entity_id='p1', entity_version=1, weight=12),
+                  Parcel.Labelled(entity_id='p1', entity_version=2, label='fragile')]:
+        deserialized = transcoder.deserialize_for_replay(transcoder.serialize(event))
+        assert type(deserialized) is type(event)
+        assert deserialized == event
+
+
+@pytest.mark.django_db
+def test_lightweight_replay_loads_same_aggregate(app):
+    store_event(Parcel.Created(entity_id='p1', weight=5))
+    store_event(Parcel.Scanned(entity_id='p1', entity_version=1))
+    store_event(Parcel.Labelled(entity_id='p1', entity_version=2, label='fragile'))
+    store_event(Parcel.Weighed(entity_id='p1', entity_version=3, weight=7))
+
+    parcel = app.get_repo_for_aggregate(Parcel, lightweight_replay=True)['p1']
+    expected = app.get_repo_for_aggregate(Parcel)['p1']
+
+    assert parcel.__dict__ == expected.__dict__
+    assert (parcel.weight, parcel.scans, parcel.label, parcel.version) == (7, 1, 'fragile', 4)
+
+
+@pytest.mark.django_db
+def test_lightweight_replay_setting(app):
+    assert not app.get_repo_for_aggregate(Parcel).lightweight_replay
+
+    with override_settings(DJANGOEVENTS_CONFIG={'LIGHTWEIGHT_REPLAY': True}):
+        assert app.get_repo_for_aggregate(Parcel).lightweight_replay
+        assert not app.get_repo_for_aggregate(Queue).lightweight_replay
+
+    with pytest.raises(ValueError):
+        app.get_repo_for_aggregate(Queue, lightweight_replay=True)
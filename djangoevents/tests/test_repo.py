@@ -1,13 +1,19 @@
 from ..app import EventSourcingWithDjango
 from ..models import Event
+from ..repository import STORED_EVENT_COLUMNS
 from ..repository import from_model_instance
+from ..repository import from_row
 from ..unifiedtranscoder import UnifiedStoredEvent
 from eventsourcing.domain.model.entity import EventSourcedEntity
 from eventsourcing.domain.services.transcoding import EntityVersion
 from eventsourcing.utils.time import timestamp_from_uuid
 from datetime import datetime
+from django.db import connection
 from django.db import transaction
+from django.db.utils import IntegrityError
+from django.test.utils import CaptureQueriesContext
 from djangoevents.exceptions import AlreadyExists
+from djangoevents.exceptions import ConcurrencyConflict
 import json
 import pytest
 
@@ -56,7 +62,8 @@ def save_events(repo, stored_events):
 @pytest.fixture
 def repo():
     app = SampleApp()
-    return app.stored_event_repo
+    yield app.stored_event_repo
+    app.close()
 
 
 @pytest.fixture
@@ -159,3 +166,186 @@ def test_append_wrong_type(repo):
     with transaction.atomic():
         with pytest.raises(AssertionError):
             repo.append('wrong object type')
+
+
+@pytest.mark.django_db
+def test_repo_append_many(repo, stored_events):
+    with CaptureQueriesContext(connection) as queries:
+        repo.append_many(stored_events)
+
+    inserts = [q for q in queries.captured_queries if q['sql'].startswith('INSERT')]
+    assert len(inserts) == 1
+    assert repo.get_entity_events(stored_events[0].stored_entity_id) == stored_events
+
+
+@pytest.mark.django_db
+def test_repo_append_many_nothing_to_save(repo):
+    with CaptureQueriesContext(connection) as queries:
+        repo.append_many([])
+
+    assert len(queries.captured_queries) == 0
+
+
+@pytest.mark.django_db
+def test_repo_append_many_aggregate_already_exists(repo, stored_events):
+    repo.append(stored_events[0])
+
+    with pytest.raises(AlreadyExists):
+        repo.append_many(stored_events)
+
+    # Whole batch is rolled back.
+    assert Event.objects.count() == 1
+
+
+@pytest.mark.django_db
+def test_repo_append_many_version_conflict(repo, stored_events):
+    repo.append_many(stored_events[:3])
+
+    with pytest.raises(IntegrityError) as exc_info:
+        repo.append_many(stored_events[2:])
+
+    assert isinstance(exc_info.value, ConcurrencyConflict)
+    assert exc_info.value.attempted_version == 2
+    assert exc_info.value.current_version == 2
+    assert Event.objects.count() == 3
+
+
+@pytest.mark.django_db
+def test_repo_append_version_conflict(repo, stored_events):
+    save_events(repo, stored_events[:3])
+
+    with transaction.atomic():
+        with pytest.raises(ConcurrencyConflict) as exc_info:
+            repo.append(stored_events[1], new_version_number=1)
+        # Outer transaction is still usable.
+        assert Event.objects.count() == 3
+
+    assert exc_info.value.aggregate_id == stored_events[1].aggregate_id
+    assert (exc_info.value.attempted_version, exc_info.value.current_version) == (1, 2)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_repo_append_outside_transaction_skips_savepoint(repo, stored_events):
+    save_events(repo, stored_events[:1])
+
+    with CaptureQueriesContext(connection) as queries:
+        repo.append(stored_events[1], new_version_number=1)
+    assert 'SAVEPOINT' not in [query['sql'].split()[0] for query in queries]
+
+    with pytest.raises(ConcurrencyConflict) as exc_info:
+        repo.append(stored_events[1], new_version_number=1)
+    assert exc_info.value.current_version == 1
+
+    with transaction.atomic(), CaptureQueriesContext(connection) as queries:
+        repo.append(stored_events[2], new_version_number=2)
+    assert [query['sql'].split()[0] for query in queries] == ['SAVEPOINT', 'INSERT', 'RELEASE']
+
+
+@pytest.mark.django_db
+def test_append_many_wrong_type(repo):
+    with pytest.raises(AssertionError):
+        repo.append_many(['wrong object type'])
+
+
+@pytest.mark.django_db
+def test_repo_stream_entity_events(repo, stored_events):
+    save_events(repo, stored_events)
+
+    with CaptureQueriesContext(connection) as queries:
+        streamed_events = list(repo.stream_entity_events(stored_events[0].stored_entity_id, chunk_size=4))
+
+    assert streamed_events == stored_events
+    assert len(queries.captured_queries) == 2
+
+
+@pytest.mark.django_db
+def test_repo_stream_entity_events_chunk_boundary(repo, stored_events):
+    save_events(repo, stored_events)
+
+    with CaptureQueriesContext(connection) as queries:
+        streamed_events = list(repo.stream_entity_events(stored_events[0].stored_entity_id, chunk_size=3))
+
+    assert streamed_events == stored_events
+    # Last query confirms there are no more events.
+    assert len(queries.captured_queries) == 3
+
+
+@pytest.mark.django_db
+def test_repo_stream_entity_events_after_version(repo, stored_events):
+    save_events(repo, stored_events)
+
+    streamed_events = repo.stream_entity_events(stored_events[0].stored_entity_id, after_version=2, chunk_size=2)
+    assert list(streamed_events) == stored_events[3:]
+
+
+@pytest.mark.django_db
+def test_repo_stream_entity_events_is_lazy(repo, stored_events):
+    save_events(repo, stored_events)
+
+    with CaptureQueriesContext(connection) as queries:
+        streamed_events = repo.stream_entity_events(stored_events[0].stored_entity_id, chunk_size=2)
+        assert len(queries.captured_queries) == 0
+        assert next(streamed_events) == stored_events[0]
+        assert len(queries.captured_queries) == 1
+
+
+@pytest.mark.django_db
+def test_repo_get_entity_events_version_range(repo, stored_events):
+    save_events(repo, stored_events)
+    stored_entity_id = stored_events[0].stored_entity_id
+
+    assert repo.get_entity_events(stored_entity_id, after_version=2) == stored_events[3:]
+    assert repo.get_entity_events(stored_entity_id, until_version=2) == stored_events[:3]
+    assert repo.get_entity_events(stored_entity_id, after_version=1, until_version=4) == stored_events[2:5]
+    assert repo.get_entity_events(stored_entity_id, after_version=1, until_version=4, limit=2) == stored_events[2:4]
+
+
+@pytest.mark.django_db
+def test_repo_get_entity_events_version_range_descending(repo, stored_events):
+    save_events(repo, stored_events)
+    stored_entity_id = stored_events[0].stored_entity_id
+
+    retrieved_events = repo.get_entity_events(stored_entity_id, after_version=1, until_version=4, limit=2,
+                                              query_ascending=False, results_ascending=False)
+    assert retrieved_events == [stored_events[4], stored_events[3]]
+
+
+@pytest.mark.django_db
+@pytest.mark.skipif(connection.vendor != 'sqlite', reason="Query plan format is database specific.")
+def test_repo_get_entity_events_version_range_uses_index(repo):
+    query = Event.objects.filter(stored_entity_id='SampleAggregate::1', aggregate_version__gt=10)\
+        .order_by('aggregate_version')
+    sql, params = query.query.sql_with_params()
+
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+        plan = ' '.join(str(row) for row in cursor.fetchall())
+
+    assert 'stored_entity_id' in plan
+    assert 'aggregate_version>?' in plan.replace(' ', '')
+
+
+@pytest.mark.django_db
+def test_repo_stores_binary_event_data(repo, stored_events):
+    binary_event = stored_events[1]._replace(event_data=b'\x81\xa5title\xa4test', event_data_format='msgpack')
+    save_events(repo, [stored_events[0], binary_event])
+
+    row = Event.objects.get(aggregate_version=1)
+    assert row.event_data == ''
+    assert row.event_data_format == 'msgpack'
+    assert bytes(row.event_data_binary) == binary_event.event_data
+
+    assert repo.get_entity_events(stored_events[0].stored_entity_id) == [stored_events[0], binary_event]
+    assert list(repo.stream_entity_events(stored_events[0].stored_entity_id)) == [stored_events[0], binary_event]
+
+
+@pytest.mark.django_db
+def test_from_row_matches_from_model_instance(repo, stored_events):
+    binary_event = stored_events[1]._replace(event_data=b'\x81\xa5title\xa4test', event_data_format='msgpack')
+    save_events(repo, [stored_events[0], binary_event])
+
+    rows = Event.objects.order_by('id').values_list(*STORED_EVENT_COLUMNS)
+    events = Event.objects.order_by('id')
+
+    assert [from_row(row) for row in rows] == [from_model_instance(event) for event in events]
+    assert [from_row(row) for row in rows] == [stored_events[0], binary_event]
@@ -168,3 +168,123 @@ def test_decode_cls_name():
 
     assert schema.decode_cls_name(LongName) == 'long_name'
     assert schema.decode_cls_name(Shortname) == 'shortname'
+
+
+@mock.patch.object(schema, 'list_concrete_aggregates', return_value=[Project])
+def test_find_event_aggregate(list_aggs):
+    assert schema.find_event_aggregate(Project.Created) is Project
+
+    with pytest.raises(EventSchemaError):
+        schema.find_event_aggregate(Project.Closed)
+
+
+def test_validate_event_uses_compiled_validator_of_cached_schema():
+    evt_schema = avro.schema.Parse(PROJECT_CREATED_SCHEMA)
+    event = Project.Created(entity_id='1', name='Awesome Project')
+
+    with mock.patch.dict(schema.schemas, {Project.Created: evt_schema}), mock.patch.dict(schema.validators):
+        validator = schema.get_validator_for_event(Project.Created)
+        assert schema.get_validator_for_event(Project.Created) is validator
+        # `entity_version` is an int, schema expects a string.
+        assert schema.validate_event(event) is False
+
+        event.__dict__['entity_version'] = '0'
+        assert schema.validate_event(event) is True
+
+        schema.schemas[Project.Created] = avro.schema.Parse(PROJECT_CREATED_SCHEMA)
+        assert schema.get_validator_for_event(Project.Created) is not validator
+
+
+def test_validate_event_without_cached_schema():
+    with mock.patch.dict(schema.schemas, clear=True):
+        with pytest.raises(EventSchemaError):
+            schema.validate_event(Project.Created(entity_id='1', name='Awesome Project'))
+
+
+@pytest.fixture
+def project_schemas(tmpdir, settings):
+    project_dir = tmpdir.mkdir('avro').mkdir('project')
+    project_dir.join('v1_project_created.json').write(PROJECT_CREATED_SCHEMA)
+    settings.BASE_DIR = str(tmpdir.mkdir('src'))
+    settings.DJANGOEVENTS_CONFIG = {'EVENT_SCHEMA_VALIDATION': {'ENABLED': True, 'SCHEMA_DIR': 'avro'}}
+
+    with mock.patch.object(schema, 'list_concrete_aggregates', return_value=[Project]), \
+            mock.patch.dict(schema.schemas, clear=True), mock.patch.dict(schema.validators, clear=True), \
+            mock.patch.dict(schema.schema_indexes, clear=True), \
+            mock.patch.object(schema, 'lazily_versioned_events', set()):
+        yield project_dir
+
+    Project.Created.version = None
+
+
+def enable_schema_option(settings, **options):
+    config = settings.DJANGOEVENTS_CONFIG['EVENT_SCHEMA_VALIDATION']
+    settings.DJANGOEVENTS_CONFIG = {'EVENT_SCHEMA_VALIDATION': dict(config, **options)}
+
+
+def test_lazy_loading_loads_schema_on_first_use(project_schemas, settings):
+    enable_schema_option(settings, LAZY_LOADING=True)
+    project_schemas.join('v2_project_created.json').write(PROJECT_CREATED_SCHEMA)
+    Project.Created.version = None
+
+    assert schema.get_event_version(Project.Created) == 2
+    assert Project.Created not in schema.schemas
+
+    evt_schema = schema.get_schema_for_event(Project.Created)
+
+    assert evt_schema.name == 'project_created'
+    assert schema.get_schema_for_event(Project.Created) is evt_schema
+
+
+def test_lazy_loading_skips_loading_schemas_at_startup(settings):
+    from ..apps import load_schemas
+    settings.DJANGOEVENTS_CONFIG = {'EVENT_SCHEMA_VALIDATION': {'LAZY_LOADING': True}}
+
+    with mock.patch('djangoevents.apps.load_all_event_schemas') as load_all:
+        load_schemas()
+
+    load_all.assert_not_called()
+
+
+def test_schemas_are_loaded_from_index(project_schemas, settings, tmpdir):
+    index_path = str(tmpdir.join('schemas.idx'))
+    index = schema.write_schema_index(index_path)
+    enable_schema_option(settings, SCHEMA_INDEX='schemas.idx')
+
+    with mock.patch.object(schema.os.path, 'exists') as exists, \
+            mock.patch.object(schema, 'parse_event_schema') as parse:
+        schema.load_all_event_schemas()
+
+    exists.assert_not_called()
+    parse.assert_not_called()
+    assert list(index['files']) == [os.path.join('project', 'v1_project_created.json')]
+    assert schema.schemas[Project.Created] == avro.schema.Parse(PROJECT_CREATED_SCHEMA)
+    assert Project.Created.version == 1
+
+
+def test_schema_index_survives_touched_files(project_schemas, tmpdir):
+    index_path = str(tmpdir.join('schemas.idx'))
+    schema.write_schema_index(index_path)
+    spec_path = str(project_schemas.join('v1_project_created.json'))
+    os.utime(spec_path, (0, 0))
+
+    assert schema.load_schema_index(index_path) is not None
+
+
+@pytest.mark.parametrize('change', [
+    lambda project_dir: project_dir.join('v1_project_created.json').write(PROJECT_CREATED_SCHEMA + ' '),
+    lambda project_dir: project_dir.join('v2_project_created.json').write(PROJECT_CREATED_SCHEMA),
+    lambda project_dir: project_dir.join('v1_project_created.json').remove(),
+])
+def test_out_of_date_schema_index_is_ignored(project_schemas, tmpdir, change):
+    index_path = str(tmpdir.join('schemas.idx'))
+    schema.write_schema_index(index_path)
+    change(project_schemas)
+
+    with pytest.warns(UserWarning):
+        assert schema.load_schema_index(index_path) is None
+
+
+def test_missing_schema_index_is_ignored(project_schemas, tmpdir):
+    with pytest.warns(UserWarning):
+        assert schema.load_schema_index(str(tmpdir.join('missing.idx'))) is None
@@ -1,5 +1,7 @@
 from ..shortcuts import get_entity_or_404, get_aggregate_or_404
 from django.http import Http404
+from eventsourcing.exceptions import RepositoryKeyError
+from unittest import mock
 
 import pytest
 
@@ -27,3 +29,29 @@ def test_get_aggregate_or_404_item_does_not_exists():
     repo = {}
     with pytest.raises(Http404) as exc_info:
         get_aggregate_or_404(repo, 'id')
+
+
+def test_get_aggregate_or_404_loads_aggregate_once():
+    repo = mock.MagicMock()
+    repo.__getitem__.return_value = 'aggregate'
+
+    assert get_aggregate_or_404(repo, 'id') == 'aggregate'
+    assert repo.__getitem__.call_args_list == [mock.call('id')]
+    assert repo.__contains__.call_count == 0
+
+
+def test_get_aggregate_or_404_repository_key_error():
+    repo = mock.MagicMock()
+    repo.__getitem__.side_effect = RepositoryKeyError('id')
+
+    with pytest.raises(Http404):
+        get_aggregate_or_404(repo, 'id')
+
+
+def test_get_aggregate_or_404_propagates_handler_errors():
+    repo = mock.MagicMock()
+    repo.__getitem__.side_effect = KeyError('missing_field')
+    repo.__contains__.return_value = True
+
+    with pytest.raises(KeyError):
+        get_aggregate_or_404(repo, 'id')
@@ -1,4 +1,5 @@
 import djangoevents
+import pytest
 from unittest import mock
 
 
@@ -36,3 +37,77 @@ def test_store_event_validation_disabled_force(publish, validate_event, validati
     assert validation_enabled.call_count == 1
     assert validate_event.call_args_list == [mock.call(evt)]
     assert publish.call_args_list == [mock.call(evt)]
+
+
+@mock.patch.object(djangoevents, 'is_validation_enabled', return_value=True)
+@mock.patch.object(djangoevents, 'validate_event', return_value=True)
+@mock.patch.object(djangoevents, 'es_publish', return_value=True)
+def test_store_events_validation_enabled(publish, validate_event, validation_enabled):
+    evts = [{'n': 1}, {'n': 2}]
+    djangoevents.store_events(evts)
+
+    assert validation_enabled.call_count == 1
+    assert validate_event.call_args_list == [mock.call(evts[0]), mock.call(evts[1])]
+    assert publish.call_args_list == [mock.call(evts[0]), mock.call(evts[1])]
+
+
+@mock.patch.object(djangoevents, 'is_validation_enabled', return_value=False)
+@mock.patch.object(djangoevents, 'validate_event', return_value=True)
+@mock.patch.object(djangoevents, 'es_publish', return_value=True)
+def test_store_events_validation_disabled(publish, validate_event, validation_enabled):
+    evts = [{'n': 1}, {'n': 2}]
+    djangoevents.store_events(evts)
+
+    assert validate_event.call_count == 0
+    assert publish.call_args_list == [mock.call(evts[0]), mock.call(evts[1])]
+
+
+@mock.patch.object(djangoevents, 'is_validation_enabled', return_value=True)
+@mock.patch.object(djangoevents, 'validate_event', side_effect=[True, False])
+@mock.patch.object(djangoevents, 'es_publish', return_value=True)
+def test_store_events_validates_all_events_before_publishing(publish, validate_event, validation_enabled):
+    with pytest.raises(djangoevents.EventSchemaError):
+        djangoevents.store_events([{'n': 1}, {'n': 2}])
+
+    assert publish.call_count == 0
+
+
+@mock.patch.object(djangoevents, 'get_event_data_format', return_value='avro')
+@mock.patch.object(djangoevents, 'is_validation_enabled', return_value=True)
+@mock.patch.object(djangoevents, 'validate_event', return_value=True)
+@mock.patch.object(djangoevents, 'avro_encoded')
+@mock.patch.object(djangoevents, 'es_publish', return_value=True)
+def test_store_event_avro_encodes_instead_of_validating(publish, avro_encoded, validate_event, *args):
+    evt = {}
+    djangoevents.store_event(evt)
+
+    assert validate_event.call_count == 0
+    assert avro_encoded.call_args_list == [mock.call([evt])]
+    assert publish.call_args_list == [mock.call(evt)]
+
+
+@mock.patch.object(djangoevents, 'get_event_data_format', return_value='avro')
+@mock.patch.object(djangoevents, 'is_validation_enabled', return_value=True)
+@mock.patch.object(djangoevents, 'validate_event', return_value=True)
+@mock.patch.object(djangoevents, 'avro_encoded', side_effect=djangoevents.EventSchemaError)
+@mock.patch.object(djangoevents, 'es_publish', return_value=True)
+def test_store_events_avro_encodes_all_events_before_publishing(publish, avro_encoded, validate_event, *args):
+    evts = [{'n': 1}, {'n': 2}]
+    with pytest.raises(djangoevents.EventSchemaError):
+        djangoevents.store_events(evts)
+
+    assert validate_event.call_count == 0
+    assert avro_encoded.call_args_list == [mock.call(evts)]
+    assert publish.call_count == 0
+
+
+@mock.patch.object(djangoevents, 'get_event_data_format', return_value='avro')
+@mock.patch.object(djangoevents, 'is_validation_enabled', return_value=False)
+@mock.patch.object(djangoevents, 'avro_encoded')
+@mock.patch.object(djangoevents, 'es_publish', return_value=True)
+def test_store_event_avro_validation_disabled(publish, avro_encoded, *args):
+    evt = {}
+    djangoevents.store_event(evt)
+
+    assert avro_encoded.call_count == 0
+    assert publish.call_args_list == [mock.call(evt)]
@@ -1,5 +1,10 @@
+import importlib
 import pytest
+from .. import codecs
+from ..unifiedtranscoder import ResolveDomainFailed
 from ..unifiedtranscoder import UnifiedTranscoder
+from ..unifiedtranscoder import clear_event_class_cache
+from ..unifiedtranscoder import get_event_class_cache_info
 from eventsourcing.domain.model.entity import EventSourcedEntity
 from django.core.serializers.json import DjangoJSONEncoder
 from django.test.utils import override_settings
@@ -130,3 +135,81 @@ def test_transcoder_passes_all_attributes_to_event_constructor():
     for key, value in attributes.items():
         assert key in kwargs
         assert kwargs[key] == value
+
+
+def test_deserialize_caches_resolved_event_classes():
+    transcoder = UnifiedTranscoder(json_encoder_cls=DjangoJSONEncoder)
+    stored_event = transcoder.serialize(SampleAggregate.Created(entity_id='123'))
+    clear_event_class_cache()
+
+    with mock.patch('importlib.import_module', wraps=importlib.import_module) as import_module:
+        for _ in range(3):
+            transcoder.deserialize(stored_event)
+
+    assert import_module.call_count == 1
+    cache_info = get_event_class_cache_info()
+    assert cache_info.misses == 1
+    assert cache_info.hits == 2
+
+
+def test_clear_event_class_cache():
+    transcoder = UnifiedTranscoder(json_encoder_cls=DjangoJSONEncoder)
+    stored_event = transcoder.serialize(SampleAggregate.Created(entity_id='123'))
+    transcoder.deserialize(stored_event)
+
+    clear_event_class_cache()
+
+    assert get_event_class_cache_info().currsize == 0
+
+
+def test_event_class_resolution_failures_are_not_cached():
+    clear_event_class_cache()
+
+    for _ in range(2):
+        with pytest.raises(ResolveDomainFailed):
+            UnifiedTranscoder._get_domain_event_class('djangoevents.tests.test_unifiedtranscoder', 'Missing')
+
+    assert get_event_class_cache_info().currsize == 0
+
+
+requires_msgpack = pytest.mark.skipif(codecs.msgpack is None, reason="msgpack is not installed")
+
+
+@requires_msgpack
+def test_serialize_and_deserialize_msgpack():
+    transcoder = UnifiedTranscoder(json_encoder_cls=DjangoJSONEncoder, event_data_format='msgpack')
+    created = SampleAggregate.Created(entity_id='b089a0a6-e0b3-480d-9382-c47f99103b3d', attr1='val1', attr2=[1, 2],
+                                      metadata={'command_id': 123})
+
+    created_stored_event = transcoder.serialize(created)
+    assert created_stored_event.event_data_format == 'msgpack'
+    assert created_stored_event.event_data == codecs.msgpack.packb({'attr1': 'val1', 'attr2': [1, 2]},
+                                                                   use_bin_type=True)
+    assert created_stored_event.metadata == '{"command_id":123}'
+
+    created_copy = transcoder.deserialize(created_stored_event)
+    created.__dict__.pop('metadata')
+    assert created.__dict__ == created_copy.__dict__
+
+
+@requires_msgpack
+def test_msgpack_transcoder_deserializes_json_events():
+    json_transcoder = UnifiedTranscoder(json_encoder_cls=DjangoJSONEncoder, event_data_format='json')
+    msgpack_transcoder = UnifiedTranscoder(json_encoder_cls=DjangoJSONEncoder, event_data_format='msgpack')
+    created = SampleAggregate.Created(entity_id='b089a0a6-e0b3-480d-9382-c47f99103b3d', attr1='val1')
+
+    stored_event = json_transcoder.serialize(created)
+    assert stored_event.event_data_format == 'json'
+    assert msgpack_transcoder.deserialize(stored_event) == created
+
+
+def test_unknown_event_data_format():
+    with pytest.raises(ValueError):
+        UnifiedTranscoder(json_encoder_cls=DjangoJSONEncoder, event_data_format='xml')
+
+
+@override_settings(DJANGOEVENTS_CONFIG={'EVENT_DATA_FORMAT': 'json'})
+def test_event_data_format_defaults_to_json():
+    transcoder = UnifiedTranscoder(json_encoder_cls=DjangoJSONEncoder)
+    stored_event = transcoder.serialize(SampleAggregate.Created(entity_id='123'))
+    assert stored_event.event_data_format == 'json'
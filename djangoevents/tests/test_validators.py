@@ -0,0 +1,82 @@
+from ..validators import compile_validator
+from avro.io import Validate as avro_validate
+
+import avro.schema
+import json
+import pytest
+
+
+SCHEMAS = {
+    'null': '"null"',
+    'boolean': '"boolean"',
+    'string': '"string"',
+    'bytes': '"bytes"',
+    'int': '"int"',
+    'long': '"long"',
+    'float': '"float"',
+    'double': '"double"',
+    'fixed': '{"type": "fixed", "name": "md5", "size": 4}',
+    'enum': '{"type": "enum", "name": "color", "symbols": ["RED", "GREEN"]}',
+    'array': '{"type": "array", "items": "long"}',
+    'map': '{"type": "map", "values": ["null", "string"]}',
+    'union': '["null", "int", "string"]',
+    'record': json.dumps({
+        "type": "record",
+        "name": "task_created",
+        "fields": [
+            {"name": "entity_id", "type": "string"},
+            {"name": "entity_version", "type": "long"},
+            {"name": "title", "type": "string"},
+            {"name": "due", "type": ["null", "string"]},
+            {"name": "tags", "type": {"type": "array", "items": "string"}},
+            {"name": "assignee", "type": ["null", {
+                "type": "record",
+                "name": "user",
+                "fields": [{"name": "id", "type": "int"}, {"name": "name", "type": "string"}],
+            }]},
+        ],
+    }),
+    'recursive': json.dumps({
+        "type": "record",
+        "name": "node",
+        "fields": [
+            {"name": "value", "type": "int"},
+            {"name": "next", "type": ["null", "node"]},
+        ],
+    }),
+}
+
+DATUMS = [
+    None, True, False, 0, 1, -1, 2 ** 31, -2 ** 31 - 1, 2 ** 63, 1.5, float('nan'),
+    '', 'RED', 'BLUE', b'', b'abcd', b'abcde', bytearray(b'abcd'),
+    [], [1, 2], [1, 'a'], [True], (1, 2),
+    {}, {'a': 'b'}, {'a': None}, {'a': 1}, {1: 'a'}, ['RED'],
+    {'entity_id': '1', 'entity_version': 0, 'title': 'Buy milk', 'due': None, 'tags': [], 'assignee': None},
+    {'entity_id': '1', 'entity_version': 0, 'title': 'Buy milk', 'due': '2017-12-20', 'tags': ['a'],
+     'assignee': {'id': 1, 'name': 'Ann'}},
+    {'entity_id': '1', 'entity_version': 0, 'title': 'Buy milk', 'due': None, 'tags': [],
+     'assignee': {'id': '1', 'name': 'Ann'}},
+    {'entity_id': '1', 'entity_version': '0', 'title': 'Buy milk', 'due': None, 'tags': [], 'assignee': None},
+    {'entity_id': '1', 'entity_version': 0, 'title': 'Buy milk', 'tags': [], 'extra': 1},
+    {'value': 1, 'next': None},
+    {'value': 1, 'next': {'value': 2, 'next': {'value': 3, 'next': None}}},
+    {'value': 1, 'next': {'value': 2, 'next': {'value': '3', 'next': None}}},
+]
+
+
+@pytest.mark.parametrize('schema_name', sorted(SCHEMAS))
+def test_compiled_validator_matches_avro_validate(schema_name):
+    schema = avro.schema.Parse(SCHEMAS[schema_name])
+    validate = compile_validator(schema)
+
+    for datum in DATUMS:
+        assert validate(datum) is avro_validate(schema, datum), datum
+
+
+def test_compiled_validator_can_be_reused():
+    schema = avro.schema.Parse(SCHEMAS['recursive'])
+    validate = compile_validator(schema)
+
+    assert validate({'value': 1, 'next': None})
+    assert not validate({'value': None, 'next': None})
+    assert validate({'value': 2, 'next': {'value': 3, 'next': None}})
@@ -1,21 +1,32 @@
+from .codecs import get_binary_codec
+from .codecs import get_codec
 from .domain import DomainEvent
+from .exceptions import SnapshotStateError
+from .instrumentation import get_instrumentation
+from .registry import get_event_metadata
+from .registry import get_event_type
+from .replay import get_replay_event_class
 from .schema import get_event_version
 from .settings import adds_schema_version_to_event_data
-from .utils import camel_case_to_snake_case
+from .settings import get_event_data_format
 from collections import namedtuple
 from datetime import datetime
 from eventsourcing.domain.model.events import resolve_attr
 from eventsourcing.domain.services.transcoding import AbstractTranscoder
-from eventsourcing.domain.services.transcoding import ObjectJSONDecoder
-from eventsourcing.domain.services.transcoding import id_prefix_from_event
 from eventsourcing.domain.services.transcoding import make_stored_entity_id
 from eventsourcing.utils.time import timestamp_from_uuid
+from functools import lru_cache
 from inspect import isclass
 
 import importlib
-import json
 
 
+# Format of `event_data` encoded with the JSON codec (as opposed to binary ones).
+JSON_FORMAT = 'json'
+
+# Max number of (module_name, class_name) pairs resolved to event classes kept in memory.
+EVENT_CLASS_CACHE_SIZE = 1024
+
 UnifiedStoredEvent = namedtuple('UnifiedStoredEvent', [
     'event_id',
     'event_type',
@@ -29,12 +40,22 @@ UnifiedStoredEvent = namedtuple('UnifiedStoredEvent', [
     'module_name',
     'class_name',
     'stored_entity_id',
+    'event_data_format',
 ])
+# Events stored before binary formats were introduced are JSON encoded.
+UnifiedStoredEvent.__new__.__defaults__ = (JSON_FORMAT,)
 
 
 class UnifiedTranscoder(AbstractTranscoder):
-    def __init__(self, json_encoder_cls=None):
+    def __init__(self, json_encoder_cls=None, codec=None, event_data_format=None):
         self.json_encoder_cls = json_encoder_cls
+        self.codec = codec or get_codec(json_encoder_cls=json_encoder_cls)
+        self.event_data_format = event_data_format or get_event_data_format()
+        self._binary_codecs = {}
+        self.instrumentation = get_instrumentation()
+        if self.event_data_format != JSON_FORMAT:
+            # Fail early if the format is unknown or its dependencies are missing.
+            self._get_binary_codec(self.event_data_format)
         # encrypt not implemented
 
     def serialize(self, domain_event):
@@ -43,6 +64,12 @@ class UnifiedTranscoder(AbstractTranscoder):
         """
         assert isinstance(domain_event, DomainEvent)
 
+        with self.instrumentation.timer('transcode_duration', operation='serialize') as timer:
+            stored_event = self._serialize(domain_event)
+            timer.tag(aggregate_type=stored_event.aggregate_type, event_type=stored_event.event_type)
+        return stored_event
+
+    def _serialize(self, domain_event):
         event_data = {key: value for key, value in domain_event.__dict__.items() if key not in {
             'domain_event_id',
             'entity_id',
@@ -51,22 +78,24 @@ class UnifiedTranscoder(AbstractTranscoder):
         }}
 
         domain_event_class = type(domain_event)
+        event_metadata = get_event_metadata(domain_event_class)
         event_version = get_event_version(domain_event_class)
 
         return UnifiedStoredEvent(
             event_id=domain_event.domain_event_id,
-            event_type=get_event_type(domain_event),
+            event_type=get_event_type(domain_event, event_metadata),
             event_version=event_version,
-            event_data=self._json_encode(event_data),
+            event_data=self._encode_event_data(domain_event, event_data),
             aggregate_id=domain_event.entity_id,
-            aggregate_type=get_aggregate_type(domain_event),
+            aggregate_type=event_metadata.aggregate_type,
             aggregate_version=domain_event.entity_version,
             create_date=datetime.fromtimestamp(timestamp_from_uuid(domain_event.domain_event_id)),
             metadata=self._json_encode(getattr(domain_event, 'metadata', None)),
-            module_name=domain_event_class.__module__,
-            class_name=domain_event_class.__qualname__,
+            module_name=event_metadata.module_name,
+            class_name=event_metadata.class_name,
             # have to have stored_entity_id because of the lib
-            stored_entity_id=make_stored_entity_id(id_prefix_from_event(domain_event), domain_event.entity_id),
+            stored_entity_id=make_stored_entity_id(event_metadata.id_prefix, domain_event.entity_id),
+            event_data_format=self.event_data_format,
         )
 
     def deserialize(self, stored_event):
@@ -74,11 +103,18 @@ class UnifiedTranscoder(AbstractTranscoder):
         Recreates original domain event from stored event topic and event attrs.
         """
         assert isinstance(stored_event, UnifiedStoredEvent)
+
+        with self.instrumentation.timer('transcode_duration', operation='deserialize',
+                                        aggregate_type=stored_event.aggregate_type,
+                                        event_type=stored_event.event_type):
+            return self._deserialize(stored_event)
+
+    def _deserialize(self, stored_event):
         # Get the domain event class from the topic.
         domain_event_class = self._get_domain_event_class(stored_event.module_name, stored_event.class_name)
 
-        # Deserialize event attributes from JSON
-        event_attrs = self._json_decode(stored_event.event_data)
+        # Deserialize event attributes from JSON or the binary format of the event
+        event_attrs = self._decode_event_data(stored_event, domain_event_class)
 
         # Reinstantiate and return the domain event object.
         defaults = {
@@ -100,6 +136,39 @@ class UnifiedTranscoder(AbstractTranscoder):
 
         return domain_event
 
+    def deserialize_for_replay(self, stored_event):
+        """
+        Returns `ReplayEvent` standing in for the stored domain event, see
+        `djangoevents.replay`. Events of classes defining own `__init__()`
+        are deserialized fully.
+        """
+        assert isinstance(stored_event, UnifiedStoredEvent)
+        domain_event_class = self._get_domain_event_class(stored_event.module_name, stored_event.class_name)
+        replay_event_class = get_replay_event_class(domain_event_class)
+        if replay_event_class is None:
+            return self.deserialize(stored_event)
+        return replay_event_class(stored_event, self)
+
+    def serialize_aggregate(self, aggregate):
+        """
+        Serializes aggregate state for snapshot storage. Raises
+        `SnapshotStateError` if the state holds values which would come back
+        as other types (e.g. dates or decimals as strings, tuples as lists).
+        """
+        state = aggregate.get_snapshot_state()
+        path = _find_non_json_value(state)
+        if path is not None:
+            raise SnapshotStateError(
+                "Snapshot state of {} holds a value not surviving a JSON round trip at {}. Override "
+                "`get_snapshot_state()` and `from_snapshot_state()`.".format(type(aggregate).__name__, path))
+        return self._json_encode(state)
+
+    def deserialize_aggregate(self, aggregate_cls, data):
+        """
+        Recreates aggregate from state serialized with `serialize_aggregate`.
+        """
+        return aggregate_cls.from_snapshot_state(self._json_decode(data))
+
     @staticmethod
     def _get_domain_event_class(module_name, class_name):
         """Return domain class described by given topic.
@@ -113,45 +182,110 @@ class UnifiedTranscoder(AbstractTranscoder):
         Raises:
             ResolveDomainFailed: If there is no such domain class.
         """
-        try:
-            module = importlib.import_module(module_name)
-        except ImportError as e:
-            raise ResolveDomainFailed("{}#{}: {}".format(module_name, class_name, e))
-        try:
-            domain_event_class = resolve_attr(module, class_name)
-        except AttributeError as e:
-            raise ResolveDomainFailed("{}#{}: {}".format(module_name, class_name, e))
+        return _resolve_domain_event_class(module_name, class_name)
 
-        if not isclass(domain_event_class):
-            raise ValueError("Event class is not a type: {}".format(domain_event_class))
+    def _encode_event_data(self, domain_event, event_data):
+        if self.event_data_format == JSON_FORMAT:
+            return self._json_encode(event_data)
 
-        if not issubclass(domain_event_class, DomainEvent):
-            raise ValueError("Event class is not a DomainEvent: {}".format(domain_event_class))
+        codec = self._get_binary_codec(self.event_data_format)
+        if codec.schema_based:
+            return codec.encode_event(domain_event)
+        return codec.encode(event_data)
 
-        return domain_event_class
+    def _decode_event_data(self, stored_event, domain_event_class):
+        if stored_event.event_data_format == JSON_FORMAT:
+            return self._json_decode(stored_event.event_data)
+
+        codec = self._get_binary_codec(stored_event.event_data_format)
+        if codec.schema_based:
+            return codec.decode_event(stored_event.event_data, domain_event_class, stored_event.event_version)
+        return codec.decode(stored_event.event_data)
+
+    def _get_binary_codec(self, event_data_format):
+        if event_data_format not in self._binary_codecs:
+            codec = get_binary_codec(event_data_format, json_encoder_cls=self.json_encoder_cls)
+            self._binary_codecs[event_data_format] = codec
+        return self._binary_codecs[event_data_format]
 
     def _json_encode(self, data):
-        return json.dumps(data, separators=(',', ':'), sort_keys=True, cls=self.json_encoder_cls)
+        return self.codec.encode(data)
 
     def _json_decode(self, json_str):
-        return json.loads(json_str, cls=ObjectJSONDecoder)
+        return self.codec.decode(json_str)
+
+
+_json_scalar_types = frozenset([str, int, float, bool, type(None)])
+
+
+def _find_non_json_value(value, path='state'):
+    """
+    Returns path (e.g. `state['items'][0]`) of the first value which JSON
+    decodes to a different type, None if there is no such value.
+    """
+    value_type = type(value)
+    if value_type in _json_scalar_types:
+        return None
+
+    if value_type is dict:
+        for key, item in value.items():
+            if type(key) is not str:
+                return '{}[{!r}]'.format(path, key)
+            if type(item) not in _json_scalar_types:
+                item_path = _find_non_json_value(item, '{}[{!r}]'.format(path, key))
+                if item_path is not None:
+                    return item_path
+        return None
+
+    if value_type is list:
+        for index, item in enumerate(value):
+            if type(item) not in _json_scalar_types:
+                item_path = _find_non_json_value(item, '{}[{}]'.format(path, index))
+                if item_path is not None:
+                    return item_path
+        return None
+
+    return path
 
 
 class ResolveDomainFailed(Exception):
     pass
 
 
+@lru_cache(maxsize=EVENT_CLASS_CACHE_SIZE)
+def _resolve_domain_event_class(module_name, class_name):
+    try:
+        module = importlib.import_module(module_name)
+    except ImportError as e:
+        raise ResolveDomainFailed("{}#{}: {}".format(module_name, class_name, e))
+    try:
+        domain_event_class = resolve_attr(module, class_name)
+    except AttributeError as e:
+        raise ResolveDomainFailed("{}#{}: {}".format(module_name, class_name, e))
+
+    if not isclass(domain_event_class):
+        raise ValueError("Event class is not a type: {}".format(domain_event_class))
+
+    if not issubclass(domain_event_class, DomainEvent):
+        raise ValueError("Event class is not a DomainEvent: {}".format(domain_event_class))
+
+    return domain_event_class
+
+
+def get_event_class_cache_info():
+    """
+    Returns hits, misses, maxsize and currsize of the resolved event class cache.
+    """
+    return _resolve_domain_event_class.cache_info()
+
+
+def clear_event_class_cache():
+    """
+    Drops all resolved event classes, e.g. after modules got reloaded.
+    """
+    _resolve_domain_event_class.cache_clear()
+
+
 def get_aggregate_type(domain_event):
     assert isinstance(domain_event, DomainEvent)
-    domain_event_class = type(domain_event)
-    return domain_event_class.__qualname__.split('.')[0]
-
-
-def get_event_type(domain_event):
-    if hasattr(domain_event, 'event_type'):
-        return getattr(domain_event, 'event_type')
-    else:
-        aggregate_type = get_aggregate_type(domain_event)
-        event_name = domain_event.__class__.__name__
-        event_type_name = '%s%s' % (aggregate_type, event_name)
-        return camel_case_to_snake_case(event_type_name)
+    return get_event_metadata(type(domain_event)).aggregate_type
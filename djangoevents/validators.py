@@ -0,0 +1,181 @@
+"""
+Avro schema validators compiled to plain Python closures.
+
+`compile_validator(schema)` walks the schema once and returns a function
+equivalent to `avro.io.Validate(schema, datum)`, without dispatching on
+schema types for every validated value.
+"""
+from avro.io import INT_MAX_VALUE
+from avro.io import INT_MIN_VALUE
+from avro.io import LONG_MAX_VALUE
+from avro.io import LONG_MIN_VALUE
+from avro.schema import AvroException
+
+
+RECORD_TYPES = ('record', 'error', 'request')
+UNION_TYPES = ('union', 'error_union')
+
+
+def compile_validator(schema):
+    """
+    Returns a function validating a datum against `schema` with the same
+    semantics as `avro.io.Validate`.
+    """
+    return _compile(schema, {})
+
+
+def _compile(schema, compiled):
+    # Records may reference themselves, hence validators are memoized per schema object.
+    key = id(schema)
+    if key in compiled:
+        return compiled[key]
+
+    schema_type = schema.type
+
+    if schema_type == 'null':
+        return _is_none
+    elif schema_type == 'boolean':
+        return _is_boolean
+    elif schema_type == 'string':
+        return _is_string
+    elif schema_type == 'bytes':
+        return _is_bytes
+    elif schema_type == 'int':
+        return _is_int
+    elif schema_type == 'long':
+        return _is_long
+    elif schema_type in ('float', 'double'):
+        return _is_number
+    elif schema_type == 'fixed':
+        return _compile_fixed(schema)
+    elif schema_type == 'enum':
+        return _compile_enum(schema)
+    elif schema_type == 'array':
+        return _compile_array(schema, compiled)
+    elif schema_type == 'map':
+        return _compile_map(schema, compiled)
+    elif schema_type in UNION_TYPES:
+        return _compile_union(schema, compiled)
+    elif schema_type in RECORD_TYPES:
+        return _compile_record(schema, compiled)
+    else:
+        return _unknown_type(schema_type)
+
+
+def _is_none(datum):
+    return datum is None
+
+
+def _is_boolean(datum):
+    return isinstance(datum, bool)
+
+
+def _is_string(datum):
+    return isinstance(datum, str)
+
+
+def _is_bytes(datum):
+    return isinstance(datum, bytes)
+
+
+def _is_int(datum):
+    return isinstance(datum, int) and INT_MIN_VALUE <= datum <= INT_MAX_VALUE
+
+
+def _is_long(datum):
+    return isinstance(datum, int) and LONG_MIN_VALUE <= datum <= LONG_MAX_VALUE
+
+
+def _is_number(datum):
+    return isinstance(datum, (int, float))
+
+
+def _compile_fixed(schema):
+    size = schema.size
+
+    def validate(datum):
+        return isinstance(datum, bytes) and len(datum) == size
+
+    return validate
+
+
+def _compile_enum(schema):
+    symbols = schema.symbols
+    symbol_set = frozenset(symbols)
+
+    def validate(datum):
+        try:
+            return datum in symbol_set
+        except TypeError:
+            # Unhashable datum, compare by equality like `avro.io.Validate` does.
+            return datum in symbols
+
+    return validate
+
+
+def _compile_array(schema, compiled):
+    validate_item = _compile(schema.items, compiled)
+
+    def validate(datum):
+        if not isinstance(datum, list):
+            return False
+        for item in datum:
+            if not validate_item(item):
+                return False
+        return True
+
+    return validate
+
+
+def _compile_map(schema, compiled):
+    validate_value = _compile(schema.values, compiled)
+
+    def validate(datum):
+        if not isinstance(datum, dict):
+            return False
+        for key in datum.keys():
+            if not isinstance(key, str):
+                return False
+        for value in datum.values():
+            if not validate_value(value):
+                return False
+        return True
+
+    return validate
+
+
+def _compile_union(schema, compiled):
+    branches = [_compile(branch, compiled) for branch in schema.schemas]
+
+    def validate(datum):
+        for validate_branch in branches:
+            if validate_branch(datum):
+                return True
+        return False
+
+    return validate
+
+
+def _compile_record(schema, compiled):
+    fields = []
+
+    def validate(datum):
+        if not isinstance(datum, dict):
+            return False
+        get = datum.get
+        for name, validate_field in fields:
+            if not validate_field(get(name)):
+                return False
+        return True
+
+    # Register before compiling fields so that recursive references resolve to this validator.
+    compiled[id(schema)] = validate
+    fields.extend((field.name, _compile(field.type, compiled)) for field in schema.fields)
+    return validate
+
+
+def _unknown_type(schema_type):
+    def validate(datum):
+        raise AvroException('Unknown Avro schema type: %r' % schema_type)
+
+    return validate
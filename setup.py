@@ -32,6 +32,10 @@ setup(
         'avro-python3==1.7.7',
         'stringcase==1.0.6',
     ],
+    extras_require={
+        'orjson': ['orjson'],
+        'msgpack': ['msgpack'],
+    },
     cmdclass={
         'release_to_pypi': ReleaseToPyPICommand
     }